@@ -15,6 +15,7 @@
 from __future__ import annotations
 
 
+import asyncio
 import logging
 import re
 import traceback
@@ -23,14 +24,16 @@ import uuid
 from collections import OrderedDict
 from threading import RLock, Event
 from functools import partial
-from sshConnector.sshLibs.sshChannelEnvironment import EnvironmentControls
 from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import SSHExceptionConn, RequirementsException, PreparserException, \
     ExecutionException, PostParserException, SetFailureException, CompletionTaskException, TimeoutException, \
-    DataFormatException, ForceCompleteException, BetweenBitException, TimeToFirstBitException
+    DataFormatException, ForceCompleteException, BetweenBitException, TimeToFirstBitException, CancelledException
+from PyLinuxDiagnosticToolKit.libs.LDTKMetrics import CommandMetrics, metrics as metricsRegistry
 from PyMultiTasking import safe_acquire, safe_release, method_wait, MultiEvent, PriorityTaskQueue, Task
 from PyMultiTasking.ThreadingUtils import ThreadPool as Pool
 from LinuxModules import genericCmdModule
-from typing import Any, Optional, Union, Hashable, Iterable, List, Callable
+from typing import Any, Optional, Union, Hashable, Iterable, List, Callable, TYPE_CHECKING
+if TYPE_CHECKING:
+    from sshConnector.sshLibs.sshChannelEnvironment import EnvironmentControls
 
 
 # logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s %(funcName)s %(lineno)s %(message)s',
@@ -46,6 +49,8 @@ startSubRe = re.compile(r'.*?(?=^CMDSTART)', flags=re.MULTILINE | re.DOTALL)
 endSubRe = re.compile(r'CMDEND.*', flags=re.MULTILINE | re.DOTALL)
 #Unparse the command string
 unParseCmd = re.compile(r'echo CMDSTART &&(.*)&& echo CMDEND')
+# The start and end markers printed around each child of a pipelined queue. The end marker carries the exit status.
+pipelineMarkerRe = re.compile(r'^==LDTK:(\w+):(\d+):(?:S|E:(\d+))==$')
 
 
 class CommandData(object):
@@ -66,10 +71,18 @@ class CommandData(object):
     timeout: Union[int, float] = None
     __PRIORITY__: int = 10
     __OBJECTLOCK__: RLock = None
+    __DONELOCK__: RLock = None
+    __CANCELLOCK__: RLock = None
     kwargs: dict = {}
     args: tuple = ()
     EnvironmentObject: Optional[EnvironmentControls] = None
     _EnvironmentObjectBackup: Optional[EnvironmentControls] = None
+    ExecChannel: Any = None
+    _runningChannel: Any = None
+    cancelled: bool = False
+    _pipelineResults: Optional[tuple] = None
+    stderr: Optional[str] = None
+    exitStatus: Optional[int] = None
     root: bool = None
     tki = None
     _tkiBackup = None
@@ -77,11 +90,14 @@ class CommandData(object):
     _completionEvent: Event = None
     _stopOnFailure: bool = None
     _timeoutExceptions: bool = None
+    longRunning: bool = False
     rawResults: str = None
+    metrics: CommandMetrics = None
+    _doneCallbacks: list = None
 
     def __init__(self, timeout: Union[int, float] = 300, root: bool = None, event: Optional[MultiEvent] = None,
                  noParsing: Optional[bool] = None, stopOnFailure: Optional[bool] = None,
-                 timeoutExceptions: Optional[Exception] = None, *args, **kwargs):
+                 timeoutExceptions: Optional[Exception] = None, longRunning: Optional[bool] = None, *args, **kwargs):
         """ The bottom level parent. All other classes inherit this class down the chain.
 
         - :param timeout: This is the global timeout for encompassing all actions taken on or in this CommandObject.
@@ -90,6 +106,7 @@ class CommandData(object):
         - :param noParsing: do not parse results using the default methods
         - :param stopOnFailure: stop queue or unthreaded execution, or prevent completion tasks if an error occurs
         - :param timeoutExceptions: return an exception instead of None if something times out
+        - :param longRunning: the scheduler keeps the reserved sessions free of this command while it is queued
         - :return:
         """
 
@@ -98,11 +115,16 @@ class CommandData(object):
             self.timeout = 300
         self.__OBJECTLOCK__ = RLock()
         self.__LASTRESULTSLOCK__ = RLock()
+        self.__DONELOCK__ = RLock()
+        self.__CANCELLOCK__ = RLock()
+        self._doneCallbacks = []
+        self.metrics = CommandMetrics(moduleName=kwargs.get('moduleName'))
         self.args = args
         self.kwargs = kwargs
         self.noParsing = noParsing is True
         self._stopOnFailure = stopOnFailure is True
         self._timeoutExceptions = timeoutExceptions is True
+        self.longRunning = longRunning is True
         if not self.tki:
             self.tki = self._tkiBackup = kwargs.get('tki', {})
         if root is None:
@@ -143,6 +165,45 @@ class CommandData(object):
             return True
         return False
 
+    def addDoneCallback(self, func: Callable) -> None:
+        """ Adds a function that is called with this CommandContainer once it has completed. If the container has
+            already completed the function is called right away. The function is called on the thread that completed
+            the container so it should be quick and thread safe.
+
+        - :param func: (Callable) This is passed the CommandContainer.
+        """
+
+        with self.__DONELOCK__:
+            if not self.complete:
+                self._doneCallbacks.append(func)
+                return
+        func(self)
+
+    def removeDoneCallback(self, func: Callable) -> bool:
+        """ Removes a function added by 'addDoneCallback' that has not been called yet.
+
+        - :param func: (Callable)
+        - :return: (bool) True if the function was removed.
+        """
+
+        with self.__DONELOCK__:
+            if func in self._doneCallbacks:
+                self._doneCallbacks.remove(func)
+                return True
+        return False
+
+    def _runDoneCallbacks(self) -> None:
+        """ Calls and clears every function added by 'addDoneCallback' """
+
+        with self.__DONELOCK__:
+            callbacks, self._doneCallbacks = self._doneCallbacks, []
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception as e:
+                log.error(f'ERROR: for done callback: {self.commandKey} : {e}')
+                log.debug(f'[DEBUG] for done callback: {traceback.format_exc()}')
+
     def forceComplete(self, results: Optional[Any] = None) -> ForceCompleteException:
         """ Force completion for the parent container and all children without changing the results.
             Utility method to be used on a fully initialized command container.
@@ -164,6 +225,7 @@ class CommandData(object):
         self.tki = None
         self._EnvironmentObjectBackup = self.EnvironmentObject
         self.EnvironmentObject = None
+        self._runDoneCallbacks()
         return ForceCompleteException(results, baseException=results)
 
     # noinspection PyUnresolvedReferences
@@ -184,8 +246,15 @@ class CommandData(object):
         self.parsed = False
         self.running = False
         self.complete = False
+        self.metrics.reset()
         self.tki = self._tkiBackup
         self.EnvironmentObject = self._EnvironmentObjectBackup
+        self.ExecChannel = None
+        self._runningChannel = None
+        self.cancelled = False
+        self._pipelineResults = None
+        self.stderr = None
+        self.exitStatus = None
         try:
             self.setRequirementsFailureCondition(self.requirementsFailureCondition)
         except:
@@ -845,6 +914,8 @@ class CommandSetup(CommandRequirements):
         """
 
         self.EnvironmentObject = self._EnvironmentObjectBackup = kwargs.get('EnvironmentObject')
+        self.ExecChannel = kwargs.get('ExecChannel')
+        self._pipelineResults = kwargs.get('PipelineResults')
         if self.EnvironmentObject:
             self.EnvironmentObject.commandObject = self
             if self.root:
@@ -877,6 +948,11 @@ class CommandContainer(CommandSetup):
         Just remember to use CommandContainer if manually creating CommandObjects.
     """
 
+    # Any of these kwargs means the command depends on the state of a shell environment
+    __SHELLKWARGS__ = ('EnvironmentObject', 'EnvironmentID', 'label', 'unsafe', 'prompt', 'reCapturePrompt')
+    # The phases that stop the execution once the container is cancelled. The finalize phases still run.
+    __CANCELPHASES__ = ('requirements', 'preparser', 'execution')
+
     startTime: float = None
     endTime: float = None
 
@@ -921,6 +997,101 @@ class CommandContainer(CommandSetup):
         self.complete = True
         self.running = False
         log.debug(f'CommandObject completed: {self.commandKey} : {self._command}')
+        self._runDoneCallbacks()
+
+    def __await__(self):
+        return self.asyncWaitForResults().__await__()
+
+    def expire(self) -> CommandContainer:
+        """ Fails this container without executing it. This is used by the sshTaskScheduler when the timeout of the
+            container passed while it was still queued.
+
+        - :return: this container
+        """
+
+        log.warning(f'CommandObject expired before it was executed: {self.commandKey}')
+        with self:
+            self.startTime = self.endTime = time.time()
+            self.results = TimeoutException(f'CommandObject expired before it was executed: {self.commandKey}')
+            self.forceComplete()
+            self._recordMetrics()
+        return self
+
+    def cancel(self, wait: Optional[Union[int, float]] = 10) -> bool:
+        """ Stops this container and all of its children. A container that has not started is never executed. A
+            running command is interrupted with Ctrl-C (an exec channel is closed instead) and the command reads up to
+            the prompt as usual so the environment goes back to the pool right away. If the prompt does not come back
+            within 'wait' seconds the channel is closed. The results become a CancelledException.
+
+        - :param wait: (int/float) default 10. How long to wait for the prompt after the interrupt. 0 does not wait or
+            close the channel.
+        - :return: (bool) True if a running command was interrupted.
+        """
+
+        interrupted = [container for container in self._cancelTree() if container._interrupt()]
+        if not wait:
+            return bool(interrupted)
+        endTime = time.time() + wait
+        for container in interrupted:
+            while container._runningChannel is not None and time.time() < endTime:
+                time.sleep(.1)
+            with container.__CANCELLOCK__:
+                channel = container._runningChannel
+                if channel is not None:
+                    log.warning(f'The prompt did not come back after cancelling: {container.commandKey}. '
+                                f'Closing channel')
+                    channel.close()
+        return bool(interrupted)
+
+    def _cancelTree(self) -> List[CommandContainer]:
+        """ Marks this container and its children as cancelled and completes the ones that have not started. The flag
+            is set under the same lock '_runOnChannel' checks it with so a command is either never sent or its channel
+            is recorded for '_interrupt'.
+        """
+
+        log.info(f'Cancelling CommandObject: {self.commandKey}')
+        with self.__CANCELLOCK__:
+            self.cancelled = True
+        containers = [self]
+        for child in self.children or []:
+            containers.extend(child._cancelTree())
+        if not self.running and not self.complete:
+            self.results = CancelledException(f'CommandObject was cancelled before it was executed: {self.commandKey}')
+            self.forceComplete()
+        return containers
+
+    def _interrupt(self) -> bool:
+        """ Interrupts the command running on the channel recorded by '_runOnChannel' if there is one. The lock is held
+            while sending so the interrupt can not reach the next command that runs on the same environment.
+        """
+
+        with self.__CANCELLOCK__:
+            channel = self._runningChannel
+            if channel is None:
+                return False
+            try:
+                if channel is self.ExecChannel:
+                    channel.close()
+                else:
+                    channel.sendall('\x03')
+                return True
+            except Exception as e:
+                log.error(f'ERROR: failed to interrupt CommandObject: {self.commandKey}: {e}')
+                log.debug(f'[DEBUG] for _interrupt: {traceback.format_exc()}')
+                return False
+
+    def _runOnChannel(self, channel: Any, func: Callable, *args, **kwargs) -> Any:
+        """ Calls 'func' while recording the channel the command is running on so 'cancel' can interrupt it. """
+
+        with self.__CANCELLOCK__:
+            if self.cancelled:
+                return CancelledException(f'CommandObject was cancelled before it was executed: {self.commandKey}')
+            self._runningChannel = channel
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self.__CANCELLOCK__:
+                self._runningChannel = None
 
     def __str__(self):
         return str(self.commandKey)
@@ -946,21 +1117,41 @@ class CommandContainer(CommandSetup):
                       f"{self.commandKey} : {self.command} : {[c.commandKey for c in self.children]} ===== ")
             # Run requirements and preparser and abort if an exception is found
             self.startTime = time.time()
-            if self.setLastResults(self.runCommandSetup(**kwargs)):
-                if self.setLastResults(self.runRequirements(), phase='requirements'):
-                    if self.setLastResults(self._preparserRunner(), phase='preparser'):
+            timed = self.metrics.timed
+            if self.setLastResults(timed('setup', self.runCommandSetup, **kwargs)):
+                if self.setLastResults(timed('requirements', self.runRequirements), phase='requirements'):
+                    if self.setLastResults(timed('preparser', self._preparserRunner), phase='preparser'):
                         # Decision tree for which mode to execute in. Threaded/UnThreaded or unknown
                         if self.EnvironmentObject is not None or self.children:
-                            self.setLastResults(self._executorThreadHelper(), phase='execution')
+                            self.setLastResults(timed('execution', self._executorThreadHelper), phase='execution')
+                        elif self._pipelineResults is not None:
+                            self.setLastResults(timed('execution', self._executorPipelinedHelper), phase='execution')
+                        elif self.ExecChannel is not None:
+                            self.setLastResults(timed('execution', self._executorExecHelper), phase='execution')
                         elif self.EnvironmentObject is None:
-                            self.setLastResults(self._executorUnThreadedHelper(), phase='execution')
+                            self.setLastResults(timed('execution', self._executorUnThreadedHelper), phase='execution')
                         else:  # Y U NO SSH or whatever thing of error
                             self.setLastResults(self._executorFailure())
         except Exception as e:  # any unexpected exceptions could be anywhere in the process
             self.setLastResults(self._processException(e))
         finally:
             self.endTime = time.time()
-            return self.finalizeExecution()
+            self.finalizeExecution()
+            self._recordMetrics()
+            return self
+
+    def _recordMetrics(self) -> None:
+        """ Records the metrics of this execution into the process wide MetricsRegistry """
+
+        try:
+            self.metrics.commandKey = self.commandKey
+            self.metrics.failure = bool(self.failure)
+            if self.EnvironmentObject is not None:
+                self.metrics.environmentID = getattr(self.EnvironmentObject, 'EnvironmentID', None)
+            metricsRegistry.record(self.metrics)
+        except Exception as e:
+            log.error(f'ERROR: for method _recordMetrics: {e}')
+            log.debug(f'[DEBUG] for method _recordMetrics: {traceback.format_exc()}')
 
     def _executorThreadHelper(self) -> Union[str, dict, Exception]:
         """ Attempts to execute threaded commands in a batch or a queue, or a single threaded command.
@@ -970,13 +1161,17 @@ class CommandContainer(CommandSetup):
 
         if self.command is not None:
             log.info(f"CommandObject has one threaded command: {self.commandKey} with kwargs: {self.kwargs}")
-            return self.EnvironmentObject.executeOnEnvironment(cmd=self.command, **self.kwargs)
+            return self._runOnChannel(self.EnvironmentObject, self.EnvironmentObject.executeOnEnvironment,
+                                      cmd=self.command, metrics=self.metrics, **self.kwargs)
         if len(self.children) > 0:
             log.info(f"CommandObject has threaded children: {self.commandKey} : {self.children} ")
             if type(self.children) is set:
                 log.debug(f'CommandObject running batched children: {self.commandKey} : {self.children} ')
                 return self._executorHelper()
             if type(self.children) is list:
+                if self.usePipeline:
+                    log.debug(f'CommandObject running pipelined children: {self.commandKey} : {self.children} ')
+                    return self._executorPipelineHelper()
                 log.debug(f'CommandObject running queued children: {self.commandKey} : {self.children} ')
                 return self._executorHelper(_queue=True)
             log.error(f"ERROR: CommandObject format of child data is invalid: {self.commandKey} : {self.children} ")
@@ -984,6 +1179,20 @@ class CommandContainer(CommandSetup):
                                        f'{self.commandKey} : {self.children}')
         return self._executorFailure()
 
+    def _executorExecHelper(self) -> Union[str, bytes]:
+        """ Executes a single command on the exec channel given to the executor. The stderr and exit status of the
+            command are kept on the container.
+
+        - :return: string (or bytes if the 'binary' kwarg is True)
+        """
+
+        log.info(f"CommandObject has one exec channel command: {self.commandKey}")
+        results, self.stderr, self.exitStatus = self._runOnChannel(self.ExecChannel,
+                                                                   self.tki.sshCon.executeOnExecChannel,
+                                                                   self.ExecChannel, self.command,
+                                                                   metrics=self.metrics, **self.kwargs)
+        return results
+
     def _executorUnThreadedHelper(self) -> Union[str, dict, Exception]:
         """ Attempts to execute on the main ssh channel one command at a time.
 
@@ -993,9 +1202,12 @@ class CommandContainer(CommandSetup):
         if self.command is not None:
             log.info(f"CommandObject has one unthreaded command: {self.commandKey}")
             with self.tki.sshCon.mainEnvironment as env:
-                return self.tki.sshCon.executeOnEnvironment(env, self.command, **self.kwargs)
+                return self._runOnChannel(env, self.tki.sshCon.executeOnEnvironment, env, self.command,
+                                          metrics=self.metrics, **self.kwargs)
         if len(self.children) > 0:
             log.info(f"CommandObject has unthreaded children: {self.commandKey} : {self.children} ")
+            if self.usePipeline:
+                return self._executorPipelineHelper(threading=False)
             return self._executorHelper(threading=False)
         return self._executorFailure()
 
@@ -1041,6 +1253,85 @@ class CommandContainer(CommandSetup):
         if self.children:
             return self._waitForChildren(wait=_endTime - time.time())
 
+    def _executorPipelineHelper(self, threading: bool = True) -> Union[dict, Exception]:
+        """ Runs every child of a queue on one environment with a single send instead of one round trip per child. Each
+            child is wrapped in start and end markers with the exit status so the output can be split back up. Each
+            child is then executed with its part of the output so its own parsers run as usual. The children run one
+            after another so the queue waits for the longest timeout of its children rather than the sum of them.
+
+        - :param threading: (bool) default True. If False the main environment is used.
+        - :return: dict, exception on error
+        """
+
+        uid = uuid.uuid4().hex[:12]
+        timeout = max([c.timeout for c in self.children], default=0) or self.timeout
+        EnvironmentObject = self.kwargs.get('EnvironmentObject')
+        if EnvironmentObject is not None:
+            output = self._pipelineSend(EnvironmentObject, uid, timeout, threading)
+        else:
+            if threading:
+                EnvironmentObject = self.tki.sshCon.getEnvironment(True, wait=timeout)
+            else:
+                EnvironmentObject = self.tki.sshCon.mainEnvironment
+            if not EnvironmentObject:
+                return ExecutionException(f'No environment was available for the pipelined queue: {self.commandKey}')
+            with EnvironmentObject as env:
+                output = self._pipelineSend(env, uid, timeout, threading)
+        outputs = CommandContainer._pipelineDemux(output, uid)
+        for index, child in enumerate(self.children):
+            results = outputs.get(index)
+            if results is None:
+                results = (TimeoutException(f'Pipelined child command did not finish: '
+                                            f'{self.commandKey} : {child.commandKey}'), None)
+            genericCmdModule.GenericCmdModule.cmdObjBinder(child, child.commandKey, self, True, tki=self.tki)
+            with child:
+                child.executor(tki=self.tki, PipelineResults=results)
+        return self._waitForChildren(wait=timeout)
+
+    def _pipelineSend(self, env: EnvironmentControls, uid: str, timeout: Union[int, float], threading: bool) -> str:
+        """ Writes the children as one brace group so the shell reads all of them before running any and only prints
+            the prompt once at the end. The markers are printed with printf so the echo of the group never matches.
+            Each child runs in a subshell so an 'exit' only ends that child and not the shell of the environment.
+        """
+
+        if threading and (self.root or any(child.root for child in self.children)):
+            env.becomeRoot()
+        lines = ['{']
+        for index, child in enumerate(self.children):
+            lines.append(f"printf '\\n==LDTK:%s:%s:S==\\n' {uid} {index}")
+            lines.extend(['(', child.command, ')'])
+            lines.append(f"printf '\\n==LDTK:%s:%s:E:%s==\\n' {uid} {index} $?")
+        lines.append('}')
+        return self._runOnChannel(env, env.executeOnEnvironment, cmd='\n'.join(lines), metrics=self.metrics,
+                                  runTimeout=timeout)
+
+    @staticmethod
+    def _pipelineDemux(output: Optional[str], uid: str) -> dict:
+        """ Splits the output of '_pipelineSend' into {child index: (output, exit status)}. A child that has no end
+            marker is left out.
+        """
+
+        results, current, lines = {}, None, []
+        for line in (output or '').splitlines():
+            match = pipelineMarkerRe.match(line.strip())
+            if match is None or match.group(1) != uid:
+                if current is not None:
+                    lines.append(line)
+                continue
+            index = int(match.group(2))
+            if match.group(3) is None:
+                current, lines = index, []
+            elif current == index:
+                results[index] = ('\n'.join(lines), int(match.group(3)))
+                current = None
+        return results
+
+    def _executorPipelinedHelper(self) -> Any:
+        """ Used by a child of a pipelined queue. The output was already gathered by the parent. """
+
+        results, self.exitStatus = self._pipelineResults
+        return results
+
     def _executorFailure(self) -> Exception:
         """ Simply returns an exception when the executor encounters a (usually) internal issue. """
 
@@ -1068,6 +1359,36 @@ class CommandContainer(CommandSetup):
         if self._timeoutExceptions:
             return TimeoutException(f'Command timed out waiting for results: {self.commandKey}')
 
+    async def asyncWaitForResults(self, wait: Optional[Union[float, int]] = None) -> Union[str, dict, Exception]:
+        """ The asyncio version of 'waitForResults'. This does not block a thread while waiting. Instead it registers a
+            done callback that wakes up the awaiting task on its event loop. The callback is removed again if the wait
+            times out. Awaiting the CommandContainer itself does the same thing: 'results = await cc'.
+
+        - :param wait: defaults to the timeout attribute of the container
+        """
+
+        if wait is None or wait is True:
+            wait = self.kwargs.get('wait', self.timeout) or self.timeout
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def _setFuture(cmdObj):
+            if not future.done():
+                future.set_result(cmdObj)
+
+        def _wakeUp(cmdObj):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_setFuture, cmdObj)
+
+        self.addDoneCallback(_wakeUp)
+        try:
+            await asyncio.wait_for(future, wait)
+        except asyncio.TimeoutError:
+            self.removeDoneCallback(_wakeUp)
+            if self._timeoutExceptions:
+                return TimeoutException(f'Command timed out waiting for results: {self.commandKey}')
+        return self.results
+
     def _waitForChildren(self, wait: Optional[Union[float, int]] = None) -> Union[str, dict, Exception]:
         """ Private method to wait for just the children so the parent knows when to proceed """
 
@@ -1104,6 +1425,8 @@ class CommandContainer(CommandSetup):
         if phase and self.startTime is not None and time.time() > self.startTime + self.timeout:
             log.debug(f'CommandObject timed out during phase: {self.commandKey} : {phase}')
             raise TimeoutException(f"CommandObject timed out during phase: {self.commandKey} : {phase}")
+        if self.cancelled and phase in self.__CANCELPHASES__:
+            raise CancelledException(f"CommandObject was cancelled during phase: {self.commandKey} : {phase}")
         if self.failure:
             return False
         return True
@@ -1196,11 +1519,12 @@ class CommandContainer(CommandSetup):
         try:
             if self._stopOnFailure:
                 if not self.failure:
-                    if self.setLastResults(self._parseResults(), phase='finalizeOnFailure'):
-                        self.performComplete()
+                    if self.setLastResults(self.metrics.timed('postparser', self._parseResults),
+                                           phase='finalizeOnFailure'):
+                        self.metrics.timed('completion', self.performComplete)
             else:
-                self.setLastResults(self._parseResults(), phase='finalize')
-                self.performComplete()
+                self.setLastResults(self.metrics.timed('postparser', self._parseResults), phase='finalize')
+                self.metrics.timed('completion', self.performComplete)
         except Exception as e:
             self.setLastResults(self._processException(e), phase='finalizeOnException')
         finally:
@@ -1238,6 +1562,8 @@ class CommandContainer(CommandSetup):
             log.debug(f'The preRunner failed for CommandObject with preparser and requirements: '
                       f'{self.commandKey} : {str(self._preparser)} : {str(self.requirements)}')
             e = _disconnectHelper()
+        elif objectType == CancelledException:
+            log.info(f'CommandObject was cancelled: {self.commandKey}')
         elif objectType == RuntimeError:
             log.error(f'A runtime error occurred when attempting to gain the lock on an object\n'
                       f'The commandKey is: {self.commandKey}\nThe preparser is: {str(self._preparser)}'
@@ -1250,6 +1576,34 @@ class CommandContainer(CommandSetup):
             log.debug(f"Error occurred: {self.commandKey}.\nError: {e}\n{traceback.format_exc()}\n")
         return e
 
+    @property
+    def useExecChannel(self) -> bool:
+        """ True if the command can run on its own exec channel without a PTY instead of in a shell environment. That
+            is a single command without children that does not need root, an environment, a label or a custom preparser
+            or completion task (which is where escalation happens). The 'execMode' argument must be 'auto'.
+        """
+
+        if self.children or not isinstance(self.command, str) or self.root:
+            return False
+        if '_preparser' in self.__dict__ or '_onComplete' in self.__dict__:
+            return False
+        if any(self.kwargs.get(key) for key in self.__SHELLKWARGS__):
+            return False
+        return getattr(getattr(self.tki, 'arguments', None), 'execMode', 'shell') == 'auto'
+
+    @property
+    def usePipeline(self) -> bool:
+        """ True if this queue was created with the 'pipeline' kwarg and every child can be sent in one write. That is
+            a single command without children, requirements, a custom preparser or completion task or any shell kwargs.
+            A queue with 'stopOnFailure' is never pipelined as each child has to be checked before the next is sent.
+        """
+
+        if not self.kwargs.get('pipeline') or self._stopOnFailure or type(self.children) is not list:
+            return False
+        return all(isinstance(child.command, str) and not child.children and not child.requirements and
+                   '_preparser' not in child.__dict__ and '_onComplete' not in child.__dict__ and
+                   not any(child.kwargs.get(key) for key in self.__SHELLKWARGS__) for child in self.children)
+
     @property
     def executionLength(self):
         try:
@@ -3,11 +3,12 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.2.0
+# Version: 0.3.0
 # Date: 7/12/16
 # Description: This is a module for using the du command.
 
 
+import heapq
 import logging
 from LinuxModules.genericCmdModule import GenericCmdModule
 from PyCustomParsers.GenericParsers import BashParser
@@ -42,26 +43,40 @@ class duModule(GenericCmdModule):
         self.requireFlags = True
 
     def run(self, flags=None, parseOutput=False, maxLines=0, sort=False, **kwargs):
+        """ Runs du with the flags. If 'maxLines' is set only that many lines are selected on the remote machine (the
+            largest if 'sort' is True) so only 'maxLines' lines are transferred.
+
+        - :param flags: (str) passed to du. IE: '-s /var/*'
+        - :param parseOutput: (bool) default False. Converts the SIZE column to bytes.
+        - :param maxLines: (int) default 0. The amount of lines returned. 0 returns every line.
+        - :param sort: (bool) default False. Sort by size largest first.
+        - :return: BashParser
+        """
 
         refreshData = True if self else None
 
         def parseFilesystemOutput(results, **kwargs):
-            def _filterResults(line):
-                if self.checkString.search(line):
-                    return line
-            results = "\n".join(filter(_filterResults, results.strip().splitlines()))
+            lines = [line for line in results.strip().splitlines() if self.checkString.search(line)]
+            if sort:
+                lines = heapq.nlargest(maxLines or len(lines), lines, key=duModule._lineSize)
+            elif maxLines:
+                lines = lines[:maxLines]
 
             obj = BashParser(strFormat=self._duStrFormat, columns=self._duTemplate, header=self._duHeader)
-            if maxLines and maxLines < len(obj) + 1:
-                obj.parse(source=results[:maxLines + 1], refreshData=True)
-            else:
-                obj.parse(source=results, refreshData=refreshData)
-            if sort:
-                obj.sort_by_column('SIZE', column_type=int, reverse=True)
+            obj.parse(source="\n".join(lines), refreshData=refreshData)
             if parseOutput:
                 return obj.convert_results_to_bytes(obj, columnList=['SIZE'], _baseSize='K')
             return obj
 
+        if maxLines and isinstance(flags, str):
+            flags += self.topNPipe(maxLines, sort=sort)
         self.defaultKwargs = {'postparser': parseFilesystemOutput}
         kwargs.setdefault('useDefaultParsing', kwargs.pop('useDefaultParsing', parseOutput) or parseOutput)
         return super(duModule, self).run(flags, **kwargs)
+
+    @staticmethod
+    def _lineSize(line):
+        try:
+            return int(line.split(None, 1)[0])
+        except (ValueError, IndexError):
+            return 0
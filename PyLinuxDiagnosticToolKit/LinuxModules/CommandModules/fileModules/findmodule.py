@@ -3,11 +3,12 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.2.0
+# Version: 0.3.0
 # Date: 7/12/16
 # Description: This is a module for using the find command.
 
 
+import heapq
 import logging
 from LinuxModules.genericCmdModule import GenericCmdModule
 from PyCustomParsers.GenericParsers import BashParser
@@ -42,24 +43,41 @@ class findModule(GenericCmdModule):
         self.requireFlags = True
 
     def listLargestFilesOnFilesystem(self, filesystem, head=30, sort=True, **kwargs):
-        def parseFindOutput(results, **kwargs):
-            def _filterResults(line):
-                if self.checkString.search(line):
-                    return line
+        """ Lists the files on a filesystem with their size. If 'head' is set only that many files are selected on the
+            remote machine (the largest if 'sort' is True) so only 'head' lines are transferred.
 
-            results = "\n".join(filter(_filterResults, results.strip().splitlines()))
+        - :param filesystem: (str) The mount point to search. This does not cross into other filesystems.
+        - :param head: (int) default 30. The amount of files returned. 0 or None returns every file.
+        - :param sort: (bool) default True. Sort by size largest first.
+        - :param kwargs: passed to 'run'
+        - :return: BashParser
+        """
 
-            obj = BashParser(strFormat=self._findStrFormat, columns=self._findColumns, header=self._findHeader)
-            obj.parse(source=results, refreshData=True)
+        def parseFindOutput(results, **kwargs):
+            lines = [line for line in results.strip().splitlines() if self.checkString.search(line)]
             if sort:
-                obj.sort_by_column('SIZE', column_type=int, reverse=True)
-            if head and head < len(obj) + 1:
-                obj.parse(source=results[:head + 1], refreshData=True)
+                lines = heapq.nlargest(head or len(lines), lines, key=findModule._lineSize)
+            elif head:
+                lines = lines[:head]
+
+            obj = BashParser(strFormat=self._findStrFormat, columns=self._findColumns, header=self._findHeader)
+            obj.parse(source="\n".join(lines), refreshData=True)
             return obj.convert_results_to_bytes(obj, columnList=['SIZE'], _baseSize='B')
 
         kwargs.update({'postparser': parseFindOutput})
-
-        return super(findModule, self).run(f'{filesystem} ' + "-mount -type f -ls | awk '{print $7,$NF}'", **kwargs)
+        kwargs.setdefault('longRunning', True)
+
+        command = f'{filesystem} ' + "-mount -type f -ls 2> /dev/null | awk '{print $7,$NF}'"
+        if head:
+            command += self.topNPipe(head, sort=sort)
+        return super(findModule, self).run(command, **kwargs)
+
+    @staticmethod
+    def _lineSize(line):
+        try:
+            return int(line.split(None, 1)[0])
+        except (ValueError, IndexError):
+            return 0
 
 
 
@@ -39,6 +39,7 @@ class llModule(GenericCmdModule, BashParser):
         self.defaultKey = "ls%s"
         self.defaultFlags = "-l %s"
         self.requireFlags = True
+        self._remoteTZ = None
 
     # noinspection PyMethodOverriding
     def run(self, flags, parse=True, longListing=True, **kwargs):
@@ -73,8 +74,10 @@ class llModule(GenericCmdModule, BashParser):
     def _parseLSTime(self, lsOut):
         output = ""
         lsOutList = [item.split() for item in lsOut.splitlines()]
-        remoteTZ = self.tki.getModules('os').getTimeZone()
-        remoteTZ = tz.gettz(remoteTZ) if remoteTZ else tz.gettz('/etc/localtime')
+        if self._remoteTZ is None:
+            remoteTZ = self.tki.getModules('os').getTimeZone()
+            self._remoteTZ = tz.gettz(remoteTZ) if remoteTZ else tz.gettz('/etc/localtime')
+        remoteTZ = self._remoteTZ
         dp = None
 
         def _parseHelper(dpItem, tmpList):
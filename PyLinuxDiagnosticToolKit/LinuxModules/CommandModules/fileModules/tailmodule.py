@@ -3,13 +3,16 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.2.0
+# Version: 0.3.0
 # Date: 7/12/16
-# Description: This is a module for using the tail command.
+# Description: This is a module for using the tail command. It also has 'tailSince' and 'tailWindow' which use
+# LogCursors to only read the bytes appended to a log file since the last read.
 
 
+import re
 import logging
 from LinuxModules.genericCmdModule import GenericCmdModule
+from PyLinuxDiagnosticToolKit.libs.LDTKLogCursors import logCursors
 
 
 log = logging.getLogger('tailModule')
@@ -22,6 +25,23 @@ class tailModule(GenericCmdModule):
          defaultCmd: tail
          defaultFlags =
      """
+
+    # 'r start count' prints 'count' bytes of the file from the byte 'start'. 'p start count' prints how many bytes of
+    # those are a last line without a newline (IE: still being written). Only the bytes up to the last newline are read
+    # and the offset in the header is the end of them so a partial line is read whole by the next call.
+    __CURSOR_COMMAND__ = '(F="%(path)s"; X=%(maxBytes)s; r() { tail -c +$1 "$F" | head -c $2; }; ' \
+                         'p() { if [ $2 -gt 0 ] && [ $(r $1 $2 | tail -c 1 | wc -l) -eq 0 ]; ' \
+                         'then r $1 $2 | tail -n 1 | wc -c; else echo 0; fi; }; ' \
+                         'set -- $(stat -L -c "%%i %%s" "$F" 2> /dev/null); if [ -z "$1" ]; then :; ' \
+                         'elif [ "$1" = "%(inode)s" ] && [ "$2" -ge %(offset)s ] && ' \
+                         '[ $(($2 - %(offset)s)) -le $X ]; then P=$(p %(start)s $(($2 - %(offset)s))); ' \
+                         'echo "==LDTK:$1:$(($2 - P)):delta=="; r %(start)s $(($2 - %(offset)s - P)); ' \
+                         'elif [ "%(inode)s" != "-" ] && [ "$2" -le $X ]; then P=$(p 1 $2); ' \
+                         'echo "==LDTK:$1:$(($2 - P)):reset=="; r 1 $(($2 - P)); ' \
+                         'else S=$(($2 > $X ? $2 - $X + 1 : 1)); P=$(p $S $(($2 - S + 1))); ' \
+                         'echo "==LDTK:$1:$(($2 - P)):full=="; r $S $(($2 - S + 1 - P)) | tail -n %(lines)s; fi)'
+    __CURSOR_REGEX__ = re.compile(r'^==LDTK:(\d+):(\d+):(delta|reset|full)==$')
+
     def __init__(self, tki, *args, **kwargs):
         log.info("Creating tail module.")
         super(tailModule, self).__init__(tki=tki)
@@ -30,3 +50,74 @@ class tailModule(GenericCmdModule):
         self.defaultFlags = "%s"
         self.__NAME__ = "tail"
         self.requireFlags = True
+
+    def tailSince(self, logFile, lines=15000, consumer='tailSince', maxBytes=16777216, wait=120, **kwargs):
+        """
+            Returns only the lines appended to the log file since the last call with the same consumer. The first call
+            (or when more then 'maxBytes' was appended) returns the last 'lines' lines like 'tail -n'. If the file was
+            rotated (new inode) or truncated (smaller size) the whole new file is returned instead. Only complete lines
+            are returned. A last line that does not end with a newline yet is returned whole by a later call.
+        - :param logFile: (str) The path of the log file.
+        - :param lines: (int) default 15000. The amount of lines read when there is no usable cursor.
+        - :param consumer: (str) default 'tailSince'. Each consumer has its own cursor for the same file.
+        - :param maxBytes: (int) default 16MB. The most bytes read as new data before falling back to 'tail -n'.
+        - :param wait: (int) default 120.
+        - :return: (str) or None on failure
+        """
+
+        results = self._tailCursor(logFile, lines, consumer, maxBytes, wait, **kwargs)
+        if results is None:
+            return None
+        return results[1]
+
+    def tailWindow(self, logFile, lines=15000, consumer='tailWindow', maxBytes=16777216, wait=120, **kwargs):
+        """
+            Returns the last 'lines' lines of the log file the same as 'tail -n' would. The lines are kept in memory
+            so that after the first call only the bytes appended since then are read from the remote machine. If the
+            file was rotated or truncated the window starts over with the new file.
+        - :param logFile: (str) The path of the log file.
+        - :param lines: (int) default 15000.
+        - :param consumer: (str) default 'tailWindow'.
+        - :param maxBytes: (int) default 16MB. The most bytes read as new data before falling back to 'tail -n'.
+        - :param wait: (int) default 120.
+        - :return: (str) or None on failure
+        """
+
+        cursor = logCursors.get(self._cursorHost(), logFile, f'{consumer}:{lines}')
+        if cursor.window is None:
+            cursor.inode = None
+        results = self._tailCursor(logFile, lines, f'{consumer}:{lines}', maxBytes, wait, **kwargs)
+        if results is None:
+            return None
+        mode, output = results
+        cursor.updateWindow(output.splitlines() if output else [], lines, reset=mode != 'delta')
+        return "\n".join(cursor.window)
+
+    def _tailCursor(self, logFile, lines, consumer, maxBytes, wait, **kwargs):
+        """
+            Helper method of 'tailSince' and 'tailWindow'. Reads the new bytes of the log file in a single command and
+            moves the cursor forward to the end of the last complete line read.
+        - :return: (tuple) of (mode, output) or None. The mode is 'delta', 'reset' or 'full'.
+        """
+
+        logCursors.loadOnce(getattr(self.tki.arguments, 'logCursorFile', None))
+        cursor = logCursors.get(self._cursorHost(), logFile, consumer)
+        offset = cursor.offset if cursor.inode is not None else 0
+        command = self.__CURSOR_COMMAND__ % {'path': logFile, 'inode': cursor.inode or '-', 'offset': offset,
+                                             'start': offset + 1, 'maxBytes': int(maxBytes), 'lines': int(lines)}
+        results = self.simpleExecute({f'tailCursor{consumer}{logFile}': command}, wait=wait, rerun=True, **kwargs)
+        if not isinstance(results, str):
+            return None
+        header, _, output = results.lstrip().partition('\n')
+        match = self.__CURSOR_REGEX__.match(header.strip())
+        if not match:
+            log.debug(f"Unable to parse the log cursor header for {logFile}: {header}")
+            return None
+        inode, size, mode = int(match.group(1)), int(match.group(2)), match.group(3)
+        if mode == 'reset':
+            log.info(f"The log file {logFile} was {'truncated' if inode == cursor.inode else 'rotated'}")
+        cursor.advance(inode, size)
+        return mode, output
+
+    def _cursorHost(self):
+        return getattr(self.tki.arguments, 'host', None) or ''
@@ -3,16 +3,18 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.1.9
+# Version: 0.2.0
 # Date: 7/12/16
-# Description: This is a module for using the lsof command.
+# Description: This is a module for using the lsof command. The output is read with 'lsof -F' (field output) into an
+# OpenFileTable which does not have to guess where the columns are and only reports the size of the file in the
+# SIZE/OFF column.
 
-'''
-TODO: This module is broken. The SIZE/OFF column can either show size in bits, offset in memory, or nothing.
-'''
 
-import logging
+import io
 import re
+import sys
+import logging
+from array import array
 from LinuxModules.genericCmdModule import GenericCmdModule
 from PyCustomParsers.GenericParsers import BashParser
 
@@ -20,12 +22,156 @@ from PyCustomParsers.GenericParsers import BashParser
 log = logging.getLogger('lsofModule')
 
 
+class OpenFileTable(object):
+    """ A read only columnar table of the output of 'lsof -F pcLftasDin'. Each open file is a row. The PID, SIZE and
+        NODE columns are stored in arrays, the short strings are interned, and there are indexes by PID and by path.
+        Files with no size (IE: sockets and pipes) have a size of -1 which is shown as 0 in the rows.
+    """
+
+    def __init__(self, results=None):
+        self.pids = array('q')
+        self.sizes = array('q')
+        self.inodes = array('q')
+        self.commands = []
+        self.users = []
+        self.fds = []
+        self.types = []
+        self.devices = []
+        self.names = []
+        self.pidIndex = {}
+        self.pathIndex = {}
+        if results:
+            self._parse(results)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _parse(self, results):
+        """ Streams the field output into the table. Each line starts with a single character field identifier. A 'p'
+            line starts a new process and an 'f' line starts a new file of that process.
+        """
+
+        intern = sys.intern
+        process = {}
+        current = None
+        for line in io.StringIO(results):
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            field, value = line[0], line[1:]
+            if field == 'p':
+                self._addFile(current, process)
+                current = None
+                process = {'p': value}
+            elif field == 'f':
+                self._addFile(current, process)
+                current = {'f': value}
+            elif current is None:
+                process[field] = intern(value)
+            else:
+                current[field] = value
+
+        self._addFile(current, process)
+
+    def _addFile(self, current, process):
+        if not current or 'p' not in process:
+            return
+        try:
+            pid = int(process['p'])
+        except ValueError:
+            return
+        intern = sys.intern
+        fd = current.get('f', '')
+        if fd.isdigit():
+            fd += current.get('a', '').strip()
+        index = len(self.names)
+        name = current.get('n', '')
+        self.pids.append(pid)
+        self.sizes.append(int(current['s']) if current.get('s', '').isdigit() else -1)
+        self.inodes.append(int(current['i']) if current.get('i', '').isdigit() else -1)
+        self.commands.append(process.get('c', ''))
+        self.users.append(process.get('L', ''))
+        self.fds.append(intern(fd))
+        self.types.append(intern(current.get('t', '')))
+        self.devices.append(intern(self._formatDevice(current.get('D', ''))))
+        self.names.append(name)
+        self.pidIndex.setdefault(pid, []).append(index)
+        self.pathIndex.setdefault(name, []).append(index)
+
+    @staticmethod
+    def _formatDevice(device):
+        """ Converts the hex device number of the 'D' field into the 'major,minor' format of the normal output. """
+
+        try:
+            number = int(device, 16)
+        except ValueError:
+            return device
+        major = ((number >> 8) & 0xfff) | ((number >> 32) & ~0xfff)
+        minor = (number & 0xff) | ((number >> 12) & ~0xff)
+        return f'{major},{minor}'
+
+    def row(self, index):
+        """ Returns a single open file as a list of strings in the same order as the lsofModule header. """
+
+        inode = self.inodes[index]
+        return [self.commands[index], str(self.pids[index]), '', '', self.users[index], self.fds[index],
+                self.types[index], self.devices[index], str(max(0, self.sizes[index])),
+                str(inode) if inode >= 0 else '', self.names[index]]
+
+    def rows(self, indexes=None):
+        if indexes is None:
+            indexes = range(len(self))
+        return [self.row(index) for index in indexes]
+
+    def byPid(self, pid):
+        try:
+            return list(self.pidIndex.get(int(pid), []))
+        except (TypeError, ValueError):
+            return []
+
+    def byPath(self, path):
+        return list(self.pathIndex.get(path, []))
+
+    def deleted(self):
+        """ Returns the indexes of regular files that have been deleted but are still open. """
+
+        return [index for index, name in enumerate(self.names)
+                if name.endswith('(deleted)') and self.types[index] == 'REG']
+
+    def deletedReport(self):
+        """ Aggregates the deleted but still open files by path. The same file open by many processes (or many times)
+            is only counted once.
+
+        - :return: (list) of dicts with the keys 'name', 'size', 'device', 'node', 'pids' and 'commands' sorted by
+            size largest first.
+        """
+
+        report = {}
+        for index in self.deleted():
+            name = self.names[index][:-len('(deleted)')].rstrip()
+            item = report.get((self.devices[index], self.inodes[index], name))
+            if item is None:
+                item = report[(self.devices[index], self.inodes[index], name)] = {
+                    'name': name, 'size': max(0, self.sizes[index]), 'device': self.devices[index],
+                    'node': self.inodes[index], 'pids': [], 'commands': []}
+            item['size'] = max(item['size'], self.sizes[index])
+            if self.pids[index] not in item['pids']:
+                item['pids'].append(self.pids[index])
+                item['commands'].append(self.commands[index])
+        return sorted(report.values(), key=lambda item: item['size'], reverse=True)
+
+    def toBashParser(self, indexes=None, header=None):
+        """ Returns the rows as a BashParser with the lsof header. """
+
+        return BashParser(source=[list(header or lsofModule._lsofHeader)] + self.rows(indexes), header=1, head=1)
+
+
 class lsofModule(GenericCmdModule, BashParser):
     """
         lsofModule class. This class inherits both GenericCmdModule and BashParser. It is used to execute the Linux
         command 'lsof' on remote machines.
         defaultCmd: lsof
-        defaultFlags = -w -S 2
+        defaultFlags = -w -S 2 -F pcLftasDin
     """
 
     _lsofStrFormat = '{0:<[0]}{1:<[1]}{2:<[2]}{3:<[3]}{4:<[4]}{5:<[5]}{6:<[6]}{7:<[7]}{8:<[8]}{9:<[9]}{10:<}'
@@ -40,13 +186,15 @@ class lsofModule(GenericCmdModule, BashParser):
                                                strFormat=self._lsofStrFormat)
         # super(GenericCmdModule, self).__init__(header=0)
         self.defaultCmd = 'lsof '
-        self.defaultKey = "lsofwS3"
-        self.defaultFlags = "-w -S 2"
+        self.defaultKey = "lsofwS2F"
+        self.defaultFlags = "-w -S 2 -F pcLftasDin"
         self.__NAME__ = "lsof"
+        self.openFileTable = None
 
     def run(self, flags=None, rerun=True, **kwargs):
         def _formatOutput(results, *args, **kwargs):
-            self.parse(source=self._lsofBasicFormatter(results), **kwargs)
+            self.openFileTable = OpenFileTable(results)
+            self.parse(source=[list(self._lsofHeader)] + self.openFileTable.rows(), **kwargs)
             return self
 
         command = {flags or self.defaultKey: self.defaultCmd + (flags or self.defaultFlags)}
@@ -85,27 +233,52 @@ class lsofModule(GenericCmdModule, BashParser):
         - :param filesystem: (str) a filesystem
         - :param rerun: (bool) default False
         - :param kwargs: passed directly to 'simpleExecute'
-        - :return:
+        - :return: OpenFileTable. Use 'toBashParser' for the old BashParser output.
         """
 
-        def parseDeletedFiles(results, *args, **kwargs):
-            return BashParser(source=self._lsofBasicFormatter(re.sub(r'\s+(?=\(deleted\))', '', results,
-                                                                     flags=re.MULTILINE | re.DOTALL)),
-                              header=1, head=1)
+        def parseOpenFiles(results, *args, **kwargs):
+            return OpenFileTable(results)
 
         kwargs['wait'] = kwargs.get('wait', 120)
 
-        return self.simpleExecute(commandKey=f'lsofsf{filesystem}', command=f'lsof -s +f -- {filesystem}',
-                                  postparser=parseDeletedFiles, rerun=rerun, **kwargs)
+        return self.simpleExecute(commandKey=f'lsofsfF{filesystem}',
+                                  command=f'lsof -w -F pcLftasDin +f -- {filesystem}',
+                                  postparser=parseOpenFiles, rerun=rerun, **kwargs)
 
-    def getOpenDeletedFiles(self):
+    def getOpenDeletedFiles(self, **kwargs):
         """ Finds any files that have been deleted but not yet closed and thus stuck in the (deleted) state
 
-        - :return:
+        - :return: BashParser
         """
-        # return self.search_by_column('TYPE', 'REG').search_by_column('NAME', '(deleted)', explicit=False)
+
+        self.verifyNeedForRun(**kwargs)
+        if self.openFileTable is not None:
+            return self.openFileTable.toBashParser(self.openFileTable.deleted())
         return self.correlation(('TYPE', 'REG', True, False), ('NAME', '(deleted)', False, False), convert=True)
 
+    def getOpenDeletedFilesReport(self, **kwargs):
+        """ Aggregates the deleted but still open files by path with the total size and the processes holding them.
+
+        - :return: (list) of dicts. See 'OpenFileTable.deletedReport'.
+        """
+
+        self.verifyNeedForRun(**kwargs)
+        if self.openFileTable is None:
+            return []
+        return self.openFileTable.deletedReport()
+
+    def getOpenFilesByPath(self, path, **kwargs):
+        """ Returns the open files with this exact path using the path index.
+
+        - :param path: (str)
+        - :return: BashParser
+        """
+
+        self.verifyNeedForRun(**kwargs)
+        if self.openFileTable is None:
+            return None
+        return self.openFileTable.toBashParser(self.openFileTable.byPath(path))
+
     def lsofConvertResultsToBytes(self, results=None):
         """ Coverts the 'SIZE/OFF' column in the lsof output to Bytes.
 
@@ -131,7 +304,7 @@ class lsofModule(GenericCmdModule, BashParser):
         if not maxLines and not formatColumns:
             return self.lsofConvertResultsToBytes(self.getOpenDeletedFiles().sort_by_column('SIZE/OFF', column_type=int,
                                                                                             reverse=True)
-                                                  ).format_output().replace('(deleted)', ' (deleted)')
+                                                  ).format_output()
 
         openDeletedFiles = self.getOpenDeletedFiles().sort_by_column('SIZE/OFF', column_type=int, reverse=True)
         if formatColumns:
@@ -139,57 +312,4 @@ class lsofModule(GenericCmdModule, BashParser):
         if maxLines and maxLines < len(openDeletedFiles) + 1:
             openDeletedFiles.parse(source=openDeletedFiles[:maxLines + 1], refreshData=True)
 
-        return self.lsofConvertResultsToBytes(openDeletedFiles).format_output().replace('(deleted)', ' (deleted)')
-
-    @staticmethod
-    def _lsofBasicFormatter(results):
-        """
-            Best effort formatting for standard lsof output that returns a list of lists
-            Expects either a string or a list of lists as input
-        """
-
-        def calc_seperaters(line):
-            cSep = []
-            num = 1
-            activeCol = ""
-            for col in line:
-                if not col:
-                    num += 1
-                    continue
-                cSep.append((activeCol, num + len(activeCol)))
-                activeCol = col
-                num = 1
-            else:
-                if activeCol:
-                    cSep.append((activeCol, num + len(activeCol)))
-            return cSep
-
-        def buildNewLine(line, sSep):
-            activeSepIndex = 0
-            activeNum = sSep[activeSepIndex][1]
-            num = 0
-            newLine = []
-            for word in line:
-                if not word:
-                    num += 1
-                    if num > activeNum:
-                        newLine.append('--')
-                        activeSepIndex += 1
-                        if activeSepIndex >= len(sSep):
-                            break
-                        activeNum = sSep[activeSepIndex][1]
-                        num = 0
-                    continue
-                if word:
-                    newLine.append(word)
-                    num = 0
-                    activeSepIndex += 1
-                    if activeSepIndex >= len(sSep):
-                        break
-                    activeNum = sSep[activeSepIndex][1]
-            return newLine
-
-        results = [line.strip().split(' ') for line in results.splitlines()]
-        cSep = calc_seperaters(results[0])
-
-        return [buildNewLine(line, cSep) for line in results]
+        return self.lsofConvertResultsToBytes(openDeletedFiles).format_output()
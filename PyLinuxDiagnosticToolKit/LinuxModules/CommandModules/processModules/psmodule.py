@@ -3,20 +3,121 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.2.0
+# Version: 0.3.0
 # Date: 7/12/16
-# Description: This is a module for using the PS command.
+# Description: This is a module for using the PS command. The output is also stored in a ProcessTable which keeps the
+# numeric columns in arrays and has hash indexes by PID, USER and COMMAND. 'sampleCPU' reads /proc several times in a
+# single command to get the CPU and IO used during the sample instead of the lifetime average 'ps' reports.
 
 
-import logging
 import re
+import sys
+import heapq
+import logging
+from array import array
+from operator import itemgetter
 from LinuxModules.genericCmdModule import GenericCmdModule
-from PyCustomParsers.GenericParsers import BashParser
+from PyCustomParsers.GenericParsers import BashParser, IndexedTable
 
 
 log = logging.getLogger('psModule')
 
 
+class ProcessTable(object):
+    """ A read only columnar snapshot of the output of
+        'ps -wweo user,pid,%cpu,%mem,vsz,rss,nlwp,tname,stat,comm,args'. Numeric columns are stored in arrays and the
+        USER, TTY, STAT and COMMAND strings are interned. The table is never sorted or changed after it is built so it
+        can be shared between threads. A new 'ps' run builds a new ProcessTable.
+    """
+
+    _numericColumns = {'PID': 'q', 'CPU': 'd', 'MEM': 'd', 'VSZ': 'q', 'RSS': 'q', 'NLWP': 'q'}
+
+    def __init__(self, results=None, head=1):
+        self.users = []
+        self.ttys = []
+        self.stats = []
+        self.commands = []
+        self.cmdlongs = []
+        self.columns = {name: array(typecode) for name, typecode in self._numericColumns.items()}
+        self.pidIndex = {}
+        self.userIndex = {}
+        self.commandIndex = {}
+        if results:
+            self._parse(results, head)
+
+    def __len__(self):
+        return len(self.users)
+
+    def _parse(self, results, head=1):
+        """ Parses the output of 'ps' and builds the indexes. Lines that do not have enough columns are skipped. """
+
+        intern = sys.intern
+        pids, cpus, mems = self.columns['PID'], self.columns['CPU'], self.columns['MEM']
+        vszs, rsss, nlwps = self.columns['VSZ'], self.columns['RSS'], self.columns['NLWP']
+        for line in results.splitlines()[head:]:
+            fields = line.split(None, 10)
+            if len(fields) < 10:
+                continue
+            try:
+                pid = int(fields[1])
+                numbers = (float(fields[2]), float(fields[3]), int(fields[4]), int(fields[5]), int(fields[6]))
+            except ValueError:
+                continue
+            index = len(self.users)
+            user, command = intern(fields[0]), intern(fields[9])
+            pids.append(pid)
+            cpus.append(numbers[0])
+            mems.append(numbers[1])
+            vszs.append(numbers[2])
+            rsss.append(numbers[3])
+            nlwps.append(numbers[4])
+            self.users.append(user)
+            self.ttys.append(intern(fields[7]))
+            self.stats.append(intern(fields[8]))
+            self.commands.append(command)
+            self.cmdlongs.append(fields[10] if len(fields) > 10 else '')
+            self.pidIndex[pid] = index
+            self.userIndex.setdefault(user, []).append(index)
+            self.commandIndex.setdefault(command, []).append(index)
+
+    def row(self, index):
+        """ Returns a single process as a list of strings in the same order as the psModule header. """
+
+        columns = self.columns
+        return [self.users[index], str(columns['PID'][index]), '%.1f' % columns['CPU'][index],
+                '%.1f' % columns['MEM'][index], str(columns['VSZ'][index]), str(columns['RSS'][index]),
+                str(columns['NLWP'][index]), self.ttys[index], self.stats[index], self.commands[index],
+                self.cmdlongs[index]]
+
+    def rows(self, indexes):
+        return [self.row(index) for index in indexes]
+
+    def top(self, column, n=10):
+        """ Returns the indexes of the 'n' processes with the highest value in a numeric column. This uses a heap so
+            it is O(N log n) and the table is not sorted.
+
+        - :param column: (str) PID, CPU, MEM, VSZ, RSS or NLWP
+        - :param n: (int) default 10
+        - :return: (list) of int
+        """
+
+        values = self.columns[column]
+        return heapq.nlargest(n, range(len(values)), key=values.__getitem__)
+
+    def byPid(self, pid):
+        try:
+            index = self.pidIndex.get(int(pid))
+        except (TypeError, ValueError):
+            return []
+        return [] if index is None else [index]
+
+    def byUser(self, user):
+        return list(self.userIndex.get(user, []))
+
+    def byCommand(self, command):
+        return list(self.commandIndex.get(command, []))
+
+
 class psModule(GenericCmdModule, BashParser):
     """
         psModule class. This class inherits both GenericCmdModule and BashParser. It is used to execute the Linux
@@ -34,6 +135,16 @@ class psModule(GenericCmdModule, BashParser):
     MEM_RSS = 'RSS'
     MEM = 'MEM'
 
+    __SAMPLE_COMMAND__ = '(T=$(getconf CLK_TCK 2> /dev/null); echo "==LDTK:HZ:${T:-100}=="; ' \
+                         'for n in $(seq 1 %(samples)s); do if [ "$n" -gt 1 ]; then sleep %(interval)s; fi; ' \
+                         'echo "==LDTK:SAMPLE:$n=="; cat /proc/uptime /proc/stat; echo "==LDTK:TASKS=="; ' \
+                         'grep -H "" %(stat)s 2> /dev/null; echo "==LDTK:IO=="; ' \
+                         'grep -H -E "^(read|write)_bytes" /proc/[0-9]*/io 2> /dev/null; done)'
+    __SECTION_REGEX__ = re.compile(r'^==LDTK:(HZ|SAMPLE|TASKS|IO)(?::(\d+))?==$')
+    __TASK_REGEX__ = re.compile(r'^/proc/(\d+)/(?:task/(\d+)/)?stat:(.*)$')
+    __IO_REGEX__ = re.compile(r'^/proc/(\d+)/io:(read|write)_bytes:\s*(\d+)')
+    __CPU_FIELDS__ = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+
     def __init__(self, tki, *args, **kwargs):
         log.info("Creating ps module.")
         super(psModule, self).__init__(tki=tki)
@@ -42,6 +153,7 @@ class psModule(GenericCmdModule, BashParser):
         self.defaultKey = "psawux"
         self.defaultFlags = "-wweo user,pid,%cpu,%mem,vsz,rss,nlwp,tname,stat,comm,args"
         self.__NAME__ = "ps"
+        self.processTable = None
 
     def run(self, flags=None, rerun=True, **kwargs):
         """ Runs the command '/bin/ps -wweo user,pid,%cpu,%mem,vsz,rss,nlwp,tname,stat,comm,args' by default.
@@ -54,6 +166,7 @@ class psModule(GenericCmdModule, BashParser):
 
         def _formatOutput(results, *args, **kwargs):
             self.parse(source=results, refreshData=True)
+            self.processTable = ProcessTable(results)
             return self
 
         command = {flags or self.defaultKey: self.defaultCmd + (flags or self.defaultFlags)}
@@ -70,8 +183,22 @@ class psModule(GenericCmdModule, BashParser):
         """
 
         self.verifyNeedForRun(**kwargs)
+        if self.processTable is not None:
+            return self._toIndexedTable(self.processTable.byPid(pid))
         return self.correlation(('PID', str(pid)), **kwargs)
 
+    def getProcessesByUser(self, user, **kwargs):
+        """ Returns the processes owned by the user.
+
+        - :param user: (str)
+        - :return: IndexedTable
+        """
+
+        self.verifyNeedForRun(**kwargs)
+        if self.processTable is not None:
+            return self._toIndexedTable(self.processTable.byUser(user))
+        return self.correlation(('USER', user), explicit=True)
+
     def searchProcesses(self, search, **kwargs):
         """ Returns processes with the name from the parameter 'name'.
 
@@ -84,7 +211,8 @@ class psModule(GenericCmdModule, BashParser):
         return self.search(search, **kwargs)
 
     def findCMD(self, name, **kwargs):
-        """ Returns processes with the name from the parameter 'name'.
+        """ Returns processes with the name from the parameter 'name'. If 'explicit' is True this uses the COMMAND
+            index of the ProcessTable.
 
         - :param name: (str) name of process to search for
         - :param kwargs:  passed directly to 'getCorrelation'
@@ -92,6 +220,9 @@ class psModule(GenericCmdModule, BashParser):
         """
 
         self.verifyNeedForRun(**kwargs)
+        if self.processTable is not None and isinstance(name, str) and kwargs.get('explicit') is True and \
+                not kwargs.get('ignore_case'):
+            return self._toIndexedTable(self.processTable.byCommand(name))
         return self.correlation(('COMMAND', name), **kwargs)
 
     def searchCommandString(self, name, **kwargs):
@@ -127,6 +258,8 @@ class psModule(GenericCmdModule, BashParser):
         """
 
         self.verifyNeedForRun(**kwargs)
+        if self.processTable is not None:
+            return self._toIndexedTable(self.processTable.top('CPU', top))
         self.sort_by_column('CPU', reverse=True, column_type=float)
         return self[0:top]
 
@@ -141,6 +274,8 @@ class psModule(GenericCmdModule, BashParser):
 
         self.verifyNeedForRun(**kwargs)
         if memType == self.MEM or memType == self.MEM_RSS or memType == self.MEM_VSZ:
+            if self.processTable is not None:
+                return self._toIndexedTable(self.processTable.top(memType, top))
             self.sort_by_column(memType, reverse=True, column_type=float)
             return self[0:top]
 
@@ -154,6 +289,130 @@ class psModule(GenericCmdModule, BashParser):
         self.verifyNeedForRun(**kwargs)
         return self.search_by_column('STAT', 'R', explicit=False)
 
+    def sampleCPU(self, interval=1, samples=2, threads=False, top=10, wait=None, **kwargs):
+        """ Reads '/proc/[pid]/stat', '/proc/[pid]/io' and '/proc/stat' 'samples' times with 'interval' seconds in
+            between in a single command. The first and last sample are compared to get the CPU and IO each process
+            used during the sample the same way 'top' does. Reading another process's io file may require root.
+
+        - :param interval: (float) default 1. Seconds between samples.
+        - :param samples: (int) default 2. Must be at least 2.
+        - :param threads: (bool) default False. If True each thread is reported instead of each process.
+        - :param top: (int) default 10. The amount of processes returned sorted by CPU. None or 0 returns all.
+        - :param wait: (int) default None. Defaults to the sample time plus 60 seconds.
+        - :return: (dict) with the keys 'elapsed', 'hz', 'cpus', 'cpu' (percent per /proc/stat field), 'runQueue' and
+            'blocked' (procs_running and procs_blocked of each sample), 'runnable' (tasks in the R state in the last
+            sample) and 'processes'. 'processes' is a list of dicts with the keys 'pid', 'tid', 'command', 'state',
+            'cpu', 'user', 'system', 'readBytes' and 'writeBytes'. CPU is a percent of one CPU and the IO values are
+            bytes per second. None is returned on failure.
+        """
+
+        samples = max(2, int(samples))
+        statFiles = '/proc/[0-9]*/task/[0-9]*/stat' if threads else '/proc/[0-9]*/stat'
+        command = self.__SAMPLE_COMMAND__ % {'samples': samples, 'interval': interval, 'stat': statFiles}
+        if wait is None:
+            wait = int(interval * (samples - 1)) + 60
+        results = self.simpleExecute({f'psSampleCPU{samples}{interval}{threads}': command}, wait=wait, rerun=True,
+                                     **kwargs)
+        if not isinstance(results, str):
+            return None
+        hz, parsed = self._parseProcSamples(results)
+        if len(parsed) < 2:
+            log.debug(f"Only {len(parsed)} /proc samples were read")
+            return None
+        return self._compareProcSamples(hz, parsed[0], parsed[-1], parsed, top)
+
+    @staticmethod
+    def _parseProcSamples(results):
+        """ Helper method of 'sampleCPU'. Splits the output into samples.
+
+        - :return: (tuple) of (hz, list of samples)
+        """
+
+        hz, samples, section = 100, [], None
+        for line in results.splitlines():
+            match = psModule.__SECTION_REGEX__.match(line.strip())
+            if match:
+                section = match.group(1)
+                if section == 'HZ':
+                    hz = int(match.group(2))
+                elif section == 'SAMPLE':
+                    samples.append({'uptime': None, 'cpu': None, 'cpus': 0, 'running': 0, 'blocked': 0,
+                                    'tasks': {}, 'io': {}})
+                continue
+            if not samples:
+                continue
+            sample = samples[-1]
+            try:
+                if section == 'SAMPLE':
+                    fields = line.split()
+                    if not fields:
+                        continue
+                    if sample['uptime'] is None:
+                        sample['uptime'] = float(fields[0])
+                    elif fields[0] == 'cpu':
+                        sample['cpu'] = [int(value) for value in fields[1:len(psModule.__CPU_FIELDS__) + 1]]
+                    elif fields[0].startswith('cpu'):
+                        sample['cpus'] += 1
+                    elif fields[0] == 'procs_running':
+                        sample['running'] = int(fields[1])
+                    elif fields[0] == 'procs_blocked':
+                        sample['blocked'] = int(fields[1])
+                elif section == 'TASKS':
+                    match = psModule.__TASK_REGEX__.match(line)
+                    if not match:
+                        continue
+                    stat = match.group(3)
+                    fields = stat[stat.rindex(')') + 2:].split()
+                    pid = int(match.group(1))
+                    sample['tasks'][(pid, int(match.group(2) or pid))] = (
+                        stat[stat.index('(') + 1:stat.rindex(')')], fields[0], int(fields[11]), int(fields[12]),
+                        int(fields[19]))
+                elif section == 'IO':
+                    match = psModule.__IO_REGEX__.match(line)
+                    if match:
+                        io = sample['io'].setdefault(int(match.group(1)), [0, 0])
+                        io[0 if match.group(2) == 'read' else 1] = int(match.group(3))
+            except (ValueError, IndexError):
+                continue
+        return hz, samples
+
+    @staticmethod
+    def _compareProcSamples(hz, first, last, samples, top=10):
+        """ Helper method of 'sampleCPU'. Compares the first and last sample. """
+
+        elapsed = (last['uptime'] or 0) - (first['uptime'] or 0)
+        if elapsed <= 0:
+            elapsed = 1.0
+        ticks = hz * elapsed
+        processes = []
+        for (pid, tid), (command, state, utime, stime, startTime) in last['tasks'].items():
+            previous = first['tasks'].get((pid, tid))
+            if previous is None or previous[4] != startTime:
+                previous = (command, state, 0, 0, startTime)
+            user = (utime - previous[2]) * 100.0 / ticks
+            system = (stime - previous[3]) * 100.0 / ticks
+            firstIO, lastIO = first['io'].get(pid), last['io'].get(pid)
+            readBytes = writeBytes = 0.0
+            if firstIO and lastIO and pid == tid:
+                readBytes = max(0, lastIO[0] - firstIO[0]) / elapsed
+                writeBytes = max(0, lastIO[1] - firstIO[1]) / elapsed
+            processes.append({'pid': pid, 'tid': tid, 'command': command, 'state': state, 'cpu': user + system,
+                              'user': user, 'system': system, 'readBytes': readBytes, 'writeBytes': writeBytes})
+        if top:
+            processes = heapq.nlargest(top, processes, key=itemgetter('cpu'))
+        else:
+            processes.sort(key=itemgetter('cpu'), reverse=True)
+        cpu = {}
+        if first['cpu'] and last['cpu']:
+            deltas = [lastValue - firstValue for firstValue, lastValue in zip(first['cpu'], last['cpu'])]
+            total = sum(deltas) or 1
+            cpu = {name: delta * 100.0 / total for name, delta in zip(psModule.__CPU_FIELDS__, deltas)}
+        return {'elapsed': elapsed, 'hz': hz, 'cpus': last['cpus'], 'cpu': cpu,
+                'runQueue': [sample['running'] for sample in samples],
+                'blocked': [sample['blocked'] for sample in samples],
+                'runnable': sum(1 for task in last['tasks'].values() if task[1] == 'R'),
+                'processes': processes}
+
     def getProcQueue(self, rerun=True):
         """ Utilizes the 'w' module to determine basic load average summary of the machine.
 
@@ -167,3 +426,6 @@ class psModule(GenericCmdModule, BashParser):
                 self.procQueue = parseProcQueueRe.group().strip()
             return self.procQueue
         return self.tki.modules.w(commandKey='getProcQueue', postparser=procQueueParser, rerun=rerun)
+
+    def _toIndexedTable(self, indexes):
+        return IndexedTable(self.processTable.rows(indexes), columns=self._psColumns)
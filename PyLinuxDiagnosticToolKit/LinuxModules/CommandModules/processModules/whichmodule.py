@@ -34,5 +34,18 @@ class whichModule(GenericCmdModule):
         self.requireFlags = True
 
     def doesCommandExist(self, command, **kwargs):
+        """ Checks if a command exists. The answer is kept in the 'hostFacts' of the connection.
+
+        - :param command: (str)
+        - :return: (bool)
+        """
+
+        hostFacts = self.tki.hostFacts
+        known = hostFacts.get('which', {}) if hostFacts is not None else {}
+        if command in known and not kwargs.get('rerun'):
+            return known[command]
         kwargs['wait'] = kwargs.get('wait', 10)
-        return self.run(command, postparser=GenericCmdModule._formatExitCode, **kwargs)
+        exists = self.run(command, postparser=GenericCmdModule._formatExitCode, **kwargs)
+        if hostFacts is not None and isinstance(exists, bool):
+            hostFacts.set('which', {**known, command: exists})
+        return exists
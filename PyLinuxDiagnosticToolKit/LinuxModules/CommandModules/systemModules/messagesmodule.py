@@ -3,9 +3,9 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.2.0
+# Version: 0.3.0
 # Date: 2/01/19
-# Description: This is a module for interacting with '/var/log/messages'
+# Description: This is a module for interacting with '/var/log/messages' or '/var/log/syslog'
 
 
 import logging
@@ -28,6 +28,11 @@ class messagesModule(GenericCmdModule):
          defaultFlags =
     """
 
+    __LOGFILES__ = ('/var/log/messages', '/var/log/syslog')
+    __BISECT_POINTS__ = 16
+    __BISECT_WINDOW__ = 65536
+    __SAMPLE_SIZE__ = 8192
+
     def __init__(self, tki, *args, **kwargs):
         log.info("Creating messages module.")
         super(messagesModule, self).__init__(tki=tki)
@@ -39,30 +44,41 @@ class messagesModule(GenericCmdModule):
         self.defaultFlags = " "
         self.defaultKwargs = {'requirements': self._messageRequirement, 'requirementsCondition': False}
         self.messageDate = None
+        self.logFile = None
+        self._remoteTZ = None
         self.__NAME__ = 'messages'
-        try:
-            self.remoteTZ = self.timedatectl.getTimezone(wait=10)
-            if self.remoteTZ != '':
-                self.remoteTZ = tz.gettz(self.remoteTZ)
-            else:
-                self.remoteTZ = tz.gettz('/etc/localtime') or tz.gettz('UTC')
-        except:
-            log.warning("Failed to get parse timezone defaulting to local timezone.")
-            self.remoteTZ = tz.gettz('/etc/localtime') or tz.gettz('UTC')
         self.requireFlags = False
 
-    def run(self, *args, **kwargs):
+    @property
+    def remoteTZ(self):
+        """ The timezone of the remote machine. It is looked up the first time it is needed using the 'os' module
+            which reads it from the cached host facts when it can.
         """
-            Override 'run' method from 'GenericCmdModule' class. This is to add a postparser and to enforce a higher
-            then normal wait. This also uses the 'tail' module.
-        - :param args: passed to 'tail' class.
-        - :param kwargs: passed to 'tail' class.
+
+        if self._remoteTZ is None:
+            try:
+                remoteTZ = self.tki.getModules('os').getTimeZone(wait=10)
+                self._remoteTZ = tz.gettz(remoteTZ) if remoteTZ else None
+            except:
+                log.warning("Failed to get parse timezone defaulting to local timezone.")
+            if self._remoteTZ is None:
+                self._remoteTZ = tz.gettz('/etc/localtime') or tz.gettz('UTC')
+        return self._remoteTZ
+
+    def run(self, *args, lines=15000, **kwargs):
+        """
+            Override 'run' method from 'GenericCmdModule' class. This returns the last 15000 lines of the system log
+            using 'tailWindow' of the 'tail' module. After the first call only the lines appended since the last call
+            are read from the remote machine.
+        - :param lines: (int) default 15000.
+        - :param kwargs: passed to 'tailWindow'.
         - :return: string
         """
 
-        kwargs.update({'postparser': self._getTimeStamp, 'wait': 180})
-        kwargs.update(self.defaultKwargs)
-        return self.tail('-n 15000 /var/log/messages', **kwargs)
+        kwargs.pop('rerun', None)
+        kwargs.update({'wait': 180})
+        logFile = self.getLogFile() or '/var/log/messages'
+        return self._getTimeStamp(self.tail.tailWindow(logFile, lines=lines, consumer='messages', **kwargs))
 
     def makeLogEntry(self, logMessage, options="", wait=10, **kwargs):
         """
@@ -77,24 +93,71 @@ class messagesModule(GenericCmdModule):
         else:
             self.tki.execute('logger %s %s' % (options, logMessage), preparser=self.doesCommandExistPreParser)
 
-    def getLogsWithinTimeRange(self, trange='25 minutes ago', targetTime=None):
+    def getLogsWithinTimeRange(self, trange='25 minutes ago', targetTime=None, logFile=None):
         """
             Uses text via the 'trange' variable and a target time frame to determine the time range to pull log lines.
-            This method uses a series of private methods as helper methods.
+            The log file is bisected by timestamp using byte offsets on the remote side so only a few small samples
+            plus the lines within the time range are read. This works on '/var/log/messages' and '/var/log/syslog'.
+            If the timestamps can not be sampled this falls back to paging through the file line by line.
         - :param trange: (str) This excepts a string that determines the time frame to pull logs. The first text should
             be a number value. While the second word should be a unit of time such as seconds or minutes. (The 's' is
             optional. The finial/third word is optional and either exists as 'ago' or doesn't. Without the word 'ago'
             this makes the targetTime the middle while 'ago' makes the targetTime the 'end'.
         - :param targetTime: This is the time at which the range uses as reference.
+        - :param logFile: (str) default None. The log file to search. Defaults to the first file in __LOGFILES__ that
+            exists on the remote machine.
         - :return:
         """
 
         if not isinstance(targetTime, datetime):
             targetTime = datetime.now(tz=self.remoteTZ)
         start, end = messagesModule._parseTimeRange(trange=trange, targetTime=targetTime)
-        numberOfLines = self._getNumberOfLines()
+        logFile = logFile or self.getLogFile()
+        if not logFile:
+            raise Exception("Unable to find a system log file: %s" % ', '.join(self.__LOGFILES__))
+        size = self._getFileSize(logFile)
+        offsets = self._bisectOffsets(logFile, size, [start, end]) if size else None
+        if offsets is None:
+            log.debug(f"Unable to bisect {logFile} by timestamp. Paging through the file instead.")
+            return self._getLogsWithinTimeRangeByLines(start, end, logFile)
+        (startOffset, _), (_, endOffset) = offsets
+        lines = self._readByteRange(logFile, startOffset, endOffset, size)
+        if not isinstance(lines, str):
+            return ""
+        logsWithinTime = []
+        for line in lines.splitlines():
+            try:
+                dateT = self._getTimeWithMessageDate(line)
+            except Exception:
+                continue
+            if isinstance(dateT, datetime) and messagesModule.timeInRange(start, end, dateT):
+                logsWithinTime.append(line)
+        return "\n".join(logsWithinTime)
+
+    def getLogFile(self, rerun=False):
+        """
+            Finds the system log file. This is '/var/log/messages' on RedHat/SuSE and '/var/log/syslog' on Ubuntu.
+        - :param rerun: (bool) default False.
+        - :return: (str) or None
+        """
+
+        if self.logFile and not rerun:
+            return self.logFile
+        command = 'for f in %s; do [ -f "$f" ] && echo "$f" && break; done' % ' '.join(self.__LOGFILES__)
+        results = self.simpleExecute({'messagesLogFile': command}, wait=30, rerun=True)
+        if isinstance(results, str) and results.strip() in self.__LOGFILES__:
+            self.logFile = results.strip()
+        return self.logFile
+
+    def _getLogsWithinTimeRangeByLines(self, start, end, logFile='/var/log/messages'):
+        """
+            Helper method of 'getLogsWithinTimeRange'. This pages backwards through the log file 1000 lines at a time.
+        - :return: string
+        """
+
+        numberOfLines = self._getNumberOfLines(logFile)
         logsWithinTime = ""
-        for lines in self._messageGenerator(numberOfLines):
+        for lines in self._messageGenerator(numberOfLines, logFile):
             if not isinstance(lines, str):
                 break
             parseLines, continueCondition = self._parseMessageLines(lines, start, end)
@@ -104,6 +167,104 @@ class messagesModule(GenericCmdModule):
                 break
         return logsWithinTime
 
+    def _getFileSize(self, logFile):
+        """
+            Helper method of 'getLogsWithinTimeRange'.
+        - :return: int (0 on failure)
+        """
+
+        results = self.simpleExecute({'messagesSize': "stat -L -c %%s %s" % logFile}, wait=30, rerun=True)
+        try:
+            return int(results.strip().split()[-1])
+        except Exception:
+            return 0
+
+    def _sampleLines(self, logFile, offsets):
+        """
+            Helper method of '_bisectOffsets'. Reads the first whole line that starts at or after each byte offset in
+            a single command. 'tail -c +N' seeks on regular files so this does not read the file up to the offset.
+        - :param logFile: (str)
+        - :param offsets: (list) of int
+        - :return: (dict) offset: line
+        """
+
+        command = 'for o in %s; do echo "==LDTK:$o=="; if [ "$o" -eq 0 ]; then head -n 1 %s; ' \
+                  'else tail -c +$o %s 2> /dev/null | head -c %s | sed -n 2p; fi; done' % \
+                  (' '.join(str(offset) for offset in offsets), logFile, logFile, self.__SAMPLE_SIZE__)
+        results = self.simpleExecute({'messagesSample': command}, wait=60, rerun=True)
+        samples = {}
+        if not isinstance(results, str):
+            return samples
+        current = None
+        for line in results.splitlines():
+            match = re.match(r'^==LDTK:(\d+)==$', line.strip())
+            if match:
+                current = int(match.group(1))
+            elif current is not None and current not in samples and line.strip():
+                samples[current] = line
+        return samples
+
+    def _bisectOffsets(self, logFile, size, targets):
+        """
+            Helper method of 'getLogsWithinTimeRange'. Narrows down the byte offsets of each target time at the same
+            time. Each round samples __BISECT_POINTS__ evenly spaced lines within the current range of every target in
+            a single command so the range shrinks by that factor per round trip.
+        - :param logFile: (str)
+        - :param size: (int) The size of the log file in bytes.
+        - :param targets: (list) of datetime
+        - :return: (list) of tuples (low offset, high offset) per target or None if no timestamps could be parsed.
+        """
+
+        ranges = [[0, size] for _ in targets]
+        parsedAny = False
+        while True:
+            active = [index for index, (low, high) in enumerate(ranges) if high - low > self.__BISECT_WINDOW__]
+            if not active:
+                break
+            points = {}
+            for index in active:
+                low, high = ranges[index]
+                step = (high - low) / (self.__BISECT_POINTS__ + 1)
+                points[index] = [low + int(step * n) for n in range(1, self.__BISECT_POINTS__ + 1)]
+            samples = self._sampleLines(logFile, sorted({p for offsets in points.values() for p in offsets}))
+            if not self.messageDate:
+                self._getTimeStamp(list(samples.values()))
+            changed = False
+            for index in active:
+                low, high = ranges[index]
+                for offset in points[index]:
+                    try:
+                        dateT = self._getTimeWithMessageDate(samples[offset])
+                    except Exception:
+                        continue
+                    if not isinstance(dateT, datetime):
+                        continue
+                    parsedAny = True
+                    if dateT < targets[index]:
+                        low = offset
+                    else:
+                        high = offset
+                        break
+                changed = changed or [low, high] != ranges[index]
+                ranges[index] = [low, high]
+            if not changed:
+                break
+        if not parsedAny and size > self.__BISECT_WINDOW__:
+            return None
+        return [tuple(item) for item in ranges]
+
+    def _readByteRange(self, logFile, startOffset, endOffset, size):
+        """
+            Helper method of 'getLogsWithinTimeRange'. Reads the log file from 'startOffset' to 'endOffset' plus one
+            sample size so the line at 'endOffset' is complete.
+        - :return: string
+        """
+
+        command = "tail -c +%s %s" % (startOffset + 1, logFile)
+        if endOffset < size:
+            command += " | head -c %s" % (endOffset - startOffset + self.__SAMPLE_SIZE__)
+        return self.simpleExecute({'messagesRange': command}, wait=180, rerun=True)
+
     def _messageRequirement(self, *args, **kwargs):
         return self.doesFileExistRequirement('/var/log/messages')
 
@@ -134,7 +295,7 @@ class messagesModule(GenericCmdModule):
                     return linesWithinTime, False
         return linesWithinTime, True
 
-    def _messageGenerator(self, numberOfLines):
+    def _messageGenerator(self, numberOfLines, logFile='/var/log/messages'):
         """
             Helper method of 'getLogsWithinTimeRange' method. This method acts as a generator and is meant to be used
             in a for loop. Uses tail to pull the last 1000 lines of '/var/log/messages' remote file and then continues
@@ -144,10 +305,10 @@ class messagesModule(GenericCmdModule):
         """
 
         x = 1000
-        command = "awk 'NR==%s, NR==%s; NR==%s {print; exit}' /var/log/messages"
+        command = "awk 'NR==%s, NR==%s; NR==%s {print; exit}' " + logFile
         if numberOfLines <= 1000:
             numberOfLines = 0
-            yield self.tail('-n 1000 /var/log/messages', wait=120, rerun=True)
+            yield self.tail('-n 1000 %s' % logFile, wait=120, rerun=True)
         numberOfLines -= x
         while numberOfLines >= 0:
             tmpCommand = command % (numberOfLines, numberOfLines+999, numberOfLines+1000)
@@ -161,15 +322,15 @@ class messagesModule(GenericCmdModule):
                 x += 1000
                 numberOfLines -= 1000
 
-    def _getNumberOfLines(self):
+    def _getNumberOfLines(self, logFile='/var/log/messages'):
         """
             Helper method of 'getLogsWithinTimeRange' method.
         - :return: int
         """
 
-        numberOfLines = self.tki.getModules('wc').getNumberofLines(file='/var/log/messages', rerun=True)
+        numberOfLines = self.tki.getModules('wc').getNumberofLines(file=logFile, rerun=True)
         if not isinstance(numberOfLines, int):
-            raise Exception("Unable to get the total number of lines of the /var/log/messages")
+            raise Exception("Unable to get the total number of lines of the %s" % logFile)
         return numberOfLines
 
     def _getTimeStamp(self, results, **kwargs):
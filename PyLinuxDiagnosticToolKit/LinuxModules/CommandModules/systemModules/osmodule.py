@@ -3,7 +3,7 @@
 
 # Author: Ryan Henrichson, Timothy Nodine
 
-# Version: 0.4
+# Version: 0.6
 # Date: 02/19/15
 
 
@@ -19,8 +19,9 @@ class osModule(GenericCmdModule):
     """
          osModule class. This class inherits from the GenericCmdModule. This module breaks the normal convention of
          CommandModules. (There always has to be an exception). This module runs a series of useful informational
-         commands like uname and 'cat /proc/uptime'.
-         defaultCmd: multiple commands review the variable __COMMAND__
+         commands like uname and 'cat /proc/uptime'. The OS information is gathered in a single round trip by the
+         __DISCOVERY__ probe which prints each piece of information in its own framed section.
+         defaultCmd: multiple commands review the variable __DISCOVERY__
          defaultFlags =
      """
 
@@ -40,6 +41,22 @@ class osModule(GenericCmdModule):
 
     __SUPPORTED__ = ['rhel', 'redhat', 'red hat', 'centos', 'cent os', 'ubuntu']
 
+    __PROBE_COMMANDS__ = ('timedatectl', 'systemctl', 'service', 'lsof', 'ss', 'netstat', 'ip', 'ifconfig')
+
+    # The section markers are printed by the '_ldtk' shell function so the marker text never appears in the echo of
+    # the command itself.
+    __DISCOVERY__ = "_ldtk() { printf '\\n==LDTK:%%s==\\n' \"$1\"; }; " \
+                    "_ldtk OSRELEASE; /bin/cat /etc/os-release 2> /dev/null; " \
+                    "_ldtk ISSUE; /bin/cat /etc/issue /etc/redhat-release /etc/centos-release /etc/SuSE-release " \
+                    "2> /dev/null; " \
+                    "_ldtk KERNEL; /bin/uname -r; _ldtk HOSTNAME; /bin/uname -n; _ldtk ARCH; /bin/uname -i; " \
+                    "_ldtk TIMEDATECTL; command -v timedatectl > /dev/null 2>&1 && timedatectl status 2> /dev/null; " \
+                    "_ldtk TIMEZONE; /bin/cat /etc/timezone 2> /dev/null; " \
+                    "_ldtk CLOCK; /bin/cat /etc/sysconfig/clock 2> /dev/null; " \
+                    "_ldtk COMMANDS; for c in %s; do p=$(command -v $c 2> /dev/null) && echo \"$c $p\"; done; " \
+                    "_ldtk END" % ' '.join(__PROBE_COMMANDS__)
+    __SECTION_REGEX__ = re.compile(r'^==LDTK:(\w+)==$')
+
     def __init__(self, tki, *args, **kwargs):
         log.info("Creating Operating System Command Module")
         super(osModule, self).__init__(tki=tki)
@@ -54,82 +71,164 @@ class osModule(GenericCmdModule):
         self.__hostName = None
         self.__architecture = None
         self.__isCluster = None
-        self.tki.getModules('cat', 'tail', 'service', 'uptime', 'timedatectl', 'uname', 'll')
+        self.__commands = None
         self.modules = self.tki.modules
         self.__NAME__ = "os"
 
     def __str__(self):
         return self._prettyStrFormat()
 
-    def run(self, *args, **kwargs):
-        def _issueParser(results, **kwargs):
-            fullName = None
-            name = None
-            for key, v in self.__OSTYPES__.items():
-                m = re.search(key, results, re.IGNORECASE)
-                if m:
-                    for line in results.splitlines():
-                        if m.group() in line:
-                            fullName = line
-                    name = v
-                    break
-            if name is None:
-                return None, None
-            fullName.strip()
-            version = re.search("\\d{1,2}\\.\\d{1,2}(\\.\\d{1,2})?", results)
-            version = "" if version is None else version.group().strip()
-            versionName = re.search("\\(\\w+\\)", fullName)
-            versionName = "" if versionName is None else versionName.group().strip('(').strip(')')
-            if version:
-                majorVersion = version.split('.')[0]
-                minorVersion = version.split('.')[-1]
-            else:
-                majorVersion = minorVersion = ""
-            return fullName, name, version, versionName, majorVersion, minorVersion
-
-        def _osReleaseParser(results, **kwargs):
-            variables = {'NAME': "", 'VERSION': "", 'ID': "", 'VERSION_ID': "", 'PRETTY_NAME': ""}
-            for line in results.strip().splitlines():
-                if '=' not in line:
-                    continue
-                rows = line.strip().split('=')
-                if rows[0].strip() in variables:
-                    variables[rows[0].strip()] = rows[1].strip().strip('"')
-            fullName = variables['PRETTY_NAME']
-            name = None
-            for key, v in self.__OSTYPES__.items():
-                m = re.search(key, variables['NAME'], re.IGNORECASE)
-                if m:
-                    name = v
-                    break
-            if name is None:
-                name = variables['NAME']
-            version = variables['VERSION_ID']
-            versionName = re.search("\\(\\w+\\)", variables['VERSION'])
-            versionName = "" if versionName is None else versionName.group().strip('(').strip(')')
-            if version:
-                majorVersion = version.split('.')[0]
-                minorVersion = version.split('.')[-1]
-            else:
-                majorVersion = minorVersion = ""
-            return fullName, name, version, versionName, majorVersion, minorVersion
-
-        if self.modules.ll.fileExist('/etc/os-release') and not self.modules.ll.isFileEmpty('/etc/os-release'):
-            osinfo = self.modules.cat('/etc/os-release', postparser=_osReleaseParser)
+    def run(self, *args, rerun=False, wait=60, **kwargs):
+        """ Discovers the OS name and version, kernel version, hostname, architecture, timezone and which of the
+            __PROBE_COMMANDS__ exist using the single __DISCOVERY__ command. All of the properties are set at once.
+
+        - :param rerun: (bool) default False. Run the discovery probe again instead of using the cached results.
+        - :param wait: (int) default 60.
+        - :return: (tuple) fullName, name, version, versionName, majorVersion, minorVersion
+        """
+
+        sections = self.discover(rerun=rerun, wait=wait)
+        if not sections:
+            return '', '', '', '', '', ''
+
+        if sections.get('OSRELEASE'):
+            osinfo = osModule._osReleaseParser(sections['OSRELEASE'])
         else:
-            osinfo = self.modules.cat('/etc/issue /etc/redhat-release /etc/centos-release '
-                                      '/etc/SuSE-release 2> /dev/null', postparser=_issueParser)
+            osinfo = osModule._issueParser(sections.get('ISSUE', ''))
+
+        self.__kernelVersion = sections.get('KERNEL', '')
+        self.__hostName = sections.get('HOSTNAME', '')
+        self.__architecture = sections.get('ARCH', '')
+        self.__commands = {command: path for command, path in
+                           (line.split(None, 1) for line in sections.get('COMMANDS', '').splitlines() if ' ' in line)}
+        self.__timezone = osModule._timezoneParser(sections) or self.__timezone
 
         if not isinstance(osinfo, tuple) or len(osinfo) != 6:
             return '', '', '', '', '', ''
 
-        self.__kernelVersion = self.modules.uname.getKernelVersion()
-        self.__hostName = self.modules.uname.getHostName()
-        self.__architecture = self.modules.uname.getArch()
-
         self.__fullName, self.__name, self.__version, self.__versionName, self.__majorV, self.__minorV = osinfo
         return self.__fullName, self.__name, self.__version, self.__versionName, self.__majorV, self.__minorV
 
+    def discover(self, rerun=False, wait=60, **kwargs):
+        """ Runs the __DISCOVERY__ probe and returns the output of each framed section. The sections are kept in the
+            'hostFacts' of the connection so a later session to the same host does not run the probe again.
+
+        - :param rerun: (bool) default False.
+        - :param wait: (int) default 60.
+        - :return: (dict) section name: output. Empty if the probe failed or did not finish.
+        """
+
+        hostFacts = self.tki.hostFacts
+        if not rerun and hostFacts is not None and hostFacts.get('osDiscovery'):
+            return hostFacts.get('osDiscovery')
+        sections = self.simpleExecute(command={'osDiscovery': self.__DISCOVERY__}, rerun=rerun, wait=wait,
+                                      postparser=osModule._discoveryParser, **kwargs)
+        if not isinstance(sections, dict) or 'END' not in sections:
+            log.error(f'The OS discovery probe failed with: {sections}')
+            return {}
+        if hostFacts is not None:
+            hostFacts.set('osDiscovery', sections)
+        return sections
+
+    def commandExists(self, command):
+        """ Uses the results of the discovery probe to check if a command exists. Commands that are not in
+            __PROBE_COMMANDS__ are checked with the which module.
+
+        - :param command: (str)
+        - :return: (bool)
+        """
+
+        if self.__commands is None:
+            self.run()
+        if command in self.__PROBE_COMMANDS__ and self.__commands is not None:
+            return command in self.__commands
+        return bool(self.modules.which.doesCommandExist(command))
+
+    @staticmethod
+    def _discoveryParser(results, **kwargs):
+        if not isinstance(results, str):
+            return results
+        sections = {}
+        current = None
+        for line in results.splitlines():
+            match = osModule.__SECTION_REGEX__.match(line.strip())
+            if match:
+                current = match.group(1)
+                sections[current] = []
+            elif current:
+                sections[current].append(line)
+        return {key: '\n'.join(lines).strip() for key, lines in sections.items()}
+
+    @staticmethod
+    def _issueParser(results, **kwargs):
+        fullName = None
+        name = None
+        for key, v in osModule.__OSTYPES__.items():
+            m = re.search(key, results, re.IGNORECASE)
+            if m:
+                for line in results.splitlines():
+                    if m.group() in line:
+                        fullName = line
+                name = v
+                break
+        if name is None:
+            return None, None
+        fullName.strip()
+        version = re.search("\\d{1,2}\\.\\d{1,2}(\\.\\d{1,2})?", results)
+        version = "" if version is None else version.group().strip()
+        versionName = re.search("\\(\\w+\\)", fullName)
+        versionName = "" if versionName is None else versionName.group().strip('(').strip(')')
+        if version:
+            majorVersion = version.split('.')[0]
+            minorVersion = version.split('.')[-1]
+        else:
+            majorVersion = minorVersion = ""
+        return fullName, name, version, versionName, majorVersion, minorVersion
+
+    @staticmethod
+    def _osReleaseParser(results, **kwargs):
+        variables = {'NAME': "", 'VERSION': "", 'ID': "", 'VERSION_ID': "", 'PRETTY_NAME': ""}
+        for line in results.strip().splitlines():
+            if '=' not in line:
+                continue
+            rows = line.strip().split('=')
+            if rows[0].strip() in variables:
+                variables[rows[0].strip()] = rows[1].strip().strip('"')
+        fullName = variables['PRETTY_NAME']
+        name = None
+        for key, v in osModule.__OSTYPES__.items():
+            m = re.search(key, variables['NAME'], re.IGNORECASE)
+            if m:
+                name = v
+                break
+        if name is None:
+            name = variables['NAME']
+        version = variables['VERSION_ID']
+        versionName = re.search("\\(\\w+\\)", variables['VERSION'])
+        versionName = "" if versionName is None else versionName.group().strip('(').strip(')')
+        if version:
+            majorVersion = version.split('.')[0]
+            minorVersion = version.split('.')[-1]
+        else:
+            majorVersion = minorVersion = ""
+        return fullName, name, version, versionName, majorVersion, minorVersion
+
+    @staticmethod
+    def _timezoneParser(sections):
+        """ Finds the timezone in the TIMEDATECTL, TIMEZONE (Ubuntu) or CLOCK (RHEL/SuSE) sections in that order """
+
+        for line in sections.get('TIMEDATECTL', '').splitlines():
+            if 'Time zone:' in line:
+                words = line.strip().split()
+                if len(words) > 2:
+                    return words[2]
+        if sections.get('TIMEZONE'):
+            return sections['TIMEZONE'].splitlines()[0].strip()
+        for line in sections.get('CLOCK', '').splitlines():
+            if '#' not in line and ('ZONE' in line or 'TIMEZONE' in line) and '=' in line:
+                return line.split('=')[-1].replace('"', '').strip()
+        return ""
+
     def getOSInfo(self, *args, **kwargs):
         """ Depreciated run method for backward compatibility """
         return self.run(*args, **kwargs)
@@ -173,7 +272,7 @@ class osModule(GenericCmdModule):
         logFile = '/var/log/messages'
         if 'ubuntu' in self.osName.lower():
             logFile = '/var/log/syslog'
-        rawLog = self.modules.tail(logFile, wait=60)
+        rawLog = self.modules.tail.tailWindow(logFile, lines=10, consumer='tailVarLog', wait=60)
         if not rawLog:
             return None
         return IndexedTable([x.split() for x in rawLog.splitlines()])
@@ -199,11 +298,14 @@ class osModule(GenericCmdModule):
             return ""
 
         if self.__name is None:
-            self.run()
+            self.run(wait=wait)
 
+        hostFacts = self.tki.hostFacts
         if self.__timezone:
             return self.__timezone
-        elif self.modules.which.doesCommandExist('timedatectl'):
+        elif hostFacts is not None and hostFacts.get('timezone'):
+            self.__timezone = hostFacts.get('timezone')
+        elif self.commandExists('timedatectl'):
             self.__timezone = self.modules.timedatectl.getTimezone(wait=30)
         elif self.osName.lower() == 'ubuntu':
             self.__timezone = self.modules.cat('/etc/timezone', wait=wait)
@@ -212,6 +314,8 @@ class osModule(GenericCmdModule):
         elif self.osName.lower() == 'open suse':
             self.__timezone = self.modules.cat('/etc/sysconfig/clock', wait=wait, postparser=_parseSuSESysClock)
 
+        if self.__timezone and isinstance(self.__timezone, str) and hostFacts is not None:
+            hostFacts.set('timezone', self.__timezone)
         return self.__timezone if self.__timezone else ""
 
     @property
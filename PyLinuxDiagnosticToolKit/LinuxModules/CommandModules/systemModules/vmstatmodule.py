@@ -27,6 +27,7 @@ class vmstatModule(GenericCmdModule):
     """
 
     vmstatParsedResults = None
+    cacheTTL = 30
 
     def __init__(self, tki, *args, **kwargs):
         log.info("Creating vmstat module.")
@@ -111,17 +111,19 @@ class oracleLogs(object):
             self._getTNSLogsHelper(errorCode)
             log.debug(" The logs are: %s" % self.logs)
         else:
-            self._getORALogsHelper(args='-n 15000')
+            self._getORALogsHelper(lines=15000)
 
-    def _getORALogsHelper(self, args):
+    def _getORALogsHelper(self, lines):
+        # tailWindow keeps the last lines of each alert log in memory so repeated checks only read the new bytes
+        tail = self.tki.modules.tail
         for eachPid, logList in reversed(self.logFiles.items()):
             log.debug("The eachPid is: %s and the logList value is: %s" % (eachPid, logList))
             if type(logList) is list:
                 self.logs[eachPid] = []
                 for oraLog in logList:
-                    self.logs[eachPid].append(self.tki.modules.tail(f'{oraLog} {args}', wait=120))
+                    self.logs[eachPid].append(tail.tailWindow(oraLog, lines=lines, consumer='oracleLogs', wait=120))
             else:
-                self.logs[eachPid] = self.tki.modules.tail(f'{logList} {args}', wait=120)
+                self.logs[eachPid] = tail.tailWindow(logList, lines=lines, consumer='oracleLogs', wait=120)
 
     def _getTNSLogsHelper(self, errorCode):
         errorCode = "\\\""+' '.join(errorCode)+"\\\""
@@ -46,6 +46,7 @@ class CommandModuleSettings:
     defaultFlags: str = ""
     defaultKwargs: dict = {}
     defaultWait: int = 120
+    cacheTTL: Optional[float] = None
 
     def __init__(self, *args, **kwargs):
         try:
@@ -163,6 +164,25 @@ class GenericCmdModule(CommandModuleSettings):
                 kwargs.update(self.updatekwargs('postparser', self.defaultKwargs.get('postparser'), **kwargs))
         return self.simpleExecute(command={newKey: newCmd}, **self.mergeKwargs(kwargs, self.defaultKwargs))
 
+    async def arun(self, *args, **kwargs) -> Any:
+        """ The asyncio version of '__call__'. This calls 'run' with 'wait=False' and then awaits the CommandContainer
+            so the event loop is not blocked while the command runs. CommandModules that override 'run' with blocking
+            behavior (such as waiting on another command) should be run with 'asyncio.to_thread' instead.
+
+        - :param args: Passed to 'run'.
+        - :param kwargs: Passed to 'run'. The 'wait' parameter is how long to await the results.
+        - :return: The results of the command.
+        """
+
+        wait = kwargs.pop('wait', self.defaultWait) or self.defaultWait
+        results = self.run(*args, wait=False, **kwargs)
+        if not isinstance(results, CommandContainers.CommandContainer):
+            return results
+        results = await results.asyncWaitForResults(wait=wait)
+        if results and getattr(self, 'returnValueType', None):
+            return self.returnValueType(results)
+        return results
+
     def doesCommandExistPreParser(self, *args, **kwargs) -> Optional[bool]:
         """ This uses a control flag PreParserStopOnFailure to stop the continued execution of the command.
             It assumes PreParserStopOnFailure is True. Set to false if you wish the command to continue.
@@ -207,7 +227,8 @@ class GenericCmdModule(CommandModuleSettings):
 
         if not self.tki:
             return False
-        kwargs = GenericCmdModule.mergeKwargs(kwargs, {'ignoreAlias': self.ignoreAlias, 'tki': self.tki})
+        kwargs = GenericCmdModule.mergeKwargs(kwargs, {'ignoreAlias': self.ignoreAlias, 'tki': self.tki,
+                                                       'moduleName': type(self).__name__})
         return GenericCmdModule.simpleExecutor(self, command, *args, **kwargs)
 
     @staticmethod
@@ -240,14 +261,27 @@ class GenericCmdModule(CommandModuleSettings):
     @staticmethod
     def cmdObjBinder(command, commandKey=None, bindTo=None, rerun=False, **kwargs) \
             -> Union[str, CommandContainers.CommandContainer]:
+        """ Binds a CommandContainer to 'bindTo' under the commandKey. If one is already bound it is reused unless
+            'rerun' is True or the ToolKitInterface 'resultCache' says it has expired. New bindings are recorded in
+            the 'resultCache' which unbinds the least recently used ones once it is full.
+        """
+
         commandKey = CommandContainers.CommandContainer._parseCommandInput(command, commandKey)
+        resultCache = getattr(kwargs.get('tki'), 'resultCache', None)
+        if bindTo is not None and not rerun and resultCache is not None and hasattr(bindTo, commandKey):
+            rerun = resultCache.isExpired(bindTo, commandKey)
         if bindTo is not None and (rerun or not hasattr(bindTo, commandKey)):
             if isinstance(command, CommandContainers.CommandContainer):
                 setattr(bindTo, commandKey, command)
             else:
                 setattr(bindTo, commandKey, CommandContainers.CommandContainer(command=command, commandKey=commandKey,
                                                                                **kwargs))
-            return getattr(bindTo, commandKey)
+            container = getattr(bindTo, commandKey)
+            if isinstance(bindTo, GenericCmdModule) and container.metrics.moduleName is None:
+                container.metrics.moduleName = getattr(bindTo, '__NAME__', None) or type(bindTo).__name__
+            if resultCache is not None:
+                resultCache.put(bindTo, commandKey, container)
+            return container
         return commandKey
 
     @staticmethod
@@ -259,6 +293,26 @@ class GenericCmdModule(CommandModuleSettings):
             kwargs = {}
         return partial(func, *args, **kwargs)
 
+    @staticmethod
+    def topNPipe(count: int, column: int = 1, sort: bool = True) -> str:
+        """ Returns a shell pipe that keeps only 'count' lines on the remote side so only those lines are transferred.
+            If 'sort' is True the lines with the largest number in 'column' are kept using 'sort -nr | head'. If the
+            remote machine has no 'sort' command an awk program keeps the largest lines in a bounded list as it reads.
+
+        - :param count: (int) The amount of lines to keep.
+        - :param column: (int) default 1. The whitespace separated column that holds the number.
+        - :param sort: (bool) default True. If False this is simply 'head -n count'.
+        - :return: (str) starting with ' | '
+        """
+
+        count, column = int(count), int(column)
+        if not sort:
+            return f' | head -n {count}'
+        return f' | (if command -v sort > /dev/null 2>&1; then sort -k{column},{column} -nr | head -n {count}; ' \
+               f"else awk -v n={count} -v c={column} '{{ v = $c + 0; i = m; while (i > 0 && v > s[i]) " \
+               f"{{ if (i < n) {{ s[i + 1] = s[i]; l[i + 1] = l[i] }} i-- }} if (i < n) {{ s[i + 1] = v; " \
+               f"l[i + 1] = $0; if (m < n) m++ }} }} END {{ for (i = 1; i <= m; i++) print l[i] }}'; fi)"
+
     @staticmethod
     def sanitizeFilename(filename: str) -> str:
         """ A wrapper for the 'CommandContainers.CommandContainer._parseCommandInput' staticmethod  """
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: An index of every CommandModule under 'LinuxModules' that maps the short name (IE: 'ps') to the dotted
+# path of the python module and the name of the class. The index is saved next to this file and only rebuilt when a
+# module directory has changed so the directories are not walked on every start. The index can also be built at
+# install time with: python -m LinuxModules.moduleRegistry
+
+
+import os
+import json
+import logging
+import traceback
+from importlib import import_module
+from threading import RLock
+from typing import Any, AnyStr, Dict, List, Optional
+from PyLinuxDiagnosticToolKit.libs.LDTKJsonStore import atomicWriteJson
+
+
+log = logging.getLogger('moduleRegistry')
+
+
+class ModuleRegistry(object):
+    """ Lazily loads the module index and imports CommandModule classes by their short name. """
+
+    __INDEXFILE__ = '.moduleIndex.json'
+
+    def __init__(self, rootDir: Optional[AnyStr] = None, package: AnyStr = 'LinuxModules'):
+        self.rootDir = rootDir or os.path.dirname(os.path.abspath(__file__))
+        self.package = package
+        self.indexFile = os.path.join(self.rootDir, self.__INDEXFILE__)
+        self._index = None
+        self._directories = None
+        self._rebuilt = False
+        self._LOCK = RLock()
+
+    @property
+    def index(self) -> Dict[AnyStr, dict]:
+        """ {name: {'module': dotted path, 'class': class name, 'type': 'CommandModules' or 'ProgramModules'}} """
+
+        if self._index is None:
+            with self._LOCK:
+                if self._index is None:
+                    self._load()
+        return self._index
+
+    def names(self, moduleType: Optional[AnyStr] = None) -> List[AnyStr]:
+        """ Returns the short names of every module. 'moduleType' can be 'CommandModules' or 'ProgramModules' or a sub
+            directory of those such as 'CommandModules/processModules'.
+        """
+
+        if not moduleType:
+            return list(self.index)
+        moduleType = moduleType.strip('/').replace('/', '.')
+        return [name for name, entry in self.index.items()
+                if entry['module'].startswith(f'{self.package}.{moduleType}.')]
+
+    def resolve(self, name: AnyStr) -> Optional[dict]:
+        """ Returns the index entry for the short name. If the name is not found the index is rebuilt once per process
+            in case the module was added since the index was saved.
+        """
+
+        key = self._key(name)
+        entry = self.index.get(key)
+        if entry is None and not self._rebuilt:
+            entry = self.rebuild().get(key)
+        return entry
+
+    def getModuleClass(self, name: AnyStr) -> Any:
+        """ Imports and returns the CommandModule class for the short name or None if it is not in the index. """
+
+        entry = self.resolve(name)
+        if entry is None:
+            return None
+        return getattr(import_module(entry['module']), entry['class'])
+
+    def rebuild(self) -> Dict[AnyStr, dict]:
+        """ Walks the module directories and saves a new index. """
+
+        with self._LOCK:
+            self._index, self._directories = self._walk()
+            self._rebuilt = True
+            self._save()
+            return self._index
+
+    def _load(self) -> None:
+        try:
+            with open(self.indexFile) as f:
+                data = json.load(f)
+            if all(self._mtime(path) == mtime for path, mtime in data['directories'].items()):
+                self._index, self._directories = data['index'], data['directories']
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        self.rebuild()
+
+    def _save(self) -> None:
+        """ Saves the index next to this file. The package may be installed somewhere read only in which case the
+            index is only kept in memory.
+        """
+
+        try:
+            atomicWriteJson(self.indexFile, {'index': self._index, 'directories': self._directories},
+                            prefix='.moduleIndex')
+        except Exception as e:
+            log.debug(f'Unable to save the module index: {e}')
+            log.debug(f'[DEBUG] for method _save: {traceback.format_exc()}')
+
+    def _walk(self):
+        index, directories = {}, {}
+        for moduleType in ('CommandModules', 'ProgramModules'):
+            for dirPath, dirNames, fileNames in os.walk(os.path.join(self.rootDir, moduleType)):
+                dirNames[:] = sorted(item for item in dirNames if not item.startswith('__'))
+                relPath = os.path.relpath(dirPath, self.rootDir)
+                directories[relPath] = self._mtime(relPath)
+                dotted = '.'.join([self.package] + relPath.split(os.sep))
+                for fileName in sorted(fileNames):
+                    if not fileName.endswith('module.py'):
+                        continue
+                    key = self._key(fileName[:-len('module.py')])
+                    if key in index:
+                        continue
+                    index[key] = {'module': f'{dotted}.{fileName[:-3]}', 'class': f'{key}Module', 'type': moduleType}
+        return index, directories
+
+    def _mtime(self, relPath: AnyStr) -> Optional[float]:
+        try:
+            return os.stat(os.path.join(self.rootDir, relPath)).st_mtime
+        except OSError:
+            return None
+
+    @staticmethod
+    def _key(name: AnyStr) -> AnyStr:
+        name = name.lower()
+        if name.endswith('module'):
+            name = name[:-len('module')]
+        return name
+
+
+moduleRegistry = ModuleRegistry()
+
+
+if __name__ == '__main__':
+    print(f'Indexed {len(moduleRegistry.rebuild())} modules into: {moduleRegistry.indexFile}')
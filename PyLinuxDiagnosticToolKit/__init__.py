@@ -17,8 +17,13 @@ __version__ = "0.9.0"
 
 def find_modules(workingDir=None, moduleSubDir=None):
     """
-        Function for unit testing purposes. This is used to find all existing modules for PyLDTK
+        Function for unit testing purposes. This is used to find all existing modules for PyLDTK. Without a
+        'workingDir' this uses the cached module index instead of walking the directories.
     """
+    if not workingDir:
+        from LinuxModules.moduleRegistry import moduleRegistry
+        return moduleRegistry.names(moduleSubDir)
+
     if workingDir:
         startingPath = workingDir.strip('/') + '/' + 'LinuxModules/'
     else:
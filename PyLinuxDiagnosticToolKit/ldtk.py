@@ -11,21 +11,30 @@
 # each other.
 
 
+from __future__ import annotations
+import sys
+import asyncio
 import logging
 import warnings
-from cryptography.utils import CryptographyDeprecationWarning
-warnings.filterwarnings('ignore', category=CryptographyDeprecationWarning)
 import traceback
-from PyLinuxDiagnosticToolKit import find_modules
+from importlib import import_module
 from libs import ArgumentWrapper
 from libs.ArgumentWrapper import ArgumentParsers
 from LinuxModules.genericCmdModule import GenericCmdModule
 from LinuxModules.CommandContainers import CommandContainer
-from sshConnector.sshThreader import sshThreader as threadedSSH
-from sshConnector.sshLibs.SCPChannel import SCPChannel
-from sshConnector.sshLibs.SFTPChannel import SFTPChannel
-from sshConnector.sshLibs.sshChannelEnvironment import sshEnvironment, EnvironmentControls
-from typing import Union, List, Any, Optional
+from LinuxModules.moduleRegistry import moduleRegistry
+from sshConnector.sshConnectionCache import connectionCache
+from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import LDTKCommandException
+from PyLinuxDiagnosticToolKit.libs.LDTKMetrics import metrics
+from PyLinuxDiagnosticToolKit.libs.LDTKLogCursors import logCursors
+from PyLinuxDiagnosticToolKit.libs.LDTKFactCache import factCache, HostFacts
+from PyLinuxDiagnosticToolKit.libs.LDTKResultCache import ResultCache
+from typing import Union, List, Any, Optional, AnyStr, Generator, TYPE_CHECKING
+if TYPE_CHECKING:
+    from sshConnector.sshThreader import sshThreader as threadedSSH
+    from sshConnector.sshLibs.SCPChannel import SCPChannel
+    from sshConnector.sshLibs.SFTPChannel import SFTPChannel
+    from sshConnector.sshLibs.sshChannelEnvironment import sshEnvironment, EnvironmentControls
 
 
 # logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s %(funcName)s %(lineno)s %(message)s',
@@ -37,6 +46,18 @@ from typing import Union, List, Any, Optional
 log = logging.getLogger('ToolKitInterface')
 
 
+def _sshThreader():
+    """ Imports the sshThreader (and so paramiko) the first time a connection is made instead of at import time. """
+
+    try:
+        from cryptography.utils import CryptographyDeprecationWarning
+        warnings.filterwarnings('ignore', category=CryptographyDeprecationWarning)
+    except ImportError:
+        pass
+    from sshConnector.sshThreader import sshThreader
+    return sshThreader
+
+
 class _ToolKitModules(dict):
 
     tki = None
@@ -70,6 +91,8 @@ class ToolKitInterface:
         if arguments is None:
             arguments = ArgumentWrapper.arguments().parse_known_args()[0]
         self.arguments = arguments
+        self.resultCache = ResultCache(maxEntries=getattr(arguments, 'resultCacheSize', 1024),
+                                       defaultTTL=getattr(arguments, 'resultCacheTTL', None) or None)
         self.auto_login = auto_login
         if auto_login:
             self.createConnection()
@@ -89,7 +112,13 @@ class ToolKitInterface:
         try:
             if arguments is None:
                 arguments = self.arguments
-            self.sshCon = threadedSSH(arguments=arguments, tki=self)
+            threadedSSH = _sshThreader()
+            if getattr(arguments, 'connectionCache', 0):
+                # A cached connection is shared by many ToolKitInterfaces so it is not bound to any of them. Every
+                # command is given its own 'tki' by the 'execute' method instead.
+                self.sshCon = connectionCache.checkout(arguments, lambda: threadedSSH(arguments=arguments))
+            else:
+                self.sshCon = threadedSSH(arguments=arguments, tki=self)
             return self.sshCon
         except Exception as e:
             log.error(f'ERROR: for method createConnection: {e}')
@@ -97,12 +126,33 @@ class ToolKitInterface:
             raise e
 
     def disconnect(self) -> None:
-        """ This wraps around the 'threadedDisconnect' method of the sshConnector """
+        """ This wraps around the 'threadedDisconnect' method of the sshConnector. If the connection came from the
+            connection cache it is given back to the cache instead and stays open until it has been idle for too long.
+            If the 'metricsFile' argument is set the command metrics are written to it in Prometheus text format.
+            If the 'logCursorFile' argument is set the log cursors are saved to it and if the 'factCacheFile' argument
+            is set the host facts are saved to it.
+        """
+        if getattr(self.arguments, 'metricsFile', None):
+            try:
+                metrics.writePrometheus(self.arguments.metricsFile)
+            except Exception as e:
+                log.error(f'ERROR: failed to write the metrics file: {self.arguments.metricsFile}: {e}')
+        if getattr(self.arguments, 'logCursorFile', None):
+            logCursors.save(self.arguments.logCursorFile)
+        if getattr(self.arguments, 'factCacheFile', None):
+            factCache.save(self.arguments.factCacheFile)
         if self.sshCon:
-            self.sshCon.threadedDisconnect()
+            if not connectionCache.checkin(self.sshCon):
+                self.sshCon.threadedDisconnect()
             del self.sshCon
             self.sshCon = None
             self.modules.clear()
+            self.resultCache.clear()
+
+    @property
+    def hostFacts(self) -> Optional[HostFacts]:
+        """ The cached facts of the connected host. See 'LDTKFactCache'. None if there is no connection. """
+        return getattr(self.sshCon, 'hostFacts', None)
 
     def checkConnection(self, *args, **kwargs) -> bool:
         """ This wraps around the 'checkConnection' method of the sshConnector """
@@ -118,7 +168,7 @@ class ToolKitInterface:
             find modules will search under. IE: CommandModules or ProgramModules.
         """
 
-        return find_modules(moduleSubDir=moduleType)
+        return moduleRegistry.names(moduleType)
 
     def getModules(self, *args, **kwargs) -> Union[GenericCmdModule, List[GenericCmdModule]]:
         """ Takes in arguments as args or a single arg in the form of a str or iterable data type. This will take that
@@ -169,7 +219,10 @@ class ToolKitInterface:
                 name += "Module"
             return name.lower(), name
 
-        if moduleName in self.__KNOWNMODULES__:
+        entry = moduleRegistry.resolve(moduleName)
+        if entry is not None:
+            moduleObj = self._importAndInstantiateModuleHelper(entry['module'], entry['class'], **kwargs)
+        elif moduleName in self.__KNOWNMODULES__:
             knowModule = self.__KNOWNMODULES__[moduleName]
             moduleObj = self._importAndInstantiateModuleHelper(knowModule['from'], knowModule['import'], **kwargs)
         else:
@@ -193,7 +246,7 @@ class ToolKitInterface:
 
         def _importHelper(fromName, importName):
             try:
-                return getattr(__import__(fromName), importName)
+                return getattr(import_module(fromName), importName)
             except Exception as e:
                 print(f"Failed to import module {importName} with error:\n{e}")
                 print(f"StackTrace: {traceback.format_exc()}")
@@ -211,24 +264,31 @@ class ToolKitInterface:
 
         return _instantiateModule(_importHelper(moduleFrom, moduleImport))
 
-    def execute(self, commands: Any, threading: bool = True, **kwargs) -> Any:
+    def execute(self, commands: Any, threading: bool = True, stream: bool = False, **kwargs) -> Any:
         """ This is the primary function of the LDTK for executing any command. It can be passed a string, dict,
             CommandContainer object or a list of those types. It can execute commands threaded or unthreaded.
             Threaded is default and unthreaded will use the base/main ssh channel that was opened upon connection.
 
         - :param commands: string,dict,CommandContainer/list/tuple/set
         - :param threading: Bool, default True
+        - :param stream: Bool, default False. If True a single command string is executed and a generator is returned
+            that yields the output as it comes off the channel. Review the '_executeStream' method.
         - :param kwargs: Values passed to the CommandContainer and thus to the sshThreader
         - :return: Depends on if threading is true or not and if successful. Threading=True: It will return a
-            CommandContainer. Threading=False: It will return a dictionary.
+            CommandContainer. Threading=False: It will return a dictionary. Stream=True: It will return a generator.
         """
 
         log.info(f'Executing command/type: {commands}/{type(commands)} with threading = {threading}')
 
+        if stream:
+            return self._executeStream(commands, threading=threading, **kwargs)
+
         if not isinstance(commands, CommandContainer):
             kwargs.update({'tki': kwargs.get('tki', self)})
             kwargs.update({'commandKey': kwargs.get('commandKey', None)})
             commands = CommandContainer(commands, **kwargs)
+        elif not commands.tki:
+            commands.tki = commands._tkiBackup = self
 
         if not self.checkConnection():
             try:
@@ -260,6 +320,84 @@ class ToolKitInterface:
             return outDict
         return _exeUnthread(commands)
 
+    def _executeStream(self, command: AnyStr, threading: bool = True, label: Optional[str] = None,
+                       EnvironmentID: Optional[str] = None, wait: int = 60, root: bool = False,
+                       **kwargs) -> Generator[AnyStr, None, None]:
+        """ Executes a single command and yields its output line by line (or chunk by chunk if 'chunks=True' is passed)
+            as it comes off the channel. The output is only read from the channel as it is consumed. When threading is
+            True an environment is checked out of the sshEnvironmentManager and held until the generator is exhausted,
+            closed or garbage collected. Otherwise the main environment is used. The command is checked, the environment
+            is checked out and root is obtained before this returns so errors are raised to the caller of 'execute'.
+            This is called by the execute method.
+
+        - :param command: (str) The command to execute.
+        - :param threading: (bool) default True. Use an environment from the pool instead of the main environment.
+        - :param label: (str) default None. Passed to 'getEnvironment'.
+        - :param EnvironmentID: (str) default None. Passed to 'getEnvironment'.
+        - :param wait: (int) default 60. How long to wait for an environment.
+        - :param root: (bool) default False. Become root before executing the command.
+        - :param kwargs: Passed to the 'streamOnEnvironment' method in sshBufferControl.
+        - :return: (Generator) of strings
+        """
+
+        if isinstance(command, CommandContainer):
+            command = command.command
+        if not isinstance(command, str):
+            raise LDTKCommandException(f'Streaming requires a single command string not: {type(command)}')
+        if not self.checkConnection():
+            self.createConnection()
+
+        environment = kwargs.pop('environment', None)
+        if environment is None and threading:
+            environment = self.sshCon.getEnvironment(label=label, EnvironmentID=EnvironmentID, wait=wait)
+        elif environment is None:
+            environment = self.sshCon.mainEnvironment
+        if not environment:
+            raise LDTKCommandException(f'Failed to get an environment to stream the command: {command}')
+
+        env = environment.__enter__()
+        try:
+            if root and not env.becomeRoot():
+                raise LDTKCommandException(f'Failed to become root to stream the command: {command}')
+        except BaseException:
+            env.__exit__(*sys.exc_info())
+            raise
+
+        def _stream():
+            try:
+                # The first yield starts the generator inside the try so closing it always gives the environment back
+                yield
+                yield from self.sshCon.streamOnEnvironment(env, command, **kwargs)
+            finally:
+                env.__exit__(*sys.exc_info())
+
+        stream = _stream()
+        next(stream)
+        return stream
+
+    async def aexecute(self, commands: Any, wait: Optional[Union[int, float]] = None, **kwargs) -> Any:
+        """ The asyncio front-end for the 'execute' method. The command(s) are always executed threaded by the
+            sshThreader and the awaiting task is woken up by a done callback on the CommandContainer so no thread is
+            held per pending command. This lets one event loop drive many commands across many ToolKitInterfaces.
+            If a connection needs to be made it is made in the default executor of the event loop.
+
+            Example:
+                results = await asyncio.gather(*[tki.aexecute('uptime') for tki in tkis])
+
+        - :param commands: string,dict,CommandContainer/list/tuple/set
+        - :param wait: default None. How long to wait for the results. Defaults to the timeout of the CommandContainer.
+        - :param kwargs: Values passed to the 'execute' method.
+        - :return: The results of the CommandContainer.
+        """
+
+        kwargs.pop('threading', None)
+        if not self.checkConnection():
+            await asyncio.get_running_loop().run_in_executor(None, self.createConnection)
+        commands = self.execute(commands, threading=True, **kwargs)
+        if not isinstance(commands, CommandContainer):
+            return commands
+        return await commands.asyncWaitForResults(wait=wait)
+
     def waitForIdle(self, timeout: Union[int, float] = 60, delay: float = 0.1, block: bool = False) -> bool:
         """ This waits on the threads in the sshThreader class within sshConnector, to complete. This actually calls the
             'waitForIdle' method in sshThreader which just calls the 'waitCompletion' method in ThreadPool.
@@ -312,12 +450,14 @@ class ToolKitInterface:
 
     def getSFTPClient(self) -> SFTPChannel:
         """ Creates and returns a SFTP Channel object """
+        from sshConnector.sshLibs.SFTPChannel import SFTPChannel
         if not self.checkConnection():
             self.createConnection()
         return SFTPChannel(self)
 
     def getSCPClient(self) -> SCPChannel:
         """ Creates and returns a SCP Channel object """
+        from sshConnector.sshLibs.SCPChannel import SCPChannel
         if not self.checkConnection():
             self.createConnection()
         return SCPChannel(self)
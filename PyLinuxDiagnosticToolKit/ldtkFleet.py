@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: This is designed to run the same command or module call across many hosts at once. It keeps a bounded
+# pool of ToolKitInterface connections (one per host) and fans work out over a bounded amount of worker threads. Results
+# are yielded as each host finishes.
+
+
+import logging
+import time
+import traceback
+from copy import copy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as futuresWait, FIRST_COMPLETED
+from threading import Event, RLock, Thread
+from libs import ArgumentWrapper
+from libs.ArgumentWrapper import ArgumentParsers
+from PyLinuxDiagnosticToolKit.ldtk import ToolKitInterface
+from LinuxModules.CommandContainers import CommandContainer
+from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import FleetTimeoutException, CancelledException
+from typing import Any, AnyStr, Callable, Generator, Iterable, List, Optional, Tuple, Union
+
+
+log = logging.getLogger('ToolKitFleet')
+
+
+class FleetResult(object):
+    """ The result of running something on a single host within the ToolKitFleet """
+
+    __slots__ = ('host', 'result', 'exception', 'elapsed')
+
+    def __init__(self, host: AnyStr, result: Any = None, exception: Optional[BaseException] = None,
+                 elapsed: float = 0.0):
+        self.host = host
+        self.result = result
+        self.exception = exception
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        if self.exception is not None:
+            return f'<FleetResult host={self.host} exception={self.exception!r} elapsed={self.elapsed:.2f}>'
+        return f'<FleetResult host={self.host} elapsed={self.elapsed:.2f}>'
+
+    @property
+    def success(self) -> bool:
+        return self.exception is None
+
+
+class ToolKitFleet(object):
+    """ Runs commands and module calls on many hosts. Each host gets its own ToolKitInterface which is cached and
+        reused across calls. Only 'maxConnections' connections are kept open at once (least recently used are
+        disconnected first) and only 'maxConcurrency' hosts are worked on at the same time.
+
+        Example:
+            with ToolKitFleet(['host1', {'host': 'host2', 'username': 'other'}], arguments=args) as fleet:
+                for res in fleet.execute('uptime'):
+                    print(res.host, res.result)
+                for res in fleet.runModule('ps', 'getTopCPU', top=5):
+                    print(res.host, res.result)
+    """
+
+    def __init__(self, hosts: Optional[Iterable[Union[AnyStr, dict]]] = None,
+                 arguments: Optional[ArgumentParsers] = None, maxConnections: int = 32,
+                 maxConcurrency: Optional[int] = None, hostTimeout: Optional[float] = 300):
+        """ Init function for the ToolKitFleet.
+
+        - :param hosts: (list) of hostnames or dicts. A dict must have the key 'host' and any other keys override the
+            argument of the same name for that host only (IE: username, password, key, port). If None this uses the
+            'hosts' argument.
+        - :param arguments: (NamespaceDict) The arguments shared by every host. If None they are parsed from sys.argv.
+        - :param maxConnections: (int) default 32. The most ToolKitInterface connections kept open at once.
+        - :param maxConcurrency: (int) default None. The most hosts worked on at once. Defaults to 'maxConnections'.
+        - :param hostTimeout: (float) default 300. How long a single host may run before it is reported as timed out.
+        """
+
+        if arguments is None:
+            arguments = ArgumentWrapper.arguments().parse_known_args()[0]
+        self.arguments = arguments
+        self.hosts = OrderedDict((self._hostName(host), host) for host in (hosts or arguments.hosts or []))
+        self.maxConnections = max(1, maxConnections)
+        self.maxConcurrency = max(1, maxConcurrency or self.maxConnections)
+        self.hostTimeout = hostTimeout
+        self._connections = OrderedDict()
+        self._CONNECTION_LOCK = RLock()
+        self._inUse = {}
+        self._containers = set()
+        self._cancelEvent = Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disconnect()
+
+    def run(self, func: Callable[[ToolKitInterface], Any], hosts: Optional[Iterable[Union[AnyStr, dict]]] = None,
+            hostTimeout: Optional[float] = None) -> Generator[FleetResult, None, None]:
+        """ Calls 'func' with the ToolKitInterface of each host and yields a FleetResult as each host finishes. A host
+            that takes longer then the host timeout is yielded with a FleetTimeoutException and its connection is closed
+            so the worker thread is released.
+
+        - :param func: (Callable) Takes a ToolKitInterface and returns anything.
+        - :param hosts: (list) default None. A subset or different set of hosts. Defaults to the fleet hosts.
+        - :param hostTimeout: (float) default None. Overrides the fleet host timeout.
+        - :return: (Generator) of FleetResult
+        """
+
+        hosts = self.hosts if hosts is None else OrderedDict((self._hostName(host), host) for host in hosts)
+        hostTimeout = self.hostTimeout if hostTimeout is None else hostTimeout
+        startTimes = {}
+        self._cancelEvent.clear()
+
+        executor = ThreadPoolExecutor(max_workers=self.maxConcurrency, thread_name_prefix='ldtkFleet')
+        pending = {executor.submit(self._runOnHost, name, host, func, startTimes): name
+                   for name, host in hosts.items()}
+        try:
+            while pending:
+                timeout = None
+                if hostTimeout:
+                    now = time.time()
+                    running = [startTimes[name] + hostTimeout - now for name in pending.values() if name in startTimes]
+                    timeout = max(0.0, min(running)) if running else hostTimeout
+                done, _ = futuresWait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                    yield future.result()
+                if not hostTimeout:
+                    continue
+                now = time.time()
+                for future, name in list(pending.items()):
+                    if name in startTimes and now - startTimes[name] > hostTimeout:
+                        pending.pop(future)
+                        log.error(f"The host: {name} did not finish within {hostTimeout} seconds")
+                        Thread(target=self._dropConnection, args=(name,), daemon=True).start()
+                        yield FleetResult(name, exception=FleetTimeoutException(
+                            f'The host: {name} did not finish within {hostTimeout} seconds'),
+                            elapsed=now - startTimes[name])
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def execute(self, commands: Any, wait: Optional[float] = None, **kwargs) -> Generator[FleetResult, None, None]:
+        """ Runs the same command(s) on every host. The commands are passed to 'ToolKitInterface.execute' and the
+            results of the CommandContainer are returned. A CommandContainer cannot be shared between hosts so pass
+            the command data (string, dict, list, tuple or set) instead.
+
+        - :param commands: string,dict/list/tuple/set
+        - :param wait: (float) default None. How long to wait for the CommandContainer. Defaults to the host timeout.
+        - :param kwargs: Passed to 'ToolKitInterface.execute'.
+        - :return: (Generator) of FleetResult
+        """
+
+        wait = wait or self.hostTimeout
+
+        def _execute(tki):
+            cc = tki.execute(commands, **kwargs)
+            if not isinstance(cc, CommandContainer):
+                return cc
+            with self._CONNECTION_LOCK:
+                self._containers.add(cc)
+            try:
+                if self._cancelEvent.is_set():
+                    cc.cancel(wait=0)
+                return cc.waitForResults(wait=wait)
+            finally:
+                with self._CONNECTION_LOCK:
+                    self._containers.discard(cc)
+
+        return self.run(_execute)
+
+    def runModule(self, moduleName: AnyStr, method: AnyStr = 'run', *args,
+                  **kwargs) -> Generator[FleetResult, None, None]:
+        """ Calls the same method of the same CommandModule on every host. IE: runModule('ps', 'getTopCPU', top=5)
+
+        - :param moduleName: (str) The name of the module as used by 'ToolKitInterface.getModules'.
+        - :param method: (str) default 'run'. The method on the module to call.
+        - :param args: Passed to the method.
+        - :param kwargs: Passed to the method.
+        - :return: (Generator) of FleetResult
+        """
+
+        def _runModule(tki):
+            return getattr(tki.getModules(moduleName), method)(*args, **kwargs)
+
+        return self.run(_runModule)
+
+    def cancel(self, wait: Optional[float] = 10) -> int:
+        """ Cancels the batch that is running. Every CommandContainer started by 'execute' is cancelled (review
+            'CommandContainer.cancel') and hosts that have not started yet are yielded with a CancelledException.
+
+        - :param wait: (float) default 10. Passed to 'CommandContainer.cancel'.
+        - :return: (int) The amount of CommandContainers that were cancelled.
+        """
+
+        self._cancelEvent.set()
+        with self._CONNECTION_LOCK:
+            containers = list(self._containers)
+        threads = [Thread(target=cc.cancel, kwargs={'wait': wait}, daemon=True) for cc in containers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(containers)
+
+    def getToolKitInterface(self, host: Union[AnyStr, dict]) -> ToolKitInterface:
+        """ Returns the cached ToolKitInterface for the host or creates and connects a new one. If this pushes the
+            amount of connections over 'maxConnections' the least recently used idle connection is disconnected.
+
+        - :param host: (str or dict)
+        - :return: (ToolKitInterface)
+        """
+
+        name = self._hostName(host)
+        with self._CONNECTION_LOCK:
+            tki = self._connections.get(name)
+            if tki is not None:
+                self._connections.move_to_end(name)
+        if tki is None:
+            tki = ToolKitInterface(arguments=self._hostArguments(host), auto_login=False)
+        if not tki.checkConnection():
+            tki.createConnection()
+        with self._CONNECTION_LOCK:
+            self._connections[name] = tki
+            self._connections.move_to_end(name)
+            evicted = self._evictConnections()
+        self._disconnectEvicted(evicted)
+        return tki
+
+    def disconnect(self) -> None:
+        """ Disconnects every cached ToolKitInterface. """
+
+        with self._CONNECTION_LOCK:
+            connections = list(self._connections.items())
+            self._connections.clear()
+        for name, tki in connections:
+            try:
+                tki.disconnect()
+            except Exception as e:
+                log.error(f'ERROR: for method disconnect on host {name}: {e}')
+                log.debug(f'[DEBUG] for method disconnect: {traceback.format_exc()}')
+
+    def _runOnHost(self, name: AnyStr, host: Union[AnyStr, dict], func: Callable[[ToolKitInterface], Any],
+                   startTimes: dict) -> FleetResult:
+        startTimes[name] = time.time()
+        if self._cancelEvent.is_set():
+            return FleetResult(name, exception=CancelledException(f'The batch was cancelled before host: {name}'))
+        with self._CONNECTION_LOCK:
+            self._inUse[name] = self._inUse.get(name, 0) + 1
+        try:
+            return FleetResult(name, result=func(self.getToolKitInterface(host)),
+                               elapsed=time.time() - startTimes[name])
+        except Exception as e:
+            log.error(f'ERROR: for host {name}: {e}')
+            log.debug(f'[DEBUG] for method _runOnHost: {traceback.format_exc()}')
+            return FleetResult(name, exception=e, elapsed=time.time() - startTimes[name])
+        finally:
+            with self._CONNECTION_LOCK:
+                self._inUse[name] -= 1
+                if not self._inUse[name]:
+                    self._inUse.pop(name)
+                evicted = self._evictConnections()
+            self._disconnectEvicted(evicted)
+
+    def _evictConnections(self) -> List[Tuple[AnyStr, ToolKitInterface]]:
+        """ Removes least recently used connections that are not in use until under 'maxConnections'. This must be
+            called while holding '_CONNECTION_LOCK'. The removed connections are returned so they can be given to
+            '_disconnectEvicted' once the lock is released as disconnecting can take a long time.
+
+        - :return: (list) of (name, ToolKitInterface)
+        """
+
+        evicted = []
+        for name in list(self._connections):
+            if len(self._connections) <= self.maxConnections:
+                break
+            if name in self._inUse:
+                continue
+            evicted.append((name, self._connections.pop(name)))
+        return evicted
+
+    def _disconnectEvicted(self, evicted: List[Tuple[AnyStr, ToolKitInterface]]) -> None:
+        """ Disconnects each evicted connection on its own daemon thread so the worker is not held up. """
+
+        for name, tki in evicted:
+            Thread(target=self._disconnectHost, args=(name, tki), daemon=True).start()
+
+    def _dropConnection(self, name: AnyStr) -> None:
+        with self._CONNECTION_LOCK:
+            tki = self._connections.pop(name, None)
+        if tki is not None:
+            self._disconnectHost(name, tki)
+
+    @staticmethod
+    def _disconnectHost(name: AnyStr, tki: ToolKitInterface) -> None:
+        try:
+            tki.disconnect()
+        except Exception as e:
+            log.debug(f'Failed to disconnect the host: {name} error: {e}')
+
+    def _hostArguments(self, host: Union[AnyStr, dict]):
+        arguments = copy(self.arguments)
+        if isinstance(host, dict):
+            for key, value in host.items():
+                setattr(arguments, key, value)
+        else:
+            arguments.host = host
+        return arguments
+
+    @staticmethod
+    def _hostName(host: Union[AnyStr, dict]) -> AnyStr:
+        if isinstance(host, dict):
+            return host['host']
+        return host
@@ -247,6 +247,9 @@ def arguments(explicit_option_match=True, option_sep='='):
                              'login. Or if sudo requires a password of a different user.')
     parser.add_argument('--bash-norc', dest='useBashnorc', action='store_true', default=True,
                         help='Determines if the script should open bash with the -norc flag to avoid custom prompts')
+    parser.add_argument('--keepEcho', dest='keepEcho', action='store_true', default=False,
+                        help='Keep the terminal echo and the normal bash prompt on environments instead of turning '
+                             'the echo off and setting the prompt to a unique token')
     parser.add_argument('--runtimeout', dest='runTimeout', type=int, default=300,
                         help='Total run time for commands (in seconds)')  # 300
     parser.add_argument('--firstBitTimeout', dest='firstBitTimeout', type=int, default=240,
@@ -260,9 +263,45 @@ def arguments(explicit_option_match=True, option_sep='='):
                         help='ssh connection timeout (in seconds) review Paramiko documentation for more info')  # 60
     parser.add_argument('--iotimeout', dest='ioTimeout', type=float, default=0.2,
                         help='command timeout (in seconds), review Paramiko documentation for more info')  # 300
+    parser.add_argument('--readerMode', dest='readerMode', type=str, default='poll', choices=['poll', 'select'],
+                        help='How to wait on channel buffers. poll checks the buffer every "delay" seconds while '
+                             'select blocks on the channel file descriptor until data arrives')
+    parser.add_argument('--execMode', dest='execMode', type=str, default='shell', choices=['auto', 'shell'],
+                        help='shell runs every command in a shell environment. auto runs threaded commands that need '
+                             'no root, label or escalation on their own exec channel without a PTY, those commands '
+                             'keep stderr apart from their results and do not run in a login shell')
+    parser.add_argument('--fallbackEncoding', dest='fallbackEncoding', type=str, default='latin1',
+                        help='The encoding used to decode command output that is not valid utf-8')
     parser.add_argument('--maxChannels', dest='maxChannels', type=int, default=0,
                         help='The amount of ssh channels the sshConnector can spawn. If 0 it will attempt to pull the'
                              'MaxSessions value from the target sshd_config file. This requires the root flag.')
+    parser.add_argument('--prewarmEnvironments', dest='prewarmEnvironments', type=int, default=0,
+                        help='The amount of environments to open and escalate in parallel right after connecting. This '
+                             'is capped by the maxChannels/MaxSessions value. 0 disables pre-warming')
+    parser.add_argument('--reservedEnvironments', dest='reservedEnvironments', type=int, default=1,
+                        help='The amount of worker sessions kept for short commands. Long commands (low priority or '
+                             'flagged longRunning) can not use them while they wait in the queue')
+    parser.add_argument('--idleEnvironments', dest='idleEnvironments', type=int, default=0,
+                        help='The amount of idle ready to use environments a background thread should keep open. '
+                             '0 disables the background refiller')
+    parser.add_argument('--resultCacheSize', dest='resultCacheSize', type=int, default=1024,
+                        help='The most command results CommandModules keep per connection. 0 does not limit it')
+    parser.add_argument('--resultCacheTTL', dest='resultCacheTTL', type=float, default=0,
+                        help='Seconds a command result is reused by CommandModules that do not set their own TTL. '
+                             '0 reuses results until rerun')
+    parser.add_argument('--metricsFile', dest='metricsFile', type=str, default="",
+                        help='Write the command timing metrics in Prometheus text format to this file on disconnect')
+    parser.add_argument('--logCursorFile', dest='logCursorFile', type=str, default="",
+                        help='Save the log file cursors to this JSON file so the next run only reads new log lines')
+    parser.add_argument('--factCacheFile', dest='factCacheFile', type=str, default="",
+                        help='Save the facts discovered about each host to this JSON file so the next run to a known '
+                             'host skips discovery')
+    parser.add_argument('--factCacheTTL', dest='factCacheTTL', type=float, default=86400,
+                        help='Seconds a discovered host fact is kept. Facts are always dropped when the host reboots. '
+                             '0 keeps them until the host reboots')
+    parser.add_argument('--connectionCache', dest='connectionCache', type=float, default=0,
+                        help='Keep the connection open in a process wide cache for this many idle seconds so a new '
+                             'ToolKitInterface to the same host reuses it. 0 disables the cache')
     parser.add_argument('--proxyUser', dest='proxyUser', type=str, default="",
                         help='The proxy user for use with SSH proxy servers/bastion servers')
     parser.add_argument('--proxyServer', dest='proxyServer', type=str, default="",
@@ -271,6 +310,8 @@ def arguments(explicit_option_match=True, option_sep='='):
                         help='Device ID, used for logging')
     parser.add_argument('--devices', '--deviceids', dest=('devices', 'deviceids'), nargs='*', default=['11111'],
                         help='Use for passing multiple Device IDs')
+    parser.add_argument('--hosts', dest='hosts', nargs='*', default=[],
+                        help='Use for passing multiple hosts to the ToolKitFleet')
     parser.add_argument('--retry', dest='retry', action='store_true',
                         help='Attempt to retry failed commands')
     parser.add_argument('--readonly', dest='readonly', action='store_true',
@@ -107,6 +107,11 @@ class BetweenBitException(LDTKSSHException):
     pass
 
 
+class FleetTimeoutException(LDTKBaseException):
+    """ ToolKitFleet host did not finish within the host timeout """
+    pass
+
+
 class LDTKUserException(LDTKBaseException):
     """ Used for handling user escalations/escalations and environment changes. """
     pass
@@ -164,3 +169,7 @@ class DataFormatException(CommandObjectException):
 
 class ForceCompleteException(CommandObjectException):
     pass
+
+
+class CancelledException(CommandObjectException):
+    pass
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: A cache of facts discovered about remote hosts such as the OS, timezone, 'which' results and the
+# MaxSessions value. Hosts are identified by the fingerprint of their host key and their hostname. Every fact expires
+# after the TTL of the cache and all of the facts of a host are dropped when its boot_id changes (IE: it rebooted). The
+# facts can be saved to a JSON file so a new session to a known host skips discovery.
+
+
+import time
+import base64
+import hashlib
+import logging
+from threading import RLock
+from typing import Any, AnyStr, Dict, Optional
+from PyLinuxDiagnosticToolKit.libs.LDTKJsonStore import JsonStore
+
+
+log = logging.getLogger('LDTKFactCache')
+
+
+class HostFacts(object):
+    """ The facts of a single host. Values must be JSON serializable to be saved. Every access to the facts holds the
+        lock of the FactCache so 'save' never sees them change while it copies them.
+    """
+
+    __slots__ = ('identity', 'bootId', 'facts', 'ttl', '_LOCK')
+
+    def __init__(self, identity: AnyStr, bootId: Optional[AnyStr] = None, facts: Optional[Dict] = None,
+                 ttl: Optional[float] = None, lock: Optional[RLock] = None):
+        self.identity = identity
+        self.bootId = bootId
+        self.facts = facts or {}
+        self.ttl = ttl
+        self._LOCK = lock or RLock()
+
+    def __repr__(self):
+        return f'<HostFacts {self.identity} boot_id={self.bootId} facts={len(self.facts)}>'
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def get(self, name: AnyStr, default: Any = None) -> Any:
+        """ Returns the value of a fact or 'default' if it is missing or expired. """
+
+        with self._LOCK:
+            item = self.facts.get(name)
+            if item is None:
+                return default
+            value, updated = item
+            if self.ttl and time.time() - updated > self.ttl:
+                self.facts.pop(name, None)
+                return default
+            return value
+
+    def set(self, name: AnyStr, value: Any) -> Any:
+        with self._LOCK:
+            self.facts[name] = (value, time.time())
+        return value
+
+    def update(self, facts: Dict) -> None:
+        now = time.time()
+        with self._LOCK:
+            self.facts.update({name: (value, now) for name, value in facts.items()})
+
+    def invalidate(self, name: Optional[AnyStr] = None) -> None:
+        """ Removes one fact or all of them if 'name' is None. """
+
+        with self._LOCK:
+            if name is None:
+                self.facts.clear()
+            else:
+                self.facts.pop(name, None)
+
+    def toDict(self) -> dict:
+        with self._LOCK:
+            return {'identity': self.identity, 'bootId': self.bootId,
+                    'facts': {name: list(item) for name, item in self.facts.items()}}
+
+
+class FactCache(JsonStore):
+    """ Holds the HostFacts of every host. Only hosts with facts are saved. """
+
+    __STORENAME__ = 'fact cache'
+    __PREFIX__ = '.ldtk_facts'
+
+    def __init__(self, path: Optional[AnyStr] = None, ttl: Optional[float] = 86400):
+        """
+        - :param path: (str) default None. The JSON file used by 'load' and 'save'.
+        - :param ttl: (float) default 86400. Seconds a fact is kept. None or 0 keeps facts until the host reboots.
+        """
+
+        super(FactCache, self).__init__(path)
+        self.ttl = ttl
+        self._hosts: Dict[AnyStr, HostFacts] = {}
+
+    @staticmethod
+    def identity(hostKey: Any, hostname: AnyStr) -> AnyStr:
+        """ Builds the identity of a host from its host key and hostname. The fingerprint is the SHA256 fingerprint
+            as printed by 'ssh-keygen -l'.
+
+        - :param hostKey: A paramiko PKey, the bytes of the key or None.
+        - :param hostname: (str)
+        - :return: (str) 'hostname SHA256:fingerprint'
+        """
+
+        if hostKey is None:
+            return f'{hostname} SHA256:'
+        if not isinstance(hostKey, bytes):
+            hostKey = hostKey.asbytes()
+        fingerprint = base64.b64encode(hashlib.sha256(hostKey).digest()).decode().rstrip('=')
+        return f'{hostname} SHA256:{fingerprint}'
+
+    def host(self, identity: AnyStr, bootId: Optional[AnyStr] = None) -> HostFacts:
+        """ Returns the HostFacts for this identity creating it if needed. If 'bootId' is given and it does not match
+            the boot_id the facts were gathered under then the host has rebooted and its facts are dropped.
+
+        - :param identity: (str) From 'identity'.
+        - :param bootId: (str) default None. The contents of /proc/sys/kernel/random/boot_id.
+        - :return: (HostFacts)
+        """
+
+        with self._LOCK:
+            hostFacts = self._hosts.get(identity)
+            if hostFacts is None:
+                hostFacts = self._hosts[identity] = HostFacts(identity, bootId, ttl=self.ttl, lock=self._LOCK)
+            elif bootId and hostFacts.bootId != bootId:
+                log.debug(f'The boot_id of {identity} changed, dropping {len(hostFacts.facts)} facts')
+                hostFacts.invalidate()
+                hostFacts.bootId = bootId
+            hostFacts.ttl = self.ttl
+            return hostFacts
+
+    def remove(self, identity: AnyStr) -> bool:
+        with self._LOCK:
+            return self._hosts.pop(identity, None) is not None
+
+    def clear(self) -> None:
+        with self._LOCK:
+            self._hosts.clear()
+
+    def _fromData(self, data: dict) -> None:
+        for item in data.get('hosts', []):
+            if item['identity'] not in self._hosts:
+                facts = {name: tuple(value) for name, value in item.get('facts', {}).items()}
+                self._hosts[item['identity']] = HostFacts(item['identity'], item.get('bootId'), facts, self.ttl,
+                                                          self._LOCK)
+
+    def _toData(self) -> dict:
+        return {'hosts': [hostFacts.toDict() for hostFacts in self._hosts.values() if hostFacts.facts]}
+
+
+factCache = FactCache()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: Helpers for the state LDTK keeps on disk (log cursors, host facts, metrics and the module index). Files
+# are written to a temporary file in the same directory which then replaces the old file in one step so a crash or a
+# reader (IE: the node_exporter textfile collector) never sees a partial file. 'JsonStore' is the base of the stores
+# that load and save themselves as a JSON file.
+
+
+import os
+import json
+import logging
+import tempfile
+import traceback
+from threading import RLock
+from typing import Any, AnyStr, Optional
+
+
+log = logging.getLogger('LDTKJsonStore')
+
+
+def atomicWrite(path: AnyStr, text: AnyStr, prefix: AnyStr = '.ldtk') -> None:
+    """ Replaces the file at 'path' with 'text' in one step. Errors are raised after the temporary file is removed.
+
+    - :param path: (str)
+    - :param text: (str)
+    - :param prefix: (str) default '.ldtk'. The prefix of the temporary file.
+    """
+
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=prefix)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmpPath, path)
+    except Exception:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def atomicWriteJson(path: AnyStr, data: Any, prefix: AnyStr = '.ldtk') -> None:
+    """ Same as 'atomicWrite' but serializes 'data' as JSON first. """
+
+    atomicWrite(path, json.dumps(data), prefix=prefix)
+
+
+class JsonStore(object):
+    """ The base of a store that can be loaded from and saved to a JSON file. Subclasses implement '_fromData' and
+        '_toData' which are both called while holding '_LOCK'.
+    """
+
+    __STORENAME__ = 'store'
+    __PREFIX__ = '.ldtk'
+
+    def __init__(self, path: Optional[AnyStr] = None):
+        self.path = path
+        self._LOCK = RLock()
+        self._loaded = False
+
+    def load(self, path: Optional[AnyStr] = None) -> bool:
+        """ Loads the store from a JSON file written by 'save'. Entries already in memory are kept.
+
+        - :param path: (str) default None. Defaults to the path of the store.
+        - :return: (bool) True if the file was loaded.
+        """
+
+        path = path or self.path
+        if not path:
+            return False
+        with self._LOCK:
+            self.path = path
+            self._loaded = True
+            if not os.path.isfile(path):
+                return False
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except Exception as e:
+                log.error(f'ERROR: failed to load the {self.__STORENAME__} file: {path}: {e}')
+                log.debug(f'[DEBUG] for method load: {traceback.format_exc()}')
+                return False
+            self._fromData(data)
+        return True
+
+    def loadOnce(self, path: Optional[AnyStr]) -> None:
+        """ Calls 'load' the first time a path is given. This is used by modules that only see the arguments. """
+
+        if path and (not self._loaded or path != self.path):
+            self.load(path)
+
+    def save(self, path: Optional[AnyStr] = None) -> bool:
+        """ Writes the store to a JSON file with 'atomicWriteJson'.
+
+        - :param path: (str) default None. Defaults to the path of the store.
+        - :return: (bool) True if the file was written.
+        """
+
+        path = path or self.path
+        if not path:
+            return False
+        with self._LOCK:
+            data = self._toData()
+        try:
+            atomicWriteJson(path, data, prefix=self.__PREFIX__)
+        except Exception as e:
+            log.error(f'ERROR: failed to save the {self.__STORENAME__} file: {path}: {e}')
+            log.debug(f'[DEBUG] for method save: {traceback.format_exc()}')
+            return False
+        return True
+
+    def _fromData(self, data: dict) -> None:
+        raise NotImplementedError
+
+    def _toData(self) -> dict:
+        raise NotImplementedError
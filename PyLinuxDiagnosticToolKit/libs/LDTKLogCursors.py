@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: Byte offset cursors for remote log files. A cursor records the inode and the last byte offset read of a
+# log file on a host so the next read only has to fetch the bytes appended since then. The inode and size are checked
+# on every read so log rotation (new inode) and truncation (smaller size) are detected. Cursors can be saved to a JSON
+# file so they survive between runs.
+
+
+import time
+import logging
+from collections import deque
+from typing import AnyStr, Dict, Optional, Tuple
+from PyLinuxDiagnosticToolKit.libs.LDTKJsonStore import JsonStore
+
+
+log = logging.getLogger('LDTKLogCursors')
+
+
+class LogCursor(object):
+    """ The read position of a single log file on a single host. The 'window' holds the most recent lines read by
+        'tailModule.tailWindow' and is only kept in memory.
+    """
+
+    __slots__ = ('host', 'path', 'consumer', 'inode', 'offset', 'updated', 'window')
+
+    def __init__(self, host: AnyStr, path: AnyStr, consumer: AnyStr = 'default', inode: Optional[int] = None,
+                 offset: int = 0, updated: Optional[float] = None):
+        self.host = host
+        self.path = path
+        self.consumer = consumer
+        self.inode = inode
+        self.offset = offset
+        self.updated = updated or time.time()
+        self.window = None
+
+    def __repr__(self):
+        return f'<LogCursor {self.host}:{self.path} ({self.consumer}) inode={self.inode} offset={self.offset}>'
+
+    @property
+    def key(self) -> Tuple:
+        return self.host, self.path, self.inode
+
+    def advance(self, inode: int, offset: int) -> None:
+        self.inode = inode
+        self.offset = offset
+        self.updated = time.time()
+
+    def updateWindow(self, lines: list, size: int, reset: bool = False) -> None:
+        """ Adds lines to the in memory window. The window is replaced if 'reset' is True or it does not exist.
+
+        - :param lines: (list) of strings
+        - :param size: (int) The max amount of lines the window holds.
+        - :param reset: (bool) default False.
+        """
+
+        if reset or self.window is None or self.window.maxlen != size:
+            self.window = deque(lines, maxlen=size)
+        else:
+            self.window.extend(lines)
+
+    def toDict(self) -> dict:
+        return {'host': self.host, 'path': self.path, 'consumer': self.consumer, 'inode': self.inode,
+                'offset': self.offset, 'updated': self.updated}
+
+
+class LogCursorStore(JsonStore):
+    """ Holds the LogCursors of every host. A cursor is looked up by host, path and consumer. The consumer lets two
+        callers read the same log file without taking each others new lines. The inode stored in the cursor completes
+        the (host, path, inode) identity of the file. Only cursors that have read a file are saved.
+    """
+
+    __STORENAME__ = 'log cursor'
+    __PREFIX__ = '.ldtk_cursors'
+
+    def __init__(self, path: Optional[AnyStr] = None):
+        super(LogCursorStore, self).__init__(path)
+        self._cursors: Dict[Tuple, LogCursor] = {}
+
+    def get(self, host: AnyStr, path: AnyStr, consumer: AnyStr = 'default') -> LogCursor:
+        """ Returns the cursor for this log file. A new cursor with no inode is created if there is none.
+
+        - :param host: (str)
+        - :param path: (str) The path of the log file on the host.
+        - :param consumer: (str) default 'default'.
+        - :return: (LogCursor)
+        """
+
+        with self._LOCK:
+            cursor = self._cursors.get((host, path, consumer))
+            if cursor is None:
+                cursor = self._cursors[(host, path, consumer)] = LogCursor(host, path, consumer)
+            return cursor
+
+    def remove(self, host: AnyStr, path: Optional[AnyStr] = None, consumer: Optional[AnyStr] = None) -> int:
+        """ Removes the cursors of a host. If 'path' or 'consumer' are given only matching cursors are removed.
+
+        - :return: (int) The amount of cursors removed.
+        """
+
+        with self._LOCK:
+            keys = [key for key in self._cursors if key[0] == host and (path is None or key[1] == path) and
+                    (consumer is None or key[2] == consumer)]
+            for key in keys:
+                self._cursors.pop(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._LOCK:
+            self._cursors.clear()
+
+    def _fromData(self, data: dict) -> None:
+        for item in data.get('cursors', []):
+            key = (item['host'], item['path'], item.get('consumer', 'default'))
+            if key not in self._cursors:
+                self._cursors[key] = LogCursor(key[0], key[1], key[2], item.get('inode'), item.get('offset', 0),
+                                               item.get('updated'))
+
+    def _toData(self) -> dict:
+        return {'cursors': [cursor.toDict() for cursor in self._cursors.values() if cursor.inode is not None]}
+
+
+logCursors = LogCursorStore()
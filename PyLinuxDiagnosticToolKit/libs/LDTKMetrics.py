@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: Per phase timings and byte counts for CommandContainers and Environments. Every CommandContainer has a
+# CommandMetrics object that is filled in as it executes and recorded into the process wide MetricsRegistry when it
+# finishes. The registry keeps histograms per module and commandKey and can call exporters or write Prometheus text.
+# Commands that are not run by a module are aggregated under the 'adhoc' commandKey and each module only gets a bounded
+# amount of commandKeys so keys made per call (IE: uuids or keys built from arguments) do not grow without limit.
+
+
+import time
+import logging
+import traceback
+from contextlib import contextmanager
+from threading import RLock
+from typing import Any, AnyStr, Callable, Dict, Optional, Tuple
+from PyLinuxDiagnosticToolKit.libs.LDTKJsonStore import atomicWrite
+
+
+log = logging.getLogger('LDTKMetrics')
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class CommandMetrics(object):
+    """ The timings and byte counts of a single CommandContainer or Environment. Phase times are added together if a
+        phase happens more then once. IE: An Environment that escalates several times.
+    """
+
+    def __init__(self, commandKey: Optional[AnyStr] = None, moduleName: Optional[AnyStr] = None):
+        self.commandKey = commandKey
+        self.moduleName = moduleName
+        self.environmentID = None
+        self.phases = {}
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.commands = 0
+        self.timeToFirstByte = None
+        self.failure = None
+        self._LOCK = RLock()
+
+    def __repr__(self):
+        return f'<CommandMetrics {self.moduleName}:{self.commandKey} {self.toDict()}>'
+
+    def addPhase(self, phase: AnyStr, seconds: float) -> None:
+        """ Adds time to a phase.
+
+        - :param phase: (str) IE: 'environmentWait', 'setup', 'requirements', 'preparser', 'execution', 'send',
+            'postparser', 'completion' or 'escalation'.
+        - :param seconds: (float)
+        """
+
+        with self._LOCK:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase: AnyStr):
+        """ Context manager that times the block and adds it to the phase. """
+
+        start = time.time()
+        try:
+            yield self
+        finally:
+            self.addPhase(phase, time.time() - start)
+
+    def timed(self, phase: AnyStr, func: Callable, *args, **kwargs) -> Any:
+        """ Calls 'func' with the args and kwargs and adds how long it took to the phase.
+
+        - :return: Whatever 'func' returns.
+        """
+
+        with self.phase(phase):
+            return func(*args, **kwargs)
+
+    def addTransfer(self, bytesSent: int = 0, bytesReceived: int = 0, timeToFirstByte: Optional[float] = None) -> None:
+        """ Adds the bytes sent and received by a single command executed on a channel. """
+
+        with self._LOCK:
+            self.commands += 1
+            self.bytesSent += bytesSent
+            self.bytesReceived += bytesReceived
+            if timeToFirstByte is not None:
+                self.timeToFirstByte = timeToFirstByte
+                self.phases['timeToFirstByte'] = self.phases.get('timeToFirstByte', 0.0) + timeToFirstByte
+
+    def reset(self) -> None:
+        with self._LOCK:
+            self.phases = {}
+            self.bytesSent = 0
+            self.bytesReceived = 0
+            self.commands = 0
+            self.timeToFirstByte = None
+            self.failure = None
+
+    def toDict(self) -> dict:
+        with self._LOCK:
+            return {'commandKey': self.commandKey, 'moduleName': self.moduleName, 'environmentID': self.environmentID,
+                    'phases': dict(self.phases), 'bytesSent': self.bytesSent, 'bytesReceived': self.bytesReceived,
+                    'commands': self.commands, 'timeToFirstByte': self.timeToFirstByte, 'failure': self.failure}
+
+
+class Histogram(object):
+    """ A cumulative histogram in the same shape as a Prometheus histogram. """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def toDict(self) -> dict:
+        return {'buckets': dict(zip(self.buckets, self.counts)), 'count': self.count, 'sum': self.sum}
+
+
+class MetricsRegistry(object):
+    """ Aggregates CommandMetrics into histograms per (moduleName, commandKey) and phase. Exporters are callables that
+        are passed every CommandMetrics as it is recorded. They are called on the thread that finished the command and
+        are given the original commandKey.
+
+        Commands without a module are recorded under the commandKey 'adhoc'. Once a module has 'maxKeysPerModule'
+        commandKeys any new commandKey of that module is recorded under 'other'.
+    """
+
+    ADHOC = 'adhoc'
+    OTHER = 'other'
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, maxKeysPerModule: int = 32):
+        """
+        - :param buckets: (tuple) default DEFAULT_BUCKETS. The upper bounds of the histogram buckets in seconds.
+        - :param maxKeysPerModule: (int) default 32. The most commandKeys kept per module. 0 does not limit them.
+        """
+
+        self.buckets = buckets
+        self.maxKeysPerModule = maxKeysPerModule
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._counters: Dict[Tuple, Dict[str, int]] = {}
+        self._moduleKeys: Dict[AnyStr, set] = {}
+        self._exporters = []
+        self._LOCK = RLock()
+
+    def record(self, metrics: CommandMetrics) -> None:
+        """ Adds the metrics of a finished command to the histograms and passes them to each exporter.
+
+        - :param metrics: (CommandMetrics)
+        """
+
+        data = metrics.toDict()
+        with self._LOCK:
+            key = self._seriesKey(data['moduleName'] or '', data['commandKey'] or '')
+            for phase, seconds in data['phases'].items():
+                histogram = self._histograms.get(key + (phase,))
+                if histogram is None:
+                    histogram = self._histograms[key + (phase,)] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            counters = self._counters.setdefault(key, {'commands': 0, 'failures': 0, 'bytesSent': 0,
+                                                       'bytesReceived': 0})
+            counters['commands'] += 1
+            counters['failures'] += 1 if data['failure'] else 0
+            counters['bytesSent'] += data['bytesSent']
+            counters['bytesReceived'] += data['bytesReceived']
+            exporters = list(self._exporters)
+        for exporter in exporters:
+            try:
+                exporter(metrics)
+            except Exception as e:
+                log.error(f'ERROR: for metrics exporter {exporter}: {e}')
+                log.debug(f'[DEBUG] for method record: {traceback.format_exc()}')
+
+    def _seriesKey(self, moduleName: AnyStr, commandKey: AnyStr) -> Tuple[AnyStr, AnyStr]:
+        """ Returns the (moduleName, commandKey) the metrics are aggregated under. This must be called while holding
+            '_LOCK'.
+        """
+
+        if not moduleName:
+            return moduleName, self.ADHOC
+        keys = self._moduleKeys.setdefault(moduleName, set())
+        if commandKey not in keys:
+            if self.maxKeysPerModule and len(keys) >= self.maxKeysPerModule:
+                return moduleName, self.OTHER
+            keys.add(commandKey)
+        return moduleName, commandKey
+
+    def addExporter(self, exporter: Callable[[CommandMetrics], Any]) -> None:
+        with self._LOCK:
+            if exporter not in self._exporters:
+                self._exporters.append(exporter)
+
+    def removeExporter(self, exporter: Callable[[CommandMetrics], Any]) -> None:
+        with self._LOCK:
+            if exporter in self._exporters:
+                self._exporters.remove(exporter)
+
+    def reset(self) -> None:
+        with self._LOCK:
+            self._histograms.clear()
+            self._counters.clear()
+            self._moduleKeys.clear()
+
+    def snapshot(self) -> dict:
+        """ Returns the histograms and counters as a dictionary keyed by (moduleName, commandKey).
+
+        - :return: (dict) {(moduleName, commandKey): {'phases': {phase: histogram dict}, **counters}}
+        """
+
+        output = {}
+        with self._LOCK:
+            for (moduleName, commandKey, phase), histogram in self._histograms.items():
+                output.setdefault((moduleName, commandKey), {'phases': {}})['phases'][phase] = histogram.toDict()
+            for key, counters in self._counters.items():
+                output.setdefault(key, {'phases': {}}).update(counters)
+        return output
+
+    def toPrometheus(self) -> str:
+        """ Returns every histogram and counter in the Prometheus text exposition format.
+
+        - :return: (str)
+        """
+
+        def _labels(moduleName, commandKey, **extra):
+            items = {'module': moduleName, 'commandKey': commandKey, **extra}
+            return ','.join(f'{name}="{_escape(value)}"' for name, value in items.items())
+
+        def _escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        lines = ['# HELP ldtk_command_phase_seconds Time spent in each phase of a CommandContainer.',
+                 '# TYPE ldtk_command_phase_seconds histogram']
+        with self._LOCK:
+            for (moduleName, commandKey, phase), histogram in sorted(self._histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'ldtk_command_phase_seconds_bucket'
+                                 f'{{{_labels(moduleName, commandKey, phase=phase, le=bound)}}} {count}')
+                lines.append(f'ldtk_command_phase_seconds_bucket'
+                             f'{{{_labels(moduleName, commandKey, phase=phase, le="+Inf")}}} {histogram.count}')
+                lines.append(f'ldtk_command_phase_seconds_sum'
+                             f'{{{_labels(moduleName, commandKey, phase=phase)}}} {histogram.sum}')
+                lines.append(f'ldtk_command_phase_seconds_count'
+                             f'{{{_labels(moduleName, commandKey, phase=phase)}}} {histogram.count}')
+            for name, counterKey, helpText in (('commands', 'commands', 'CommandContainers executed.'),
+                                               ('failures', 'failures', 'CommandContainers that failed.'),
+                                               ('bytes_sent', 'bytesSent', 'Bytes sent to the channel.'),
+                                               ('bytes_received', 'bytesReceived', 'Bytes read from the channel.')):
+                lines.append(f'# HELP ldtk_command_{name}_total {helpText}')
+                lines.append(f'# TYPE ldtk_command_{name}_total counter')
+                for (moduleName, commandKey), counters in sorted(self._counters.items()):
+                    lines.append(f'ldtk_command_{name}_total{{{_labels(moduleName, commandKey)}}} '
+                                 f'{counters[counterKey]}')
+        return '\n'.join(lines) + '\n'
+
+    def writePrometheus(self, path: AnyStr) -> None:
+        """ Writes 'toPrometheus' to a file with 'atomicWrite' so a scraper never reads a partial file.
+
+        - :param path: (str)
+        """
+
+        atomicWrite(path, self.toPrometheus(), prefix='.ldtk_metrics')
+
+
+metrics = MetricsRegistry()
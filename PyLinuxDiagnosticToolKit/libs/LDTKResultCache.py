@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: A bounded cache of the CommandContainers that CommandModules bind to themselves by commandKey. Each
+# ToolKitInterface has its own ResultCache. Entries expire after the TTL of their module and the least recently used
+# entries are unbound from their module once the cache is full. Any object with the same 'isExpired', 'put',
+# 'invalidate' and 'clear' methods can be set as 'ToolKitInterface.resultCache' instead.
+
+
+import time
+import logging
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, AnyStr, Dict, Optional
+
+
+log = logging.getLogger('LDTKResultCache')
+
+
+class _CacheEntry(object):
+
+    __slots__ = ('module', 'commandKey', 'container', 'created', 'ttl')
+
+    def __init__(self, module: Any, commandKey: AnyStr, container: Any, ttl: Optional[float]):
+        self.module = module
+        self.commandKey = commandKey
+        self.container = container
+        self.created = time.time()
+        self.ttl = ttl
+
+    @property
+    def isExpired(self) -> bool:
+        return bool(self.ttl) and time.time() - self.created > self.ttl
+
+
+class ResultCache(object):
+    """ Tracks every CommandContainer bound to a CommandModule by 'GenericCmdModule.cmdObjBinder'.
+
+        The TTL of a module is looked up in this order: 'moduleTTLs' by the module '__NAME__', the 'cacheTTL'
+        attribute of the module and then 'defaultTTL'. A TTL of None or 0 never expires. A CommandContainer that is
+        still running is never expired or evicted.
+    """
+
+    def __init__(self, maxEntries: int = 1024, defaultTTL: Optional[float] = None,
+                 moduleTTLs: Optional[Dict[AnyStr, float]] = None):
+        """
+        - :param maxEntries: (int) default 1024. The most CommandContainers kept. 0 does not limit the size.
+        - :param defaultTTL: (float) default None. Seconds a result is reused for by modules without a TTL.
+        - :param moduleTTLs: (dict) default None. {module name: seconds}
+        """
+
+        self.maxEntries = maxEntries
+        self.defaultTTL = defaultTTL
+        self.moduleTTLs = dict(moduleTTLs or {})
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._LOCK = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def setModuleTTL(self, moduleName: AnyStr, ttl: Optional[float]) -> None:
+        with self._LOCK:
+            if ttl is None:
+                self.moduleTTLs.pop(moduleName, None)
+            else:
+                self.moduleTTLs[moduleName] = ttl
+
+    def ttlFor(self, module: Any) -> Optional[float]:
+        name = getattr(module, '__NAME__', None) or type(module).__name__
+        if name in self.moduleTTLs:
+            return self.moduleTTLs[name]
+        ttl = getattr(module, 'cacheTTL', None)
+        return self.defaultTTL if ttl is None else ttl
+
+    def isExpired(self, module: Any, commandKey: AnyStr) -> bool:
+        """ Checks if the CommandContainer bound to the module under this commandKey should be ran again. It is
+            marked as recently used if it is not expired. A binding this cache does not know about is never expired.
+
+        - :param module: The CommandModule the CommandContainer is bound to.
+        - :param commandKey: (str)
+        - :return: (bool)
+        """
+
+        key = (id(module), commandKey)
+        with self._LOCK:
+            entry = self._entries.get(key)
+            if entry is None or entry.module is not module:
+                return False
+            if entry.isExpired and getattr(entry.container, 'complete', False):
+                self.misses += 1
+                return True
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return False
+
+    def put(self, module: Any, commandKey: AnyStr, container: Any) -> None:
+        """ Records a CommandContainer that was just bound to the module and evicts the least recently used entries
+            if the cache is full.
+        """
+
+        key = (id(module), commandKey)
+        with self._LOCK:
+            self._entries.pop(key, None)
+            self._entries[key] = _CacheEntry(module, commandKey, container, self.ttlFor(module))
+            if self.maxEntries:
+                self._evict()
+
+    def invalidate(self, module: Any = None, commandKey: Optional[AnyStr] = None) -> int:
+        """ Removes entries and unbinds their CommandContainers from the modules. With no parameters everything is
+            removed. With only a module every entry of that module is removed.
+
+        - :param module: default None. A CommandModule or the '__NAME__' of one.
+        - :param commandKey: (str) default None.
+        - :return: (int) The amount of entries removed.
+        """
+
+        with self._LOCK:
+            keys = [key for key, entry in self._entries.items()
+                    if (module is None or entry.module is module or
+                        getattr(entry.module, '__NAME__', None) == module) and
+                    (commandKey is None or entry.commandKey == commandKey)]
+            for key in keys:
+                self._unbind(self._entries.pop(key))
+        return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def _evict(self) -> None:
+        """ Evicts the least recently used entries that have finished until the cache is under 'maxEntries'. This must
+            be called while holding '_LOCK'.
+        """
+
+        for key in list(self._entries):
+            if len(self._entries) <= self.maxEntries:
+                return
+            entry = self._entries[key]
+            if not getattr(entry.container, 'complete', False):
+                continue
+            self._unbind(self._entries.pop(key))
+            self.evictions += 1
+
+    @staticmethod
+    def _unbind(entry: _CacheEntry) -> None:
+        if getattr(entry.module, entry.commandKey, None) is entry.container:
+            try:
+                delattr(entry.module, entry.commandKey)
+            except AttributeError:
+                pass
@@ -9,10 +9,12 @@
 # on a Linux box via SSH. This is necessary to progress to user management and threading.
 
 
+import codecs
 import logging
 import socket
 import re
 import time
+import selectors
 import warnings
 import traceback
 from time import sleep
@@ -22,7 +24,7 @@ from sshConnector.sshLibs.sshChannelEnvironment import EnvironmentControls
 from io import StringIO
 from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import ClosedBufferException, RecvReady, BetweenBitException, \
     TimeToFirstBitException, SSHExceptionConn
-from typing import Any, AnyStr, Optional, Union, Tuple, Type
+from typing import Any, AnyStr, Optional, Union, Tuple, Type, Generator
 
 
 log = logging.getLogger('sshBufferControl')
@@ -51,7 +53,8 @@ class sshBufferControl(sshCon):
             attempt to match the end of the line. Unsafe ignores the prompt and simply executes the command and only
             waits a short time before leaving not caring if it got output of the command. This is unsafe as it can leave
             a buffer open ready to dump more output. This method also takes the output from the command and attempts to
-            decode it to utf-8 while removing all null and escape characters.
+            decode it to utf-8 while removing all null and escape characters. The decoding is done incrementally by the
+            sshOutputDecoder as the output comes off the buffer.
 
         - :param channel: (Paramiko Channel/sshEnvironment) -
         - :param cmd: (str) -
@@ -62,21 +65,14 @@ class sshBufferControl(sshCon):
         """
 
         def _parseOutput(tmpOut, tmpPrompt):
-            try:
-                # print(f'=== parseOutput in executeOnEnvironment\n{tmpOut}\n')
-                tmpOut = sshBufferControl._decodeStringEscape(tmpOut)
-            except (UnicodeDecodeError, UnicodeEncodeError) as e:
-                log.error(f'ERROR: for method _parseOutput: {e}')
-                log.debug(f"[DEBUG] for _parseOutput: {traceback.format_exc()}")
-                try:
-                    tmpOut = sshBufferControl._decodeStringEscape(tmpOut, encoding='latin1')
-                except (UnicodeDecodeError, UnicodeEncodeError) as e:
-                    if 'CMDSTART' in tmpOut and 'CMDEND' in tmpOut:
-                        log.debug('Another parse failure within _parseOutput method. However, ignoring sense string'
-                                  'contains CMDSTART and CMDEND this may be parsed successfully by CC')
-                    else:
-                        raise e
-            tmpOut = sshBufferControl.escapeChars.sub('', tmpOut).strip()
+            # The output was already decoded and stripped of escape characters by the sshOutputDecoder as it came off
+            # the buffer. Only the 8-bit CSI character can still be in it.
+            if '\x9b' in tmpOut:
+                tmpOut = sshBufferControl.escapeChars.sub('', tmpOut)
+            tmpOut = tmpOut.strip()
+            if tmpPrompt and tmpPrompt == getattr(environment, 'promptToken', None):
+                # The echo is off so there is only the prompt at the very end to remove.
+                return tmpOut[:-len(tmpPrompt)].strip() if tmpOut.endswith(tmpPrompt) else tmpOut
             return tmpOut.replace(tmpPrompt, '').replace(cmd, '').strip()
 
         if not super(sshBufferControl, self).checkConnection(sshChannel=environment):
@@ -117,6 +113,150 @@ class sshBufferControl(sshCon):
             # print(f"The output of the cmd: {cmd} is: \n===\n{output}\n===")
             return output
 
+    def executeOnExecChannel(self, channel: Channel, cmd: AnyStr, binary: bool = False, **kwargs) \
+            -> Tuple[Union[AnyStr, bytes], AnyStr, Optional[int]]:
+        """ Runs a single command with 'exec_command' on a channel that has no PTY or shell. There is no echo, prompt or
+            escape characters to remove and stdout and stderr are kept apart. The channel is not closed here.
+
+        - :param channel: (Channel) From 'openExecChannel'.
+        - :param cmd: (str)
+        - :param binary: (bool) default False. Return stdout as bytes instead of decoding it.
+        - :param kwargs: 'runTimeout', 'delay', 'fallbackEncoding' and 'metrics'.
+        - :return: (tuple) stdout, stderr and the exit status. The exit status is None if the command did not finish
+            within 'runTimeout'.
+        """
+
+        runTimeout, firstBitTimeout, betweenBitTimeout, delay = self._parseTimeouts(**kwargs)
+        stdout, stderr = bytearray(), bytearray()
+        exitStatus, firstByteTime = None, None
+        sendStart = sendEnd = time.time()
+
+        log.debug(f"Attempting to exec command on an exec channel: {cmd}")
+        try:
+            channel.exec_command(cmd)
+            channel.shutdown_write()
+            sendEnd = time.time()
+            endTime = sendEnd + runTimeout
+            with selectors.DefaultSelector() as selector:
+                selector.register(channel.fileno(), selectors.EVENT_READ)
+                while True:
+                    if channel.recv_ready():
+                        stdout += channel.recv(65536)
+                    elif channel.recv_stderr_ready():
+                        stderr += channel.recv_stderr(65536)
+                    elif channel.exit_status_ready() or channel.closed:
+                        exitStatus = channel.recv_exit_status()
+                        break
+                    elif time.time() >= endTime:
+                        log.error(f"The timeout of {runTimeout} was reached while waiting for: {cmd}")
+                        break
+                    else:
+                        # stderr and the exit status do not wake up the selector so they are checked every 'delay'
+                        selector.select(min(delay, max(0.0, endTime - time.time())))
+                        continue
+                    if firstByteTime is None and (stdout or stderr):
+                        firstByteTime = time.time()
+            while channel.recv_ready():
+                stdout += channel.recv(65536)
+            while channel.recv_stderr_ready():
+                stderr += channel.recv_stderr(65536)
+        except socket.timeout:
+            log.error("Timeout exception found.")
+        except socket.error as e:
+            log.debug(f'An error occurred: {e}')
+            channel.get_transport().close()
+            raise SSHExceptionConn(f"Connection Error: {e}") from e
+        finally:
+            metrics = kwargs.get('metrics')
+            if metrics is not None:
+                metrics.addPhase('send', sendEnd - sendStart)
+                metrics.addTransfer(bytesSent=len(cmd), bytesReceived=len(stdout) + len(stderr),
+                                    timeToFirstByte=firstByteTime - sendEnd if firstByteTime else None)
+
+        decoder = self._outputDecoder(stripEscapes=False, **kwargs)
+        errors = self._outputDecoder(stripEscapes=False, **kwargs).decode(bytes(stderr), final=True).strip()
+        if binary:
+            return bytes(stdout), errors, exitStatus
+        return decoder.decode(bytes(stdout), final=True).strip(), errors, exitStatus
+
+    def streamOnEnvironment(self, environment: EnvironmentControls, cmd: AnyStr,
+                            prompt: Optional[Union[AnyStr, Tuple]] = None, reCapturePrompt: bool = False,
+                            chunks: bool = False, **kwargs) -> Generator[AnyStr, None, None]:
+        """ The streaming version of executeOnEnvironment. Instead of collecting all the output before returning this
+            yields the output of the command as it comes off the channel. By default each complete line is yielded
+            individually. If 'chunks' is True then all the complete lines from each read of the buffer are yielded
+            together as a single string. The echo of the command and the prompt are removed.
+            The channel is only read when the next item is requested. If the caller stops consuming, the Paramiko
+            window fills up and the remote command blocks on write. This keeps memory bounded for large outputs.
+            If the generator is closed before the command finishes the command is interrupted with Ctrl-C. If the
+            prompt does not come back after that, the environment is closed.
+
+        - :param environment: (EnvironmentControls)
+        - :param cmd: (str)
+        - :param prompt: (tuple or str) default None. If None the prompt of the environment is used.
+        - :param reCapturePrompt: (bool) default False
+        - :param chunks: (bool) default False. Yield a block of lines per buffer read instead of one line at a time.
+        - :param kwargs: Timeouts, 'readerMode' and 'fallbackEncoding'. Review '_parseTimeouts'.
+        - :return: (Generator) of strings
+        """
+
+        def _cleanLine(line):
+            return sshBufferControl.escapeChars.sub('', line).rstrip()
+
+        if not super(sshBufferControl, self).checkConnection(sshChannel=environment):
+            log.error("There is not a valid connection.")
+            return
+
+        log.debug(f"Attempting to stream command: {cmd}")
+
+        if isinstance(prompt, str):
+            prompt = sshBufferControl._decodeStringEscape(prompt)
+        if prompt is None:
+            prompt = environment.getPrompt(reCapturePrompt=reCapturePrompt)
+        if not prompt:
+            prompt = 'CMDEND' if 'echo CMDEND' in cmd else sshBufferControl.promptTextTuple
+        runTimeout, firstBitTimeout, betweenBitTimeout, delay = self._parseTimeouts(**kwargs)
+        readerMode = kwargs.get('readerMode', self.readerMode)
+        matcher = sshEndTextMatcher(*sshBufferControl._endTextParser(prompt), cmd=cmd)
+        decoder = self._outputDecoder(**kwargs)
+        # Without an echo the first line is already output
+        partial, echoed = '', bool(prompt) and prompt == getattr(environment, 'promptToken', None)
+
+        try:
+            if not self._bufferSendCommand(environment, cmd):
+                return
+            for data in sshBufferControl._bufferStream(environment, matcher, runTimeout, firstBitTimeout,
+                                                       betweenBitTimeout, delay, readerMode, decoder=decoder):
+                lines = (partial + data).splitlines(True)
+                partial = lines.pop() if lines and lines[-1][-1:] not in ('\n', '\r') else ''
+                output = []
+                for line in (_cleanLine(line) for line in lines):
+                    if not echoed and line.strip():
+                        echoed = True
+                        if line.strip() in cmd or cmd in line:
+                            continue
+                    output.append(line)
+                if chunks and output:
+                    yield '\n'.join(output)
+                elif not chunks:
+                    yield from output
+            if partial and matcher.keepReading:
+                yield _cleanLine(partial)
+        except RecvReady:
+            log.error(f"The timeout of {runTimeout} was reached while streaming from the buffer.")
+            log.debug(f"[DEBUG] for streamOnEnvironment: {traceback.format_exc()}")
+            environment.close()
+        except GeneratorExit:
+            if matcher.keepReading and not environment.isClosed:
+                log.debug(f"Stream closed before the command completed. Interrupting: {cmd}")
+                if not sshBufferControl._bufferInterrupt(environment, prompt, betweenBitTimeout, delay, readerMode):
+                    environment.close()
+            raise
+        except socket.error as e:
+            log.debug(f'An error occurred: {e}')
+            environment.get_transport().close()
+            raise SSHExceptionConn(f"Connection Error: {e}") from e
+
     def _bufferControl(self, channel: EnvironmentControls, cmd: AnyStr, out: StringIO,
                        prompt: Optional[Union[AnyStr, Tuple]] = False, unsafe: bool = False, **kwargs) -> None:
         """
@@ -124,25 +264,15 @@ class sshBufferControl(sshCon):
             It is recommended that this method not be touched.
         """
         runTimeout, firstBitTimeout, betweenBitTimeout, delay = self._parseTimeouts(**kwargs)
+        readerMode = kwargs.get('readerMode', self.readerMode)
+        decoder = self._outputDecoder(**kwargs)
+        sendStart = sendEnd = time.time()
 
         try:
 
-            while channel.recv_ready():
-                log.debug('There is old data left in the Channel Buffer. Clearing...')
-                channel.recv(65536)
-                sleep(.1)
-
-            # log.debug(f'Waiting to send for channel: [{cmd}] : [{str(channel)[18:20]}]  Closed: {channel.closed}')
-            while channel.send_ready() is not True:
-                # log.debug(f"Channel rec: {channel.recv(65536)}")
-                if channel.isClosed:
-                    log.debug(f'Channel closed while waiting to send command: [{cmd}] : [{str(channel)[18:20]}]')
-                    return
-                sleep(.1)
-
-            # log.debug(f'Send buffer ready to receive... '
-            #           f'For channel: [{cmd}] : [{str(channel)[18:20]}]  Closed: {channel.isClosed}')
-            self._bufferSendWait(data=f'{cmd}', channel=channel)
+            if not self._bufferSendCommand(channel, cmd):
+                return
+            sendEnd = time.time()
 
             # loop through and record all data in recv buffer
             # log.debug(f'Receive buffer ready...  Fetching output data from receive buffer for '
@@ -151,17 +281,18 @@ class sshBufferControl(sshCon):
                 log.debug(f"Executing on {channel._id} cmd: {cmd} with prompt: {prompt}")
                 self._bufferGenerator(channel=channel, out=out, runTimeout=runTimeout,
                                       firstBitTimeout=firstBitTimeout, betweenBitTimeout=betweenBitTimeout,
-                                      delay=delay, endText=prompt, cmd=cmd)
+                                      delay=delay, endText=prompt, cmd=cmd, readerMode=readerMode, decoder=decoder)
             elif unsafe:
                 log.debug(f"Executing on {channel._id} cmd: {cmd} with unsafe mode")
                 # log.debug(f'Fetching data in unsafe mode for channel: '
                 #           f'[{cmd}] : [{str(channel)[18:20]}]  Closed: {channel.closed}')
-                sshBufferControl._bufferTimeToFirstBit(channel, time.time() + 1, delay)
+                sshBufferControl._bufferTimeToFirstBit(channel, time.time() + 1, delay, readerMode)
                 while channel.recv_ready() is True:
                     if channel.isClosed:
                         return
-                    out.write(channel.recv(65536).decode('utf-8'))
+                    out.write(decoder.decode(channel.recv(65536)))
                     sleep(.1)
+                out.write(decoder.decode(b'', final=True))
             else:
                 if 'echo CMDEND' in cmd:
                     endText = 'CMDEND'
@@ -171,7 +302,8 @@ class sshBufferControl(sshCon):
                 try:
                     self._bufferGenerator(channel=channel, out=out, runTimeout=runTimeout,
                                           firstBitTimeout=firstBitTimeout, betweenBitTimeout=betweenBitTimeout,
-                                          delay=delay, endText=endText, cmd=cmd)
+                                          delay=delay, endText=endText, cmd=cmd, readerMode=readerMode,
+                                          decoder=decoder)
 
                 except BetweenBitException:
                     log.debug("noprompt execution has returned a timeout failure for BetweenBit. Ignoring")
@@ -183,6 +315,51 @@ class sshBufferControl(sshCon):
             log.debug(f'An error occurred: {e}')
             channel.get_transport().close()
             raise SSHExceptionConn(f"Connection Error: {e}") from e
+        finally:
+            sshBufferControl._recordTransfer(channel, cmd, decoder, sendStart, sendEnd, kwargs.get('metrics'))
+
+    @staticmethod
+    def _recordTransfer(channel: EnvironmentControls, cmd: AnyStr, decoder: 'sshOutputDecoder', sendStart: float,
+                        sendEnd: float, metrics: Optional[Any] = None) -> None:
+        """ Adds the send time, time to first byte and byte counts of a single command to the metrics of the
+            environment and to the metrics of the CommandContainer if it passed them in as the 'metrics' kwarg.
+        """
+
+        timeToFirstByte = decoder.firstByteTime - sendEnd if decoder.firstByteTime else None
+        for item in (getattr(channel, 'metrics', None), metrics):
+            if item is None:
+                continue
+            item.addPhase('send', sendEnd - sendStart)
+            item.addTransfer(bytesSent=len(cmd) + 1, bytesReceived=decoder.bytesReceived,
+                             timeToFirstByte=timeToFirstByte)
+
+    @staticmethod
+    def _bufferSendCommand(channel: EnvironmentControls, cmd: AnyStr) -> bool:
+        """ Clears any old data left in the channel buffer, waits for the channel to be ready to send and then sends the
+            command.
+
+        - :param channel: (EnvironmentControls)
+        - :param cmd: (str)
+        - :return: (bool) False if the channel closed before the command could be sent.
+        """
+
+        while channel.recv_ready():
+            log.debug('There is old data left in the Channel Buffer. Clearing...')
+            channel.recv(65536)
+            sleep(.1)
+
+        # log.debug(f'Waiting to send for channel: [{cmd}] : [{str(channel)[18:20]}]  Closed: {channel.closed}')
+        while channel.send_ready() is not True:
+            # log.debug(f"Channel rec: {channel.recv(65536)}")
+            if channel.isClosed:
+                log.debug(f'Channel closed while waiting to send command: [{cmd}] : [{str(channel)[18:20]}]')
+                return False
+            sleep(.1)
+
+        # log.debug(f'Send buffer ready to receive... '
+        #           f'For channel: [{cmd}] : [{str(channel)[18:20]}]  Closed: {channel.isClosed}')
+        sshBufferControl._bufferSendWait(data=f'{cmd}', channel=channel)
+        return True
 
     def _capturePrompt(self, channel: Channel, out: StringIO) -> Union[bool, AnyStr]:
         """
@@ -215,7 +392,8 @@ class sshBufferControl(sshCon):
                                     betweenBitTimeout=kwargs.get("betweenBitTimeout", self.betweenBitTimeout),
                                     delay=kwargs.get("delay", self.delay),
                                     endText=('assword', 'assword:') + sshBufferControl.promptTextTuple,
-                                    cmd=cmd)
+                                    cmd=cmd, readerMode=kwargs.get('readerMode', self.readerMode),
+                                    decoder=self._outputDecoder(**kwargs))
         except BetweenBitException:
             log.debug("_passwdWait execution has returned a timeout failure for BetweenBit. Ignoring")
         except TimeToFirstBitException:
@@ -239,7 +417,8 @@ class sshBufferControl(sshCon):
                                     betweenBitTimeout=kwargs.get("betweenBitTimeout", self.betweenBitTimeout),
                                     delay=kwargs.get("delay", self.delay),
                                     endText=kwargs.get('endText', sshBufferControl.promptTextTuple), cmd=cmd,
-                                    exitOnAnything=True)
+                                    exitOnAnything=True, readerMode=kwargs.get('readerMode', self.readerMode),
+                                    decoder=self._outputDecoder(**kwargs))
         except BetweenBitException:
             log.debug("_promptWait execution has returned a timeout failure for BetweenBit. Ignoring")
         except TimeToFirstBitException:
@@ -267,6 +446,17 @@ class sshBufferControl(sshCon):
         #           f'betweenBitTimeout: {betweenBitTimeout}, delay: {delay}')
         return runTimeout, firstBitTimeout, betweenBitTimeout, delay
 
+    def _outputDecoder(self, stripEscapes: bool = True, **kwargs) -> 'sshOutputDecoder':
+        """ Creates a new sshOutputDecoder for a single command using the 'fallbackEncoding' argument.
+
+        - :param stripEscapes: (bool) default True. Passed to the sshOutputDecoder.
+        - :param kwargs: 'fallbackEncoding' overrides the argument of the same name.
+        - :return: (sshOutputDecoder)
+        """
+
+        return sshOutputDecoder(fallbackEncoding=kwargs.get('fallbackEncoding', self.fallbackEncoding),
+                                stripEscapes=stripEscapes)
+
     @staticmethod
     def _decodeStringEscape(s: AnyStr, encoding: AnyStr = 'utf-8') -> AnyStr:
         # print(f'String:\n======\n{s}\n=======\n\n\nString type: {type(s)}\n')
@@ -290,16 +480,41 @@ class sshBufferControl(sshCon):
         return sshBufferControl.escapeChars.sub('', sshBufferControl._decodeStringEscape(s.strip(), encoding)).strip()
 
     @staticmethod
-    def _bufferTimeToFirstBit(channel: Channel, fbEnd: float, delay: float) -> True:
+    def _bufferSelectWait(channel: Channel, endTime: float) -> bool:
+        """ Blocks on the file descriptor of the Paramiko Channel until data arrives, the channel closes or the endTime
+            passes. Paramiko sets the channel's event pipe both when data is fed into the buffer and when the channel
+            closes so this wakes up exactly when there is something to do instead of sleeping for 'delay' in a loop.
+
+        - :param channel: (Channel)
+        - :param endTime: (float) The epoch time at which to stop waiting.
+        - :return: (bool) True if data is ready or the channel closed, False if the endTime passed.
+        """
+
+        if channel.recv_ready() or channel.closed:
+            return True
+        with selectors.DefaultSelector() as selector:
+            selector.register(channel.fileno(), selectors.EVENT_READ)
+            while not channel.recv_ready() and not channel.closed:
+                remaining = endTime - time.time()
+                if remaining <= 0:
+                    return False
+                selector.select(remaining)
+        return True
+
+    @staticmethod
+    def _bufferTimeToFirstBit(channel: Channel, fbEnd: float, delay: float, readerMode: str = 'poll') -> True:
         """ This is a helper tool used by _bufferGenerator and _bufferWait to use the time to first bit timeout value.
             Please review those method's doc strings for more information.
 
         - :param channel:
         - :param fbEnd:
         - :param delay:
+        - :param readerMode: (str) 'poll' sleeps for 'delay' between checks, 'select' blocks on the channel fileno.
         - :return:
         """
 
+        if readerMode == 'select':
+            sshBufferControl._bufferSelectWait(channel, fbEnd)
         while time.time() <= fbEnd:
             if channel.recv_ready() is True:
                 return True
@@ -309,20 +524,26 @@ class sshBufferControl(sshCon):
         raise TimeToFirstBitException("Time to First Bit exceeded timeout: %s" % str(fbEnd))
 
     @staticmethod
-    def _bufferBetweenBitWait(channel: Channel, bbEnd: float, delay: float) -> Any:
+    def _bufferBetweenBitWait(channel: Channel, bbEnd: float, delay: float, readerMode: str = 'poll',
+                              decoder: Optional['sshOutputDecoder'] = None) -> Any:
         """ This is a helper tool used by _bufferGenerator and _bufferWait to use the betweenBitTimeout value.
             Please review those method's doc strings for more information.
 
         :param channel: (Channel)
         :param bbEnd: (float)
         :param delay: (float)
+        :param readerMode: (str) 'poll' sleeps for 'delay' between checks, 'select' blocks on the channel fileno.
+        :param decoder: (sshOutputDecoder) The decoder shared by every read of the same command. This is what keeps
+            multibyte characters that are split between reads intact. If None a new decoder is used for this read.
         :return:
         """
 
+        if readerMode == 'select':
+            sshBufferControl._bufferSelectWait(channel, bbEnd)
         while time.time() <= bbEnd:
             try:
                 if channel.recv_ready() is True:
-                    return channel.recv(65536).decode('utf-8')
+                    return (decoder or sshOutputDecoder()).decode(channel.recv(65536))
             except socket.timeout as e:
                 if channel.closed:
                     raise ClosedBufferException("Channel closed while attempting to read from it!") from e
@@ -362,8 +583,8 @@ class sshBufferControl(sshCon):
     @staticmethod
     def _endTextAnalyzer(outValue: AnyStr, endText: Union[Tuple, AnyStr],
                          endTextType: Type, cmd: Optional[AnyStr] = None) -> bool:
-        """ This is a helper tool used by _bufferGenerator and _bufferWait to help deal with the 'endText' value.
-            Please review those method's doc strings for more information.
+        """ This is a helper tool to check a complete output for the 'endText' value. _bufferGenerator and _bufferWait
+            use the streaming sshEndTextMatcher directly. Please review those method's doc strings for more information.
 
         - :param outValue:
         - :param endText:
@@ -372,36 +593,13 @@ class sshBufferControl(sshCon):
         - :return:
         """
 
-        # print(f"\n==== _endTextAnalyzer\ncmd: {cmd}\noutValue: \n{outValue}\n\n"
-        #       f"endText: {repr(endText)}\nendTextType: {endTextType}\n====\n")
-        if not outValue:
-            return True
-        if not endText:
-            return True
-        if cmd and cmd in outValue.splitlines()[-1]:
-            return True
-        if endTextType is tuple:
-            line = sshBufferControl.escapeChars.sub('', outValue.splitlines()[-1]).strip()
-            for item in endText:
-                if len(item) == 1 and line.endswith(item):
-                    return False
-                elif len(item) > 1 and item in line:
-                    return False
-            return True
-        if endTextType is str:
-            if endText == 'CMDEND':
-                for line in (sshBufferControl._processString(line.strip())
-                             for line in outValue.splitlines() if cmd not in line and endText in line):
-                    if line == endText:
-                        return False
-            # print(f"\n=== Compare: {repr(endText)} - {repr(outValue.splitlines()[-1])}")
-            return endText not in outValue.splitlines()[-1]
-        return True
+        return sshEndTextMatcher(endTextType, endText, cmd=cmd).feed(outValue)
 
     @staticmethod
     def _bufferGenerator(channel: Channel, out: StringIO, runTimeout: int, firstBitTimeout: int, betweenBitTimeout: int,
                          delay: float, endText: Union[Tuple, AnyStr] = "", closeOnFailure: bool = False,
-                         cmd: Optional[AnyStr] = None) -> None:
+                         cmd: Optional[AnyStr] = None, readerMode: str = 'poll',
+                         decoder: Optional['sshOutputDecoder'] = None) -> None:
         """ This is a tool designed to yield data from a Paramiko Channel buffer with several timeout controls
 
         - :param channel: The Paramiko Channel
@@ -416,23 +614,28 @@ class sshBufferControl(sshCon):
         - :param endText: (string/tuple) A string or tuple of strings that the method will look for in the strings that come
             from the buffer. If found then the method will assume the end of the buffer. This can be the prompt or 'CMDEND'
             or an example of the tuple is: ('$', '>', '#', '@', ']', '~')
+        - :param readerMode: (str) Either 'poll' or 'select'. Review '_bufferSelectWait' for more information.
+        - :param decoder: (sshOutputDecoder) default None. Decodes the bytes from the buffer. A new one is made if None.
         - :return:
         """
 
         # print(f"\n==== BufferGenerator\nRun Timeout: {runTimeout}\nFirst Bit Timeout: {firstBitTimeout}\n"
         #       f"Between Bit Timeout: {betweenBitTimeout}\nDelay: {delay}\n")
         # print(f"\n==== The endText is: {endText}\n")
-        outValue = ""
-        endTextType, endText = sshBufferControl._endTextParser(endText)
+        matcher = sshEndTextMatcher(*sshBufferControl._endTextParser(endText), cmd=cmd)
+        decoder = decoder or sshOutputDecoder()
         endTime = time.time() + runTimeout
-        sshBufferControl._bufferTimeToFirstBit(channel, time.time() + firstBitTimeout, delay)
-        while time.time() <= endTime and not channel.closed and sshBufferControl._endTextAnalyzer(outValue, endText,
-                                                                                                  endTextType, cmd=cmd):
-            outValue = sshBufferControl._bufferBetweenBitWait(channel, time.time() + betweenBitTimeout, delay)
-            # print(f'outValue: {outValue}')
-            out.write(outValue)
-        if sshBufferControl._endTextAnalyzer(outValue, endText, endTextType,
-                                             cmd=cmd) and not channel.closed and closeOnFailure:
+        sshBufferControl._bufferTimeToFirstBit(channel, time.time() + firstBitTimeout, delay, readerMode)
+        try:
+            while time.time() <= endTime and not channel.closed and matcher.keepReading:
+                outValue = sshBufferControl._bufferBetweenBitWait(channel, time.time() + betweenBitTimeout, delay,
+                                                                  readerMode, decoder)
+                # print(f'outValue: {outValue}')
+                out.write(outValue)
+                matcher.feed(outValue)
+        finally:
+            out.write(decoder.decode(b'', final=True))
+        if matcher.keepReading and not channel.closed and closeOnFailure:
             if time.time() > endTime:
                 log.debug(f'Buffer wait expired before all data was gathered and prompt '
                           f'appeared: [{str(channel)[18:20]}]: Closed: {channel.closed}')
@@ -441,10 +644,61 @@ class sshBufferControl(sshCon):
                           f'of data: [{str(channel)[18:20]}]: Closed: {channel.closed}')
             channel.close()
 
+    @staticmethod
+    def _bufferStream(channel: Channel, matcher: 'sshEndTextMatcher', runTimeout: int, firstBitTimeout: int,
+                      betweenBitTimeout: int, delay: float, readerMode: str = 'poll',
+                      decoder: Optional['sshOutputDecoder'] = None) -> Generator[AnyStr, None, None]:
+        """ This is the generator version of _bufferGenerator. It yields each piece of data as it comes off the buffer
+            until the matcher finds the end text. Please review _bufferGenerator for the timeout parameters.
+
+        - :param channel: The Paramiko Channel
+        - :param matcher: (sshEndTextMatcher) Each piece of data is fed into the matcher.
+        - :param decoder: (sshOutputDecoder) default None. Decodes the bytes from the buffer. A new one is made if None.
+        - :return: (Generator) of strings
+        """
+
+        decoder = decoder or sshOutputDecoder()
+        endTime = time.time() + runTimeout
+        sshBufferControl._bufferTimeToFirstBit(channel, time.time() + firstBitTimeout, delay, readerMode)
+        while time.time() <= endTime and not channel.closed and matcher.keepReading:
+            outValue = sshBufferControl._bufferBetweenBitWait(channel, time.time() + betweenBitTimeout, delay,
+                                                              readerMode, decoder)
+            matcher.feed(outValue)
+            yield outValue
+        outValue = decoder.decode(b'', final=True)
+        if outValue:
+            matcher.feed(outValue)
+            yield outValue
+        if matcher.keepReading and not channel.closed:
+            raise RecvReady(f"Buffer wait expired before the end text appeared: [{str(channel)[18:20]}]")
+
+    @staticmethod
+    def _bufferInterrupt(channel: Channel, prompt: Union[Tuple, AnyStr], timeout: int, delay: float,
+                         readerMode: str = 'poll') -> bool:
+        """ Sends Ctrl-C to the channel and drains the buffer until the prompt comes back.
+
+        - :param channel: The Paramiko Channel
+        - :param prompt: (tuple or str) The end text to wait for.
+        - :param timeout: (int) How long to wait for the prompt.
+        - :param delay: (float)
+        - :param readerMode: (str)
+        - :return: (bool) True if the prompt came back.
+        """
+
+        matcher = sshEndTextMatcher(*sshBufferControl._endTextParser(prompt))
+        try:
+            channel.sendall('\x03')
+            for _ in sshBufferControl._bufferStream(channel, matcher, timeout, timeout, timeout, delay, readerMode):
+                pass
+        except Exception as e:
+            log.debug(f'Failed to drain the buffer after interrupt: {e}')
+        return not matcher.keepReading
+
     @staticmethod
     def _bufferWait(channel: Channel, out: StringIO, runTimeout: int, firstBitTimeout: int, betweenBitTimeout: int,
                     delay: float, endText: Union[Tuple, AnyStr], cmd: AnyStr = '',
-                    exitOnAnything: bool = False) -> Optional[bool]:
+                    exitOnAnything: bool = False, readerMode: str = 'poll',
+                    decoder: Optional['sshOutputDecoder'] = None) -> Optional[bool]:
         """ This is a tool designed to write to a StringIO from a Paramiko Channel buffer. It has multiple time controls
 
         - :param channel: The Paramiko Channel
@@ -464,28 +718,180 @@ class sshBufferControl(sshCon):
             returning value and thus assumes that command has been executed and doesn't attempt to pull any additional bits
             from the Paramiko Channel buffer.
         - :param exitOnAnything: (bool) OPTIONAL. If provided this will exit one any bits are received.
+        - :param readerMode: (str) Either 'poll' or 'select'. Review '_bufferSelectWait' for more information.
+        - :param decoder: (sshOutputDecoder) default None. Decodes the bytes from the buffer. A new one is made if None.
         - :return: None if 'cmd' is used, True if 'exitOnAnything' is used, False for anything else.
         """
 
         # print(f"\n==== BufferWait\nRun Timeout: {runTimeout}\nFirst Bit Timeout: {firstBitTimeout}\n"
         #       f"Between Bit Timeout: {betweenBitTimeout}\nDelay: {delay}\n")
-        outValue = out.getvalue()
         endTextType, endText = sshBufferControl._endTextParser(endText)
+        matcher = sshEndTextMatcher(endTextType, endText, cmd=cmd)
+        matcher.feed(out.getvalue())
+        decoder = decoder or sshOutputDecoder()
         endTime = time.time() + runTimeout
         if firstBitTimeout:
-            sshBufferControl._bufferTimeToFirstBit(channel, time.time() + firstBitTimeout, delay)
-        while time.time() <= endTime and not channel.closed and sshBufferControl._endTextAnalyzer(outValue, endText,
-                                                                                                  endTextType, cmd=cmd):
-            if exitOnAnything and len(outValue) > 0:
-                if len(cmd) > 0 and cmd in outValue.splitlines()[-1]:
-                    continue
-                return None
-            out.write(sshBufferControl._bufferBetweenBitWait(channel, time.time() + betweenBitTimeout, delay))
-            outValue = out.getvalue()
-        if time.time() > endTime or channel.closed or len(outValue) == 0:
+            sshBufferControl._bufferTimeToFirstBit(channel, time.time() + firstBitTimeout, delay, readerMode)
+        try:
+            while time.time() <= endTime and not channel.closed and matcher.keepReading:
+                if exitOnAnything and matcher.length > 0 and not (cmd and cmd in matcher.lastLine):
+                    return None
+                outValue = sshBufferControl._bufferBetweenBitWait(channel, time.time() + betweenBitTimeout, delay,
+                                                                  readerMode, decoder)
+                out.write(outValue)
+                matcher.feed(outValue)
+        finally:
+            outValue = decoder.decode(b'', final=True)
+            out.write(outValue)
+            matcher.feed(outValue)
+        if time.time() > endTime or channel.closed or matcher.length == 0:
             return False
         if endTextType is tuple:
-            return sshBufferControl.escapeChars.sub('', outValue.splitlines()[-1]).strip().endswith(endText)
+            return sshBufferControl.escapeChars.sub('', matcher.lastLine).strip().endswith(endText)
         if endTextType is str:
-            return endText not in outValue.splitlines()[-1]
+            return endText not in matcher.lastLine
         return None
+
+
+class sshEndTextMatcher(object):
+    """ A streaming version of the logic within sshBufferControl._endTextAnalyzer. Instead of splitting the entire
+        output into lines every time a new chunk arrives from the buffer this keeps a small tail window of the output
+        and the unfinished line. Each chunk is only looked at once which keeps the cost of finding the prompt, tuple or
+        'CMDEND' linear to the size of the output.
+    """
+
+    def __init__(self, endTextType: Type, endText: Union[Tuple, AnyStr], cmd: Optional[AnyStr] = None,
+                 window: int = 4096):
+        """ Init function for sshEndTextMatcher. The 'endTextType' and 'endText' should be the output of
+            sshBufferControl._endTextParser.
+
+        - :param endTextType: (Type) Either tuple or str.
+        - :param endText: (tuple or str) The text that signals the end of the buffer.
+        - :param cmd: (str) The command that was executed. Used to ignore the echo of the command itself.
+        - :param window: (int) The minimum amount of characters kept from the end of the output.
+        """
+
+        self.endTextType = endTextType
+        self.endText = endText
+        self.cmd = cmd
+        self.window = max(window, len(cmd or '') * 2, len(endText or '') * 2)
+        self.length = 0
+        self._tail = ''
+        self._partial = ''
+        self._found = False
+
+    def feed(self, data: AnyStr) -> bool:
+        """ Adds a new chunk of output to the matcher.
+
+        - :param data: (str) The newest chunk of data from the buffer.
+        - :return: (bool) The same as 'keepReading'. True means the end text has not been found yet.
+        """
+
+        if data:
+            self.length += len(data)
+            self._tail = (self._tail + data)[-self.window:]
+            if self.endText == 'CMDEND' and not self._found:
+                self._scanLines(data)
+        return self.keepReading
+
+    def _scanLines(self, data: AnyStr) -> None:
+        """ Checks only the lines completed by the newest chunk and the current unfinished line for 'CMDEND'. """
+
+        lines = (self._partial + data).splitlines(True)
+        self._partial = lines[-1][-self.window:] if lines and lines[-1][-1:] not in ('\n', '\r') else ''
+        for line in lines:
+            if self.endText not in line or (self.cmd and self.cmd in line):
+                continue
+            if sshBufferControl._processString(line.strip()) == self.endText:
+                self._found = True
+                return
+
+    @property
+    def lastLine(self) -> str:
+        lines = self._tail.splitlines()
+        return lines[-1] if lines else ''
+
+    @property
+    def keepReading(self) -> bool:
+        if not self.length:
+            return True
+        if not self.endText:
+            return True
+        lastLine = self.lastLine
+        if self.cmd and self.cmd in lastLine:
+            return True
+        if self.endTextType is tuple:
+            line = sshBufferControl.escapeChars.sub('', lastLine).strip()
+            for item in self.endText:
+                if len(item) == 1 and line.endswith(item):
+                    return False
+                elif len(item) > 1 and item in line:
+                    return False
+            return True
+        if self.endTextType is str:
+            if self._found:
+                return False
+            return self.endText not in lastLine
+        return True
+
+
+class sshOutputDecoder(object):
+    """ Turns the raw bytes read from a Paramiko Channel into text. One decoder is used for every read of a single
+        command so a multibyte character split between two reads is decoded correctly. Escape sequences and control
+        characters are removed from the bytes before decoding which saves making another copy of the whole output as
+        text. If the output is not valid utf-8 the decoder switches to the fallback encoding for the rest of the output.
+    """
+
+    escapeBytes = re.compile(rb'\x1b\[[0-?]*[ -/]*[@-~]|[\x00|\x0e-\x1f]')
+    _escapeComplete = re.compile(rb'\x1b(\[[0-?]*[ -/]*[@-~]|[^\[])')
+    _maxEscapeLength = 32
+
+    def __init__(self, encoding: str = 'utf-8', fallbackEncoding: Optional[str] = 'latin1', stripEscapes: bool = True):
+        """ Init function for sshOutputDecoder.
+
+        - :param encoding: (str) default 'utf-8'.
+        - :param fallbackEncoding: (str) default 'latin1'. Used once the output fails to decode with 'encoding'. If
+            None the undecodable bytes are replaced instead.
+        - :param stripEscapes: (bool) default True. Output from a channel without a PTY has no terminal escapes and
+            its control characters are part of the output so they are kept when this is False.
+        """
+
+        self.encoding = encoding
+        self.fallbackEncoding = fallbackEncoding
+        self.stripEscapes = stripEscapes
+        self.bytesReceived = 0
+        self.firstByteTime = None
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._carry = b''
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        """ Decodes the next chunk of bytes. An escape sequence that is cut off at the end of the chunk is held back
+            until the next chunk arrives.
+
+        - :param data: (bytes) The newest chunk from the buffer.
+        - :param final: (bool) default False. True when there will be no more data. Flushes anything held back.
+        - :return: (str)
+        """
+
+        if data:
+            self.bytesReceived += len(data)
+            if self.firstByteTime is None:
+                self.firstByteTime = time.time()
+        if self._carry:
+            data, self._carry = self._carry + data, b''
+        if not final and self.stripEscapes:
+            index = data.rfind(b'\x1b', -self._maxEscapeLength)
+            if index != -1 and not self._escapeComplete.match(data, index):
+                data, self._carry = data[:index], data[index:]
+        if data and self.stripEscapes:
+            data = self.escapeBytes.sub(b'', data)
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            pending = self._decoder.getstate()[0]
+            log.debug(f'Output is not valid {self.encoding} switching to {self.fallbackEncoding}: {e}')
+            if self.fallbackEncoding:
+                self._decoder = codecs.getincrementaldecoder(self.fallbackEncoding)(errors='replace')
+            else:
+                self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            return self._decoder.decode(pending + data, final)
@@ -66,6 +66,8 @@ class sshConnect(object):
         self.betweenBitTimeout = arguments.betweenBitTimeout
         self.delay = arguments.delay
         self.ioTimeout = arguments.ioTimeout
+        self.readerMode = arguments.readerMode
+        self.fallbackEncoding = arguments.fallbackEncoding
         self.ssh = self.createConn()
         self._mainEnvironment = self._openChannel(self._createTransport())
         self._mainEnvironment.__MAIN__ = True
@@ -223,6 +225,22 @@ class sshConnect(object):
                 sshTransport.close()
             raise SSHExceptionChannel(f'Failed to open SSH Channel: {e}') from e
 
+    def _openExecChannel(self, sshTransport: Transport) -> Channel:
+        """ Opens a SSH Channel without a PTY or a shell. It is used for a single 'exec_command' request. Unlike
+            '_openChannel' a failure does not close the transport as the server may only be refusing more sessions.
+
+        - :return: (Channel)
+        """
+
+        try:
+            channel = sshTransport.open_session(timeout=self.connTimeout)
+            channel.settimeout(self.ioTimeout)
+            return channel
+        except (paramiko.ChannelException, paramiko.SSHException) as e:
+            log.debug(f'Error occurred when opening exec channel: {e}')
+            log.debug(f"[DEBUG] for _openExecChannel: {traceback.format_exc()}")
+            raise SSHExceptionChannel(f'Failed to open SSH exec Channel: {e}') from e
+
     @staticmethod
     def _handleSSHKey(key: Union[AnyStr, TextIOWrapper], passphrase: AnyStr = None) -> Optional[PKey]:
         """ Creates ssh key object or returns None.
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+#
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: A process wide cache of live sshThreader connections. The connections are keyed by host, port, user,
+# credentials and proxy so that a new ToolKitInterface against the same box reuses the live transport instead of doing
+# a full key exchange and authentication again. Connections that have no users for longer then their idle timeout are
+# disconnected by a background reaper thread.
+
+
+import hashlib
+import logging
+import time
+import traceback
+from io import TextIOWrapper
+from threading import RLock, Lock, Thread, Event
+from typing import Any, Callable
+
+
+log = logging.getLogger('sshConnectionCache')
+
+
+class _CachedConnection(object):
+    """ A single entry in the sshConnectionCache """
+
+    __slots__ = ('sshCon', 'users', 'lastUsed', 'idleTimeout')
+
+    def __init__(self, sshCon: Any, idleTimeout: float):
+        self.sshCon = sshCon
+        self.users = 0
+        self.lastUsed = time.time()
+        self.idleTimeout = idleTimeout
+
+    @property
+    def isIdleExpired(self) -> bool:
+        return not self.users and time.time() - self.lastUsed > self.idleTimeout
+
+
+class sshConnectionCache(object):
+    """ Process wide cache of live connections. Use 'checkout' to get a connection and 'checkin' to give it back. A
+        connection can be checked out by more then one user at a time since the sshThreader is thread safe.
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self._CACHE_LOCK = RLock()
+        self._keyLocks = {}
+        self._reaperThread = None
+        self._reaperStop = Event()
+
+    def checkout(self, arguments: Any, factory: Callable[[], Any]) -> Any:
+        """ Returns a live connection for these arguments. A cached connection is health checked with
+            'checkConnection' and replaced if it is no longer connected. Otherwise the factory is called to create a
+            new connection which is then cached.
+
+        - :param arguments: (NamespaceDict) The arguments the connection is created from.
+        - :param factory: (Callable) Takes no parameters and returns a new connected sshThreader.
+        - :return: (sshThreader)
+        """
+
+        key = self.connectionKey(arguments)
+        with self._CACHE_LOCK:
+            keyLock = self._keyLocks.setdefault(key, Lock())
+        with keyLock:
+            with self._CACHE_LOCK:
+                entry = self._connections.get(key)
+                if entry is not None and not entry.users and not self._isHealthy(entry.sshCon):
+                    self._connections.pop(key)
+                    Thread(target=self._disconnect, args=(entry.sshCon,), daemon=True).start()
+                    entry = None
+                if entry is not None:
+                    entry.users += 1
+                    entry.lastUsed = time.time()
+                    log.debug(f'Reusing cached connection for: {arguments.username}@{arguments.host}')
+                    return entry.sshCon
+            sshCon = factory()
+            with self._CACHE_LOCK:
+                entry = _CachedConnection(sshCon, float(getattr(arguments, 'connectionCache', 0) or 0))
+                entry.users = 1
+                self._connections[key] = entry
+                self._startReaper()
+            return sshCon
+
+    def checkin(self, sshCon: Any) -> bool:
+        """ Gives back a connection from 'checkout'. The connection stays open until it has been idle for longer then
+            its idle timeout.
+
+        - :param sshCon: (sshThreader)
+        - :return: (bool) False if the connection is not in the cache. In which case the caller should disconnect it.
+        """
+
+        with self._CACHE_LOCK:
+            for entry in self._connections.values():
+                if entry.sshCon is sshCon:
+                    entry.users = max(0, entry.users - 1)
+                    entry.lastUsed = time.time()
+                    return True
+        return False
+
+    def evictIdle(self) -> int:
+        """ Disconnects every connection that has been idle longer then its idle timeout or is no longer connected.
+
+        - :return: (int) The amount of connections disconnected.
+        """
+
+        with self._CACHE_LOCK:
+            expired = [key for key, entry in self._connections.items()
+                       if entry.isIdleExpired or (not entry.users and not self._isHealthy(entry.sshCon))]
+            evicted = [self._connections.pop(key) for key in expired]
+            for key in expired:
+                self._keyLocks.pop(key, None)
+        for entry in evicted:
+            self._disconnect(entry.sshCon)
+        return len(evicted)
+
+    def clear(self) -> None:
+        """ Disconnects every cached connection that is not in use and stops the reaper thread. """
+
+        with self._CACHE_LOCK:
+            idle = [key for key, entry in self._connections.items() if not entry.users]
+            evicted = [self._connections.pop(key) for key in idle]
+            for key in idle:
+                self._keyLocks.pop(key, None)
+            if not self._connections:
+                self._reaperStop.set()
+        for entry in evicted:
+            self._disconnect(entry.sshCon)
+
+    @staticmethod
+    def connectionKey(arguments: Any) -> tuple:
+        """ Builds the cache key from the arguments. The key and password are hashed so they are not held in the key.
+            A key given as an open file is hashed by its contents, the file is put back where it was so it can still be
+            read when connecting.
+
+        - :param arguments: (NamespaceDict)
+        - :return: (tuple) of (host, port, username, key fingerprint, password hash, root, proxyUser, proxyServer)
+        """
+
+        def _fingerprint(value):
+            if not value:
+                return None
+            if isinstance(value, TextIOWrapper):
+                try:
+                    position = value.tell()
+                    contents = value.read()
+                    value.seek(position)
+                    value = contents
+                except (OSError, ValueError) as e:
+                    log.debug(f'Unable to read the ssh key file: {value.name}: {e}. Using its path for the cache key')
+                    value = value.name
+            if isinstance(value, str):
+                value = value.encode()
+            return hashlib.sha256(value).hexdigest()
+
+        return (arguments.host, int(arguments.port or 22), arguments.username, _fingerprint(arguments.key),
+                _fingerprint(arguments.password), bool(arguments.root), arguments.proxyUser or None,
+                arguments.proxyServer or None)
+
+    @property
+    def connectionCount(self) -> int:
+        return len(self._connections)
+
+    def _startReaper(self) -> None:
+        """ Starts the reaper thread if it is not already running. This must be called while holding '_CACHE_LOCK'. """
+
+        if self._reaperThread is not None:
+            return
+        self._reaperStop = Event()
+        self._reaperThread = Thread(target=self._reaper, args=(self._reaperStop,), name='sshConnectionCacheReaper',
+                                    daemon=True)
+        self._reaperThread.start()
+
+    def _reaper(self, stopEvent: Event) -> None:
+        """ The target of the reaper thread. It wakes up at half of the smallest idle timeout to evict connections. """
+
+        while not stopEvent.is_set():
+            with self._CACHE_LOCK:
+                timeouts = [entry.idleTimeout for entry in self._connections.values()]
+                if not timeouts:
+                    self._reaperThread = None
+                    return
+            if stopEvent.wait(max(1.0, min(timeouts) / 2)):
+                with self._CACHE_LOCK:
+                    if self._reaperThread is not None and self._reaperStop is stopEvent:
+                        self._reaperThread = None
+                return
+            try:
+                self.evictIdle()
+            except Exception as e:
+                log.error(f'ERROR: for method _reaper: {e}')
+                log.debug(f'[DEBUG] for method _reaper: {traceback.format_exc()}')
+
+    @staticmethod
+    def _isHealthy(sshCon: Any) -> bool:
+        try:
+            return sshCon.checkConnection()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _disconnect(sshCon: Any) -> None:
+        try:
+            sshCon.threadedDisconnect()
+        except Exception as e:
+            log.error(f'ERROR: for method _disconnect: {e}')
+            log.debug(f'[DEBUG] for method _disconnect: {traceback.format_exc()}')
+
+
+connectionCache = sshConnectionCache()
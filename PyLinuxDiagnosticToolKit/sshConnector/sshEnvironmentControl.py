@@ -33,6 +33,10 @@ class sshEnvironmentControl(sshBufferControl):
     startSubRe = re.compile(r'.*?(?=^CMDSTART)', flags=re.MULTILINE | re.DOTALL)
     # clean up all data after the end tag
     endSubRe = re.compile(r'CMDEND.*', flags=re.MULTILINE | re.DOTALL)
+    # Turns off the echo of the terminal and line editing, as readline echoes the input on its own, then sets a prompt
+    # unique to the environment. The token is split by quotes so the echo of this command never contains it.
+    __PROMPTTOKENCMD__ = "stty -echo 2> /dev/null; set +o emacs +o vi 2> /dev/null; unset PROMPT_COMMAND; PS2=''; " \
+                         "PS1='__LDTK_''%s__$'"
 
     def __init__(self, arguments, **kwargs):
         """ init function for sshEnvironmentControl.
@@ -178,6 +182,7 @@ class sshEnvironmentControl(sshBufferControl):
         try:
             if not environment.prompt:
                 environment.getPrompt(reCapturePrompt=True)
+            environment.promptToken = None
             channel = self._escalateUser(loginCmd=loginCmd, loginPasswd=loginPasswd, userName=userName,
                                          environment=environment, verifyUser=verifyUser, buffer=strBuffer,
                                          unsafe=unsafe)
@@ -207,6 +212,8 @@ class sshEnvironmentControl(sshBufferControl):
                 if reCapturePrompt and self.arguments.useBashnorc:
                     self.escalate(environment=environment, escalationCmd='bash', escalationArgs='-norc', name='BASH',
                                   console=True, unsafe=True, reCapturePrompt=True)
+            elif reCapturePrompt and self.arguments.useBashnorc:
+                self.setPromptToken(environment)
             # environment.getPrompt(reCapturePrompt=reCapturePrompt)
 
         return channel or environment
@@ -243,11 +250,17 @@ class sshEnvironmentControl(sshBufferControl):
         if name is None:
             name = escalationCmd
 
+        if escalationType == 'console':
+            environment.promptToken = None
+
         environment = self._performEscalation(environment, loginCmd=escalationCmd, loginPasswd=escalationInput,
                                               userName=escalationArgs, buffer=strBuffer, console=True,
                                               escalationHook=escalationHook, **kwargs)
-        
-        environment.getPrompt(reCapturePrompt=reCapturePrompt)
+
+        if escalationType == 'console' and escalationCmd.strip() == 'bash' and reCapturePrompt:
+            self.setPromptToken(environment)
+        else:
+            environment.getPrompt(reCapturePrompt=reCapturePrompt)
             
         environment.push(escalationCmd + escalationArgs, name=name, additionalInput=escalationInput, 
                          escalationType=escalationType)
@@ -300,6 +313,7 @@ class sshEnvironmentControl(sshBufferControl):
         while environment.getPreviousEscalationType() == environment.__ENVIRONMENT_CHANGE__:
             environment.pull()
 
+        environment.promptToken = None
         self._bufferControl(environment, logoutCmd, junkOut, unsafe=True)
         environment.pull()
         if self.checkConnection(environment):
@@ -411,11 +425,49 @@ class sshEnvironmentControl(sshBufferControl):
         - :return: str or None
         """
         # log.debug(f"ID: {environment._id} - Cached Prompt: {environment.prompt} - reCapturePrompt: {reCapturePrompt}")
-        if environment.prompt is not None and reCapturePrompt is False:
+        if environment.prompt is not None and (reCapturePrompt is False or environment.promptToken):
             return environment.prompt
         environment.prompt = self._capturePrompt(environment, StringIO()) or None
+        if environment.prompt and environment.prompt == self._promptToken(environment):
+            # Back in a shell that already has the token, IE: after logging out of a mysql console.
+            environment.promptToken = environment.prompt
         return environment.prompt
 
+    def setPromptToken(self, environment: Optional[sshEnvironment] = None) -> Optional[str]:
+        """ Turns off the echo of the terminal on a bash environment and sets PS1 to a token unique to the environment
+            IE: '__LDTK_<uuid>__$' and PS2 to nothing. The end of the output is then an exact match of the token, the
+            command is not sent back with its output and the prompt never needs to be captured. This is re-applied
+            after every escalation into bash. If the '--keepEcho' argument is set or the token does not come back the
+            prompt is captured instead.
+
+        - :param environment: sshEnvironment object
+        - :return: (str) The token or None
+        """
+
+        environment = environment or self.mainEnvironment
+        environment.promptToken = None
+        if getattr(self.arguments, 'keepEcho', False) or not self.checkConnection(environment):
+            environment.getPrompt(reCapturePrompt=True)
+            return None
+        token = self._promptToken(environment)
+        out = StringIO()
+        try:
+            self._bufferControl(environment, self.__PROMPTTOKENCMD__ % token[len('__LDTK_'):-len('__$')], out,
+                                prompt=token, runTimeout=15, firstBitTimeout=10, betweenBitTimeout=5)
+        except Exception as e:
+            log.error(f'ERROR: failed to set the prompt token on: {environment._id}: {e}')
+            log.debug(f'[DEBUG] for setPromptToken: {traceback.format_exc()}')
+        if out.getvalue().strip().endswith(token):
+            environment.prompt = environment.promptToken = token
+            return token
+        log.debug(f'The prompt token did not come back on: {environment._id}. Capturing the prompt instead')
+        environment.getPrompt(reCapturePrompt=True)
+        return None
+
+    @staticmethod
+    def _promptToken(environment: sshEnvironment) -> str:
+        return f"__LDTK_{environment._id.replace('-', '')}__$"
+
     def _escalateUser(self, loginCmd: str, userName: str, loginPasswd: str, environment: sshEnvironment,
                       verifyUser: bool, buffer: StringIO, unsafe: bool, **kwargs) -> sshEnvironment:
         """ Used as a helper function for becomeUser
@@ -12,9 +12,13 @@
 import logging
 import time
 import traceback
-from threading import RLock
+from collections import deque
+from threading import RLock, Condition, Thread, Event
+from paramiko import Channel
 from sshConnector.sshEnvironmentControl import sshEnvironmentControl
 from sshConnector.sshLibs.sshChannelEnvironment import EnvironmentControls
+from PyLinuxDiagnosticToolKit.libs.LDTKFactCache import factCache, HostFacts
+from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import SSHExceptionChannel
 from typing import Optional, Union
 
 
@@ -25,23 +29,68 @@ class sshEnvironmentManager(sshEnvironmentControl):
 
     _EnvironmentList = None
     _ENVIRONMENT_LIST_LOCK = None
+    _ENVIRONMENT_CONDITION = None
+    _EnvironmentWaiters = None
+    _EnvironmentsPending = 0
+    _ExecChannels = 0
+    _refillerThread = None
+    _refillerStop = None
     _MAX_SESSIONS = None
     _DEFAULT_MAX_SESSIONS = 8
     _MaxSessionsString = "if [ -f /etc/ssh/sshd_config ]; then output=$(grep -v '^#' /etc/ssh/sshd_config 2>&1 | awk " \
                          "'/MaxSessions/ {print $2}'); if [ -z \"$output\" ]; then output='%s'; fi; else output='%s';" \
                          "fi; echo $output"
+    _BootIdString = "/bin/cat /proc/sys/kernel/random/boot_id 2> /dev/null"
+    hostFacts: HostFacts = None
 
     def __init__(self, arguments, **kwargs):
         self._ENVIRONMENT_LIST_LOCK = RLock()
+        self._ENVIRONMENT_CONDITION = Condition(self._ENVIRONMENT_LIST_LOCK)
+        self._EnvironmentWaiters = {}
+        self._EnvironmentsPending = 0
+        self._ExecChannels = 0
         super(sshEnvironmentManager, self).__init__(arguments=arguments, **kwargs)
+        self.hostFacts = self.getHostFacts(arguments)
         self._MAX_SESSIONS = self.getMaxSessionsValue(maxChannels=arguments.maxChannels)
         self._EnvironmentList = []
         self.addEnvironment(self.mainEnvironment)
+        if arguments.prewarmEnvironments:
+            self.prewarmEnvironments(arguments.prewarmEnvironments)
+        if arguments.idleEnvironments:
+            self.startEnvironmentRefiller(arguments.idleEnvironments)
+
+    def getHostFacts(self, arguments=None) -> HostFacts:
+        """ Returns the cached facts of the connected host from 'factCache'. The host is identified by the
+            fingerprint of its host key and its hostname. The boot_id of the host is read so facts gathered before the
+            host rebooted are dropped. This is the only round trip needed to reuse the facts of a known host.
+
+        - :param arguments: (NameSpaceDict) default None. Uses 'factCacheFile' and 'factCacheTTL'.
+        - :return: (HostFacts)
+        """
+
+        arguments = arguments or self.arguments
+        factCache.loadOnce(getattr(arguments, 'factCacheFile', None))
+        if getattr(arguments, 'factCacheTTL', None) is not None:
+            factCache.ttl = arguments.factCacheTTL or None
+        hostKey, bootId = None, None
+        try:
+            hostKey = self.mainEnvironment.get_transport().get_remote_server_key()
+            output = self.executeOnEnvironment(self.mainEnvironment, self._BootIdString, self.mainEnvironment.prompt,
+                                               runTimeout=15)
+            if output and output.strip():
+                bootId = output.strip().splitlines()[-1].strip()
+                if len(bootId) != 36 or bootId.count('-') != 4:
+                    bootId = None
+        except Exception as e:
+            log.error(f"error in getHostFacts: {e}")
+            log.debug(f"[DEBUG] for getHostFacts: {traceback.format_exc()}")
+        return factCache.host(factCache.identity(hostKey, self.host), bootId)
 
     def getMaxSessionsValue(self, maxChannels: Optional[int] = None) -> int:
         """ This attempts to change the max amount of channels this tool can use based on the target server's
             MaxSessions variable in sshd_config file. If the machine received the argument maxChannels it will
-            attempt to use that as long as it isn't above 10. The default value is 8.
+            attempt to use that as long as it isn't above 10. The default value is 8. The MaxSessions value is kept in
+            'hostFacts' so it is only read once per host.
 
         - :param maxChannels:
         - :return:
@@ -50,6 +99,8 @@ class sshEnvironmentManager(sshEnvironmentControl):
         try:
             if type(maxChannels) is int and (10 >= maxChannels > 0):
                 return maxChannels
+            if self.hostFacts is not None and self.hostFacts.get('maxSessions'):
+                return self.hostFacts.get('maxSessions')
             output = self.executeOnEnvironment(self.mainEnvironment,
                                                self._MaxSessionsString %
                                                (self._DEFAULT_MAX_SESSIONS, self._DEFAULT_MAX_SESSIONS),
@@ -57,7 +108,10 @@ class sshEnvironmentManager(sshEnvironmentControl):
                                                runTimeout=15)
             if not output:
                 return self._DEFAULT_MAX_SESSIONS
-            return int(output.strip().splitlines()[-1].strip()) - 1
+            maxSessions = int(output.strip().splitlines()[-1].strip()) - 1
+            if self.hostFacts is not None:
+                self.hostFacts.set('maxSessions', maxSessions)
+            return maxSessions
         except Exception as e:
             log.error(f"error in getMaxSessionsValue: {e}")
             log.debug(f"[DEBUG] for getMaxSessionsValue: {traceback.format_exc()}")
@@ -65,7 +119,9 @@ class sshEnvironmentManager(sshEnvironmentControl):
 
     def getEnvironment(self, autoCreate=True, label=None, EnvironmentID=None, wait=60, delay=1, **kwargs)\
             -> Union[bool, EnvironmentControls]:
-        """ This grabs the next available EnvironmentControls object or creates one.
+        """ This grabs the next available EnvironmentControls object or creates one. If none are available the calling
+            thread blocks until one is checked back in (see 'checkinEnvironment'), a new one can be created or 'wait'
+            expires. Threads asking for the same label/EnvironmentID are served in the order they asked.
 
         - :param autoCreate: (bool) default True, If no label or channelID is provided then this will make the method
             return a new _channelContainer if none available are found.
@@ -74,37 +130,57 @@ class sshEnvironmentManager(sshEnvironmentControl):
         - :param channelID: (str) default None. Looks for a particular channelID. Waits if it finds it but finds it being
             used. Returns False
         - :param wait: (int) default 60. Tells how long to wait for a channel to become available.
-        - :param delay: (float) default 0.1. Tells how long to pause between waiting.
+        - :param delay: (float) default 1. No longer used as waiting threads are woken up when a channel is released.
+            It is kept for compatibility.
         - :param kwargs: passed into a new _channelObject if this method tries to make a new channel.
         -:return:
         """
 
         try:
-            start_time = time.time()
-            while time.time() < start_time + wait:
-                channelObj = self._checkEnvironments(autoCreate, label, EnvironmentID)
-                if channelObj is True:
-                    channelObj = self.createEnvironment(label=label, **kwargs)
-                if channelObj is False:
-                    time.sleep(delay)
-                    continue
-                if channelObj is not None:
-                    channelObj.active = True
-                return channelObj
-            return False
+            endTime = time.time() + wait
+            while True:
+                with self._ENVIRONMENT_CONDITION:
+                    channelObj = self._waitForEnvironment(autoCreate, label, EnvironmentID, endTime)
+                    if channelObj is True:
+                        self._EnvironmentsPending += 1
+                if channelObj is not True:
+                    if channelObj:
+                        channelObj.active = True
+                    return channelObj
+                try:
+                    channelObj = self.createEnvironment(label=label, toBeUsed=True, **kwargs)
+                finally:
+                    with self._ENVIRONMENT_CONDITION:
+                        self._EnvironmentsPending -= 1
+                        self._ENVIRONMENT_CONDITION.notify_all()
+                if channelObj:
+                    return channelObj
+                if time.time() >= endTime:
+                    return False
+                log.debug("Failed to create a new Environment. Waiting for another to become available.")
         except Exception as e:
             log.error(f"ERROR in getEnvironment: There was a failure getting Channel: {e}")
             log.debug(f"[DEBUG] for getEnvironment: {traceback.format_exc()}")
 
+    def checkinEnvironment(self, environment: Optional[EnvironmentControls] = None) -> None:
+        """ Wakes up threads waiting within 'getEnvironment'. This is called when an EnvironmentControls object is
+            released, added or removed.
+
+        - :param environment: (EnvironmentControls) default None. The environment that was released.
+        - :return:
+        """
+
+        with self._ENVIRONMENT_CONDITION:
+            self._ENVIRONMENT_CONDITION.notify_all()
+
     def createEnvironment(self, **kwargs) -> Union[bool, EnvironmentControls]:
         """ Used to create a new channel.
 
         - :param maxChannels: (int) default (whatever the _MAX_CHANNEL class variable is set to). This is passed directly
             to '_checkMaxChannels'. This can temporarily override the _MAX_CHANNEL setting.
         - :param autoAdd: (bool) default True: determines if the 'addChannel' method will be called to add the new channel
-        - :param toBeUsed: (bool) default True: This is actually a _ChannelContainer object param but it is important here
-            as it can be sued to control weather or not the new object will be available for use by the calling thread
-            or can immediately be available for other threads to use.
+        - :param toBeUsed: (bool) default False: This controls weather or not the new object will be reserved for use by
+            the calling thread or can immediately be available for other threads to use.
         - :param kwargs:
         - :return:
         """
@@ -115,6 +191,7 @@ class sshEnvironmentManager(sshEnvironmentControl):
         autoAdd = kwargs.pop('autoAdd', True)
         EnvObj = self._openChannel(self.mainEnvironment.get_transport())
         EnvObj.label = kwargs.get('label', '')
+        EnvObj.active = kwargs.pop('toBeUsed', False)
         EnvObj.push("su -", name=self.arguments.username, additionalInput=self.arguments.password)
         if self.arguments.root:
             EnvObj.becomeRoot()
@@ -125,6 +202,127 @@ class sshEnvironmentManager(sshEnvironmentControl):
             self.addEnvironment(EnvObj)
         return EnvObj
 
+    def openExecChannel(self) -> Optional[Channel]:
+        """ Opens a channel without a PTY or a shell for a single command. Exec channels and environments share the
+            MaxSessions limit so this returns None instead of waiting when every session is taken or the server
+            refuses a new one. Every channel returned must be given back with 'closeExecChannel'.
+
+        - :return: (Channel) or None
+        """
+
+        with self._ENVIRONMENT_CONDITION:
+            if not self._checkMaxSessions(includePending=True):
+                return None
+            self._ExecChannels += 1
+        try:
+            return self._openExecChannel(self.mainEnvironment.get_transport())
+        except SSHExceptionChannel as e:
+            log.debug(f"Unable to open an exec channel: {e}")
+            self.closeExecChannel()
+            return None
+
+    def closeExecChannel(self, channel: Optional[Channel] = None) -> None:
+        """ Closes a channel from 'openExecChannel' and frees its session for other exec channels or environments.
+
+        - :param channel: (Channel) default None.
+        - :return:
+        """
+
+        try:
+            if channel is not None:
+                channel.close()
+        finally:
+            with self._ENVIRONMENT_CONDITION:
+                self._ExecChannels -= 1
+                self._ENVIRONMENT_CONDITION.notify_all()
+
+    def prewarmEnvironments(self, count: Optional[int] = None, wait: Optional[float] = None) -> int:
+        """ Opens and escalates new environments in parallel so that the first burst of threaded commands does not pay
+            the login cost of each environment one after another. The new environments are added as idle and available
+            to any thread. The amount created is capped by the MaxSessions value.
+
+        - :param count: (int) default None. How many environments to create. If None this fills up to MaxSessions.
+        - :param wait: (float) default None. If provided this blocks until the environments are created or wait expires.
+        - :return: (int) The amount of environments being created.
+        """
+
+        with self._ENVIRONMENT_CONDITION:
+            available = self._MAX_SESSIONS - self.EnvironmentCount - self._EnvironmentsPending - self._ExecChannels
+            count = max(0, min(available, available if count is None else count))
+            self._EnvironmentsPending += count
+        threads = [Thread(target=self._createPendingEnvironment, daemon=True, name=f'ldtkPrewarm-{num}')
+                   for num in range(count)]
+        for thread in threads:
+            thread.start()
+        if wait is not None:
+            endTime = time.time() + wait
+            for thread in threads:
+                thread.join(max(0.0, endTime - time.time()))
+        log.debug(f"Pre-warming {count} environments")
+        return count
+
+    def startEnvironmentRefiller(self, idleCount: int) -> bool:
+        """ Starts a background thread that keeps 'idleCount' idle environments (not including the main environment)
+            ready to be used. The thread wakes up whenever an environment is checked in, added or removed.
+
+        - :param idleCount: (int) The amount of idle environments to keep. This is still capped by MaxSessions.
+        - :return: (bool) False if the refiller is already running.
+        """
+
+        if self._refillerThread is not None and self._refillerThread.is_alive():
+            return False
+        self._refillerStop = Event()
+        self._refillerThread = Thread(target=self._environmentRefiller, args=(idleCount, self._refillerStop),
+                                      daemon=True, name='ldtkEnvironmentRefiller')
+        self._refillerThread.start()
+        return True
+
+    def stopEnvironmentRefiller(self) -> None:
+        """ Stops the background thread started by 'startEnvironmentRefiller' if there is one. """
+
+        if self._refillerStop is not None:
+            self._refillerStop.set()
+            self.checkinEnvironment()
+
+    def _environmentRefiller(self, idleCount: int, stopEvent: Event) -> None:
+        """ The body of the refiller thread. Review 'startEnvironmentRefiller'.
+
+        - :param idleCount: (int)
+        - :param stopEvent: (Event) When set the thread exits.
+        - :return:
+        """
+
+        def _isIdle(envObj):
+            return not envObj.active and not envObj.customChannel and not envObj.isMain and not envObj.dead
+
+        while not stopEvent.is_set() and self.checkConnection():
+            with self._ENVIRONMENT_CONDITION:
+                idle = len(list(filter(_isIdle, self._EnvironmentList))) + self._EnvironmentsPending
+                if idle >= idleCount or not self._checkMaxSessions(includePending=True):
+                    self._ENVIRONMENT_CONDITION.wait(timeout=30)
+                    continue
+                self._EnvironmentsPending += 1
+            if not self._createPendingEnvironment():
+                stopEvent.wait(timeout=5)
+        log.debug("The environment refiller has stopped")
+
+    def _createPendingEnvironment(self) -> bool:
+        """ Creates an environment that was already counted in '_EnvironmentsPending' and releases that count.
+
+        - :return: (bool) True if the environment was created.
+        """
+
+        try:
+            return bool(self.createEnvironment())
+        except Exception as e:
+            log.error(f"ERROR: There was a failure in _createPendingEnvironment: {e}")
+            log.debug(f"[DEBUG] for _createPendingEnvironment: {traceback.format_exc()}")
+            return False
+        finally:
+            with self._ENVIRONMENT_CONDITION:
+                self._EnvironmentsPending -= 1
+                self._ENVIRONMENT_CONDITION.notify_all()
+
     def addEnvironment(self, channel: EnvironmentControls, **kwargs) -> bool:
         """ Adds a provided channel to the channel manager.
 
@@ -138,6 +336,7 @@ class sshEnvironmentManager(sshEnvironmentControl):
                 log.debug("A new channel cannot be added as there already are too many channels")
                 return False
             self.EnvironmentList.append(channel)
+            self.checkinEnvironment(channel)
             return True
         except Exception as e:
             log.error(f"ERROR: There was a failure in addEnvironment: {e}")
@@ -152,12 +351,13 @@ class sshEnvironmentManager(sshEnvironmentControl):
         """
 
         try:
-            if channel in self._EnvironmentList:
-                self._EnvironmentList.remove(channel)
-                return True
-            else:
-                log.debug("Channel %s appears to have already been removed!" % channel.EnvironmentID)
-                return None
+            with self._ENVIRONMENT_CONDITION:
+                if channel in self._EnvironmentList:
+                    self._EnvironmentList.remove(channel)
+                    self._ENVIRONMENT_CONDITION.notify_all()
+                    return True
+            log.debug("Channel %s appears to have already been removed!" % channel.EnvironmentID)
+            return None
         except Exception as e:
             log.error("ERROR: There was a failure in removeEnvironment: %s" % e)
             log.error("The failure is associated with channel: %s" % channel.EnvironmentID)
@@ -169,20 +369,59 @@ class sshEnvironmentManager(sshEnvironmentControl):
         - :return:
         """
 
+        self.stopEnvironmentRefiller()
         with self._ENVIRONMENT_LIST_LOCK:
             for environment in [env for env in self.EnvironmentList if not env.isMain]:
                 environment.disconnectEnvironment()
             self.mainEnvironment.disconnectEnvironment()
 
-    def _checkMaxSessions(self, **kwargs) -> bool:
-        """ This parses maxChannels out of kwargs for some methods.
+    def _waitForEnvironment(self, autoCreate: Optional[bool], label: Optional[str], EnvironmentID: Optional[str],
+                            endTime: float) -> Optional[Union[bool, EnvironmentControls]]:
+        """ Waits on the environment condition until this thread is first in line for its label/EnvironmentID and
+            '_checkEnvironments' finds something. This must be called while holding '_ENVIRONMENT_CONDITION'.
+
+        - :param autoCreate: (bool) Passed to '_checkEnvironments'.
+        - :param label: (str) Passed to '_checkEnvironments'.
+        - :param EnvironmentID: (str) Passed to '_checkEnvironments'.
+        - :param endTime: (float) The epoch time to stop waiting at.
+        - :return: EnvironmentControls, None if the label/EnvironmentID does not exist, True if a new environment should
+            be created by the caller or False if the wait expired.
+        """
 
+        key = (label, EnvironmentID)
+        ticket = object()
+        queue = self._EnvironmentWaiters.setdefault(key, deque())
+        queue.append(ticket)
+        try:
+            while True:
+                if queue[0] is ticket:
+                    channelObj = self._checkEnvironments(autoCreate, label, EnvironmentID)
+                    if channelObj is not True and channelObj is not False:
+                        return channelObj
+                    if channelObj is True and self._checkMaxSessions(includePending=True):
+                        return True
+                remaining = endTime - time.time()
+                if remaining <= 0:
+                    return False
+                self._ENVIRONMENT_CONDITION.wait(remaining)
+        finally:
+            queue.remove(ticket)
+            if not queue:
+                self._EnvironmentWaiters.pop(key, None)
+            self._ENVIRONMENT_CONDITION.notify_all()
+
+    def _checkMaxSessions(self, includePending: bool = False, **kwargs) -> bool:
+        """ This parses maxChannels out of kwargs for some methods. Open exec channels are always counted as they use
+            a session each.
+
+        - :param includePending: (bool) default False. Also count environments that are currently being created.
         - :param kwargs:
         - :return:
         """
 
         maxChannels = kwargs.pop('maxChannels', self._MAX_SESSIONS) or self._MAX_SESSIONS
-        return not self.EnvironmentCount >= maxChannels
+        pending = self._EnvironmentsPending if includePending else 0
+        return not self.EnvironmentCount + pending + self._ExecChannels >= maxChannels
 
     def _checkEnvironments(self, autoCreate: Optional[bool] = True, label: Optional[str] = None,
                            EnvironmentID: Optional[str] = None) -> Optional[Union[bool, EnvironmentControls]]:
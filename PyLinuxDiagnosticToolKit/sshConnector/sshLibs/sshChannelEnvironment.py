@@ -14,6 +14,7 @@ import re
 from paramiko import Channel
 from threading import RLock
 from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import SSHExceptionConn
+from PyLinuxDiagnosticToolKit.libs.LDTKMetrics import CommandMetrics
 from typing import Optional, Union, AnyStr, Any
 
 
@@ -30,7 +31,7 @@ class sshChannelWrapper(Channel):
 
     _id = None
     __MAIN__ = None
-    _defaultPromptReg = r"bash-\d\.\d[#|$|>|@|~]"
+    _defaultPromptReg = r"bash-\d\.\d[#|$|>|@|~]|__LDTK_[0-9a-f]+__\$"
     _defaultPromptCompileReg = None
 
     def __new__(cls, parentInst: Any, **kwargs):
@@ -78,6 +79,8 @@ class sshEnvironment(sshChannelWrapper):
     _template = (None, None, None, None)
 
     prompt: str = None
+    # Set when the echo of the terminal is off and the prompt is the token set by sshEnvironmentControl.setPromptToken
+    promptToken: str = None
     _consoleStack: list = None
     _CONSOLESTACK_LOCK: RLock = None
 
@@ -298,6 +301,7 @@ class EnvironmentControls(sshEnvironment):
     timeout: Optional[Union[int, float]] = None
     kwargs: Optional[dict] = {}
     customChannel: bool = None
+    metrics: CommandMetrics = None
 
     def __new__(cls, parentInst: Any, **kwargs):
         parentInst.__class__ = EnvironmentControls
@@ -319,6 +323,7 @@ class EnvironmentControls(sshEnvironment):
         self.customChannel = kwargs.get('customChannel', True if self._label else False)
         self._LOCK = RLock()
         self.sshParent = kwargs.get('sshParent')
+        self.metrics = CommandMetrics(commandKey=self._label or None)
         if kwargs.get('autoConnect', False):
             self.sshParent.createConn()
 
@@ -345,6 +350,8 @@ class EnvironmentControls(sshEnvironment):
             if not self._LOCK._is_owned():
                 self.active = False
                 del self.commandObject
+                if hasattr(self.sshParent, 'checkinEnvironment'):
+                    self.sshParent.checkinEnvironment(self)
 
     def __hash__(self):
         return hash(self.EnvironmentID)
@@ -362,7 +369,8 @@ class EnvironmentControls(sshEnvironment):
     def escalate(self, *args, **kwargs) -> Union[sshEnvironment, bool]:
         """ Wrapper for the escalate method on the sshEnvironmentControl """
         kwargs.update({'environment': self})
-        return self.sshParent.escalate(*args, **kwargs)
+        with self.metrics.phase('escalation'):
+            return self.sshParent.escalate(*args, **kwargs)
 
     def becomeRoot(self, *args, **kwargs) -> bool:
         """ This is specific logic just for handling becoming the root user. This hopefully will be deprecated once
@@ -372,25 +380,29 @@ class EnvironmentControls(sshEnvironment):
         """
 
         kwargs.update({'environment': self})
-        return self.sshParent.becomeRoot(*args, **kwargs)
+        with self.metrics.phase('escalation'):
+            return self.sshParent.becomeRoot(*args, **kwargs)
 
     def becomeUser(self, *args, **kwargs) -> Union[sshEnvironment, bool]:
         """ Wrapper for the becomeUser method on the sshEnvironmentControl """
 
         kwargs.update({'environment': self})
-        return self.sshParent.becomeUser(*args, **kwargs)
+        with self.metrics.phase('escalation'):
+            return self.sshParent.becomeUser(*args, **kwargs)
 
     def consoleEscalation(self, *args, **kwargs) -> Union[sshEnvironment, bool]:
         """ Wrapper for the consoleEscalation method on the sshEnvironmentControl """
 
         kwargs.update({'environment': self})
-        return self.sshParent.consoleEscalation(*args, **kwargs)
+        with self.metrics.phase('escalation'):
+            return self.sshParent.consoleEscalation(*args, **kwargs)
 
     def environmentChange(self, *args, **kwargs) -> Union[sshEnvironment, bool]:
         """ Wrapper for the environmentChange method on the sshEnvironmentControl """
 
         kwargs.update({'environment': self})
-        return self.sshParent.environmentChange(*args, **kwargs)
+        with self.metrics.phase('escalation'):
+            return self.sshParent.environmentChange(*args, **kwargs)
 
     def getPrompt(self, reCapturePrompt: bool = False) -> Optional[str]:
         """ Wrapper for the getPrompt method on the sshEnvironmentControl """
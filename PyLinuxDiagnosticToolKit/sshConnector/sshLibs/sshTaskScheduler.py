@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Author: Ryan Henrichson, Timothy Nodine
+
+# Version: 0.1
+# Date: 10/17/26
+# Description: A queue of CommandContainers waiting for the sshThreader ThreadPool. Containers are ordered by their
+# priority and then by their deadline (earliest deadline first). The deadline is the time the container was queued plus
+# its timeout. A container whose deadline passed while it was queued is failed without being executed. A number of
+# worker sessions can be reserved for short commands so long running commands (low priority or flagged 'longRunning')
+# cannot take every one.
+
+
+import time
+import logging
+import traceback
+from bisect import insort
+from itertools import count
+from threading import RLock
+from typing import Any, List, Optional
+
+
+log = logging.getLogger('sshTaskScheduler')
+
+
+class _ScheduledTask(object):
+
+    __slots__ = ('key', 'container', 'deadline', 'queued', 'short')
+
+    def __init__(self, key: tuple, container: Any, deadline: float, queued: float, short: bool):
+        self.key = key
+        self.container = container
+        self.deadline = deadline
+        self.queued = queued
+        self.short = short
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class sshTaskScheduler(object):
+    """ The ThreadPool is given one task for every container that is queued. Each task takes the best container that
+        can run right now instead of the container it was submitted for. A task that finds nothing it can run is
+        deferred and given back by 'done' once a running container finishes.
+    """
+
+    def __init__(self, workers: int = 9, reserved: int = 1, defaultPriority: int = 10):
+        """
+        - :param workers: (int) default 9. The amount of sessions threaded containers can use at once. That is the
+            MaxSessions value less the main environment. Environments and exec channels both take one of them.
+        - :param reserved: (int) default 1. The amount of worker sessions long commands cannot use. At least one is
+            always left for long commands.
+        - :param defaultPriority: (int) default 10. A container with a higher '__PRIORITY__' is a long command.
+        """
+
+        self.workers = workers
+        self.reserved = reserved
+        self.defaultPriority = defaultPriority
+        self.runningLong = 0
+        self.deferred = 0
+        self.expired = 0
+        self.executed = 0
+        self.maxDepth = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+        self._queue: List[_ScheduledTask] = []
+        self._running = {}
+        self._seq = count()
+        self._LOCK = RLock()
+
+    def __len__(self):
+        return len(self._queue)
+
+    @property
+    def longLimit(self) -> int:
+        """ The amount of long commands that can run at once. """
+
+        return max(1, (self.workers or 1) - max(0, self.reserved or 0))
+
+    def isShort(self, container: Any) -> bool:
+        """ Checks if the container is a short command. A container is long if it was flagged 'longRunning' or has a
+            lower priority (higher '__PRIORITY__') than the default. A container with children only waits on them so it
+            never counts against the long commands.
+        """
+
+        if getattr(container, 'children', None):
+            return True
+        if getattr(container, 'longRunning', False):
+            return False
+        return getattr(container, '__PRIORITY__', self.defaultPriority) <= self.defaultPriority
+
+    def put(self, container: Any) -> None:
+        """ Queues a container. The caller must submit one task to the ThreadPool that calls 'get' for it. """
+
+        now = time.time()
+        priority = getattr(container, '__PRIORITY__', self.defaultPriority)
+        timeout = getattr(container, 'timeout', None)
+        deadline = now + timeout if timeout else float('inf')
+        with self._LOCK:
+            insort(self._queue, _ScheduledTask((priority, deadline, next(self._seq)), container, deadline, now,
+                                               self.isShort(container)))
+            self.maxDepth = max(self.maxDepth, len(self._queue))
+
+    def get(self) -> Optional[Any]:
+        """ Removes and returns the best container that can run right now. Containers that expired are failed along the
+            way and cancelled containers are dropped. None is returned if nothing can run, in which case the task is
+            deferred until 'done' is called.
+
+        - :return: (CommandContainer) or None
+        """
+
+        expired, task = [], None
+        now = time.time()
+        with self._LOCK:
+            for item in list(self._queue):
+                if getattr(item.container, 'cancelled', False):
+                    self._queue.remove(item)
+                    continue
+                if item.deadline <= now:
+                    self._queue.remove(item)
+                    expired.append(item)
+                    continue
+                if item.short or self.runningLong < self.longLimit:
+                    task = item
+                    self._queue.remove(item)
+                    break
+            if task is not None:
+                wait = now - task.queued
+                self._running[id(task.container)] = task.short
+                self.runningLong += 0 if task.short else 1
+                self.executed += 1
+                self.totalWait += wait
+                self.maxWait = max(self.maxWait, wait)
+            elif self._queue:
+                self.deferred += 1
+            self.expired += len(expired)
+        for item in expired:
+            self._expire(item, now)
+        if task is None:
+            return None
+        if hasattr(task.container, 'metrics'):
+            task.container.metrics.addPhase('queueWait', now - task.queued)
+        return task.container
+
+    def done(self, container: Any) -> int:
+        """ Records that a container returned by 'get' has finished.
+
+        - :param container: (CommandContainer)
+        - :return: (int) The amount of deferred tasks that must be submitted to the ThreadPool again.
+        """
+
+        with self._LOCK:
+            if self._running.pop(id(container), True) is False:
+                self.runningLong -= 1
+            deferred, self.deferred = self.deferred, 0
+            return deferred
+
+    def stats(self) -> dict:
+        """ Returns the queue depth, wait times and counters of the scheduler. """
+
+        with self._LOCK:
+            now = time.time()
+            return {'depth': len(self._queue), 'maxDepth': self.maxDepth, 'running': len(self._running),
+                    'runningLong': self.runningLong, 'longLimit': self.longLimit, 'deferred': self.deferred,
+                    'executed': self.executed, 'expired': self.expired,
+                    'averageWait': self.totalWait / self.executed if self.executed else 0.0, 'maxWait': self.maxWait,
+                    'oldestWait': max((now - item.queued for item in self._queue), default=0.0)}
+
+    @staticmethod
+    def _expire(task: _ScheduledTask, now: float) -> None:
+        log.warning(f'The deadline passed while queued for: {task.container} after {round(now - task.queued, 3)}s')
+        try:
+            task.container.expire()
+        except Exception as e:
+            log.error(f'ERROR: failed to expire: {task.container}: {e}')
+            log.debug(f'[DEBUG] for _expire: {traceback.format_exc()}')
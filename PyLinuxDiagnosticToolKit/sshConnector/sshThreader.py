@@ -28,6 +28,7 @@ except:
     from ldtk import CommandContainer
 from sshConnector.sshEnvironmentManager import sshEnvironmentManager
 from sshConnector.sshLibs.sshChannelEnvironment import EnvironmentControls
+from sshConnector.sshLibs.sshTaskScheduler import sshTaskScheduler
 from PyMultiTasking.ThreadingUtils import ThreadPool as Pool
 from typing import Optional, Union, Any
 from time import time
@@ -41,6 +42,7 @@ log = logging.getLogger('SSHThreader')
 class sshThreader(sshEnvironmentManager):
     threadDict = {}
     tPool = None
+    scheduler = None
     tki = None
 
     def __init__(self, arguments, **kwargs):
@@ -55,6 +57,9 @@ class sshThreader(sshEnvironmentManager):
         super(sshThreader, self).__init__(arguments=arguments, **kwargs)
         self.tki = kwargs.pop('tki', None)
         self.tPool = Pool(maxWorkers=self._MAX_SESSIONS * 2, workerAutoKill=False)
+        # The main environment never runs threaded containers. Exec channels take their sessions from the same pool.
+        self.scheduler = sshTaskScheduler(workers=max(1, self._MAX_SESSIONS - 1),
+                                          reserved=getattr(arguments, 'reservedEnvironments', 1))
 
     def isIdle(self) -> bool:
         """ This checks the 'ThreadPool' class's 'isIdle()' function and returns the results.
@@ -73,10 +78,19 @@ class sshThreader(sshEnvironmentManager):
 
         return self.tPool.wait_completion(**kwargs)
 
+    def getSchedulerStats(self) -> dict:
+        """ Returns the queue depth and wait time stats of the scheduler. Review 'sshTaskScheduler.stats'.
+
+        - :return: (dict)
+        """
+
+        return self.scheduler.stats()
+
     def executeOnThread(self, cmd: Union[CommandContainer, Any],
                         EnvObj: Optional[EnvironmentControls] = None, **kwargs) -> CommandContainer:
         """ Submits a new command to be executed via the 'submit' method in Pool. All commands ran should be within a
-            CommandContainer. So the method first checks to see if the command is already a Container or not.
+            CommandContainer. So the method first checks to see if the command is already a Container or not. The
+            container is queued on the scheduler which decides the order the queued containers run in.
 
         - :param CC: [Either a CommandContainer or Any other datatype]
         - :param EnvObj: (EnvironmentControls) default None. This specifies a Channel to run the command on. This
@@ -98,7 +112,8 @@ class sshThreader(sshEnvironmentManager):
         CC = _preparserCmd(cmd, **kwargs)
 
         if EnvObj is None:
-            self.tPool.submit(fn=self._exeThread, CC=CC, submit_task_priority=CC.__PRIORITY__)
+            self.scheduler.put(CC)
+            self.tPool.submit(fn=self._exeScheduled, submit_task_priority=CC.__PRIORITY__)
             return CC
         else:
             if not EnvObj.active:
@@ -131,6 +146,7 @@ class sshThreader(sshEnvironmentManager):
                 w = 10
             return w
 
+        self.stopEnvironmentRefiller()
         try:
             if not self.tPool:
                 super(sshThreader, self).disconnectEnvironments()
@@ -148,10 +164,29 @@ class sshThreader(sshEnvironmentManager):
             if self.checkConnection():
                 super(sshThreader, self).disconnect()
 
+    def _exeScheduled(self, **kwargs) -> Optional[CommandContainer]:
+        """ The method that is passed to the Pool via the 'submit' method. It runs the best container the scheduler has
+            instead of a specific one. Tasks the scheduler deferred are submitted again once the container finishes.
+
+        - :param kwargs: (Passed into '_exeThread')
+        - :return: (CommandContainer) or None if the scheduler had nothing that could run
+        """
+
+        CC = self.scheduler.get()
+        if CC is None:
+            return None
+        try:
+            return self._exeThread(CC, **kwargs)
+        finally:
+            for _ in range(self.scheduler.done(CC)):
+                self.tPool.submit(fn=self._exeScheduled, submit_task_priority=CC.__PRIORITY__)
+
     def _exeThread(self, CC: CommandContainer, **kwargs) -> CommandContainer:
-        """ The method that is passed to the Pool via the 'submit' method. This method is the connection between the
-            CommandContainer (which holds the command and manages the output) and the Environment that will be used to
-            execute the command. This is ran on the Pool in a thread. It will also respond with the CC it was given.
+        """ Called by '_exeScheduled' on the Pool. This method is the connection between the CommandContainer (which
+            holds the command and manages the output) and the Environment that will be used to execute the command.
+            This is ran on the Pool in a thread. It will also respond with the CC it was given.
+            A CommandContainer that does not need a shell (see 'CommandContainer.useExecChannel') is ran on its own exec
+            channel instead when a session is free.
 
         - :param CC: (CommandContainer)
         - :param kwargs: (Passed into the 'getEnvironment' method)
@@ -174,7 +209,18 @@ class sshThreader(sshEnvironmentManager):
             if CC.children:
                 log.debug("I have children... ")
                 return CC.executor()
+            if CC.useExecChannel:
+                waitStart = time()
+                channel = self.openExecChannel()
+                if channel is not None:
+                    CC.metrics.addPhase('environmentWait', time() - waitStart)
+                    try:
+                        return CC.executor(ExecChannel=channel)
+                    finally:
+                        self.closeExecChannel(channel)
             log.debug("About too get environment and with it")
+            waitStart = time()
             with self.getEnvironment(True, *setupParams(CC), **kwargs) as EnvObj:
+                CC.metrics.addPhase('environmentWait', time() - waitStart)
                 log.debug("Got environment and executing with environment")
                 return CC.executor(EnvironmentObject=EnvObj)
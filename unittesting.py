@@ -1,14 +1,28 @@
 import unittest
+import asyncio
+import logging
 import os
 import json
+import tempfile
 import warnings
-from time import sleep
+from argparse import Namespace
+from threading import Thread
+from time import sleep, time
+from datetime import datetime
 from functools import partialmethod
 from io import StringIO
-from PyLinuxDiagnosticToolKit import ldtk, find_modules
+from PyLinuxDiagnosticToolKit import ldtk, ldtkFleet, find_modules
 from PyLinuxDiagnosticToolKit.libs import ArgumentWrapper
 from sshConnector.sshThreader import sshThreader as threadedSSH
+from sshConnector.sshBufferControl import sshEndTextMatcher, sshOutputDecoder
+from sshConnector.sshLibs.sshTaskScheduler import sshTaskScheduler
+from sshConnector.sshConnectionCache import connectionCache
+from PyLinuxDiagnosticToolKit.libs.LDTKMetrics import metrics, CommandMetrics
+from PyLinuxDiagnosticToolKit.libs.LDTKFactCache import factCache
+from PyLinuxDiagnosticToolKit.libs.LDTKExceptions import CancelledException, LDTKCommandException, \
+    TimeoutException
 from LinuxModules.CommandContainers import CommandContainer
+from LinuxModules.moduleRegistry import moduleRegistry
 from LinuxModules.genericCmdModule import GenericCmdModule
 from PyLinuxDiagnosticToolKit.libs.OSNetworking.PyNIC import NetworkInterfaceCards
 from PyLinuxDiagnosticToolKit.libs.OSNetworking.PyRoute import Routes
@@ -118,6 +132,241 @@ class TestBSimpleExecution(unittest.TestCase):
         results = output.results
         self.assertEqual(results.strip(), 'test_str', f"The string should equal test_string but is instead: {output}")
 
+    def test_d_reader_mode_latency(self):
+        global tki
+        standard_check(self)
+        latency, outputs = {}, {}
+        for mode in ('poll', 'select'):
+            start = time()
+            outputs[mode] = [tki.execute(f'echo test_str{num}; seq 1 50', threading=False, readerMode=mode)
+                             for num in range(25)]
+            latency[mode] = (time() - start) / 25
+        self.assertEqual(outputs['select'], outputs['poll'], "The readerModes returned different output")
+        self.assertEqual(outputs['poll'][0].splitlines()[0], 'test_str0')
+        # Timing over a live link is too noisy to assert on so it is only logged
+        logging.getLogger('unittesting').info(f"Average latency per command - poll: {latency['poll']:.4f}s "
+                                              f"select: {latency['select']:.4f}s")
+
+    def test_e_execute_stream(self):
+        global tki
+        standard_check(self)
+        output = tki.execute('seq 1 5000', stream=True)
+        self.assertNotIsInstance(output, (str, CommandContainer), "The execute method didn't return a generator")
+        lines = list(output)
+        self.assertEqual(len(lines), 5000, f"The stream should have 5000 lines but has: {len(lines)}")
+        self.assertEqual(lines[0].strip(), '1')
+        self.assertEqual(lines[-1].strip(), '5000')
+        output = tki.execute('seq 1 100000', stream=True, threading=False)
+        self.assertEqual(next(output).strip(), '1')
+        output.close()
+        self.assertEqual(tki.execute('echo test_str', threading=False).strip(), 'test_str')
+        with self.assertRaises(LDTKCommandException):
+            tki.execute(['echo one', 'echo two'], stream=True)
+
+    def test_f_environment_checkout(self):
+        global tki
+        standard_check(self)
+        env = tki.getEnvironment(label='checkout_test')
+        self.assertTrue(env, "Failed to get an environment with a label")
+        with env:
+            start = time()
+            self.assertFalse(tki.getEnvironment(EnvironmentID=env.EnvironmentID, wait=1))
+            self.assertGreaterEqual(time() - start, 1)
+        start = time()
+        sameEnv = tki.getEnvironment(EnvironmentID=env.EnvironmentID, wait=5)
+        self.assertIs(sameEnv, env)
+        self.assertLess(time() - start, 0.5, "Checking out a free environment should not wait")
+        with sameEnv:
+            self.assertEqual(sameEnv.executeOnEnvironment(cmd='echo test_str').strip(), 'test_str')
+
+    def test_g_prewarm_environments(self):
+        global tki
+        standard_check(self)
+        before = tki.sshCon.EnvironmentCount
+        count = tki.sshCon.prewarmEnvironments(2, wait=120)
+        self.assertEqual(tki.sshCon.EnvironmentCount, before + count)
+        self.assertTrue(tki.sshCon.startEnvironmentRefiller(1))
+        self.assertFalse(tki.sshCon.startEnvironmentRefiller(1))
+        tki.sshCon.stopEnvironmentRefiller()
+
+    def test_h_aexecute(self):
+        global tki
+        standard_check(self)
+
+        async def _gather():
+            return await asyncio.gather(*[tki.aexecute(f'echo test_str{num}') for num in range(5)],
+                                        tki.getModules('which').arun('ls'))
+
+        results = asyncio.run(_gather())
+        for num, output in enumerate(results[:5]):
+            self.assertEqual(output.strip(), f'test_str{num}', f"The aexecute method returned: {output}")
+        self.assertTrue(results[-1], "The arun method returned nothing for the which module")
+
+    def test_i_connection_cache(self):
+        global tki
+        standard_check(self)
+        args = getArguments()
+        args.connectionCache = 30
+        first = ldtk.ToolKitInterface(arguments=args)
+        start = time()
+        second = ldtk.ToolKitInterface(arguments=args)
+        self.assertIs(first.sshCon, second.sshCon, "The second ToolKitInterface should reuse the cached connection")
+        self.assertLess(time() - start, 1, "Reusing a cached connection should not handshake again")
+        self.assertIsNone(first.sshCon.tki, "A shared connection should not be bound to one ToolKitInterface")
+        output = second.execute('echo test_str')
+        self.assertIs(output.tki, second)
+        output.waitForResults()
+        cached = first.sshCon
+        first.disconnect()
+        second.disconnect()
+        self.assertTrue(cached.checkConnection(), "The cached connection should stay open while idle")
+        third = ldtk.ToolKitInterface(arguments=args)
+        self.assertIs(third.sshCon, cached)
+        self.assertEqual(third.execute('echo test_str', threading=False).strip(), 'test_str')
+        third.disconnect()
+        connectionCache.clear()
+        self.assertFalse(cached.checkConnection())
+
+    def test_j_multibyte_output(self):
+        global tki
+        standard_check(self)
+        output = tki.execute("yes 'h\u00e9llo \u2713' | head -n 20000", threading=False)
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 20000, f"The output should have 20000 lines but has: {len(lines)}")
+        self.assertEqual(set(line.strip() for line in lines), {'h\u00e9llo \u2713'},
+                         "Multibyte characters were broken while decoding the output")
+
+    def test_k_command_metrics(self):
+        global tki
+        standard_check(self)
+        recorded = []
+        metrics.addExporter(recorded.append)
+        try:
+            output = tki.execute('echo test_str', commandKey='metrics_test')
+            output.waitForResults()
+        finally:
+            metrics.removeExporter(recorded.append)
+        self.assertTrue(recorded, "No metrics were recorded for the command")
+        data = recorded[-1].toDict()
+        self.assertEqual(data['commandKey'], 'metrics_test')
+        for phase in ('environmentWait', 'setup', 'execution', 'send', 'postparser'):
+            self.assertIn(phase, data['phases'], f"The phase: {phase} is missing from the metrics: {data}")
+        self.assertGreater(data['bytesReceived'], 0)
+        self.assertIn('module="",commandKey="adhoc"', metrics.toPrometheus())
+        self.assertNotIn('commandKey="metrics_test"', metrics.toPrometheus())
+        registry = type(metrics)(maxKeysPerModule=2)
+        for commandKey in ('one', 'two', 'three', 'four'):
+            registry.record(CommandMetrics(commandKey=commandKey, moduleName='ps'))
+        self.assertEqual(set(registry.snapshot()), {('ps', 'one'), ('ps', 'two'), ('ps', 'other')})
+        self.assertEqual(registry.snapshot()[('ps', 'other')]['commands'], 2)
+
+    def test_l_result_cache(self):
+        global tki
+        standard_check(self)
+        echo = tki.modules.echo
+        tki.resultCache.setModuleTTL('echo', 1)
+        try:
+            first = echo.simpleExecute({'resultCacheTest': 'date +%s%N'}, wait=10)
+            self.assertEqual(echo.simpleExecute({'resultCacheTest': 'date +%s%N'}, wait=10), first)
+            sleep(1.5)
+            self.assertNotEqual(echo.simpleExecute({'resultCacheTest': 'date +%s%N'}, wait=10), first)
+            self.assertEqual(tki.resultCache.invalidate(echo, 'resultCacheTest'), 1)
+            self.assertFalse(hasattr(echo, 'resultCacheTest'))
+        finally:
+            tki.resultCache.setModuleTTL('echo', None)
+
+    def test_m_module_registry(self):
+        global tki
+        standard_check(self)
+        self.assertEqual(moduleRegistry.resolve('ps')['class'], 'psModule')
+        self.assertIn('ps', tki.getAvailableModules('CommandModules/processModules'))
+        self.assertEqual(type(tki.getModules('ps')).__name__, 'psModule')
+
+    def test_n_host_facts(self):
+        global tki
+        standard_check(self)
+        hostFacts = tki.hostFacts
+        self.assertIsNotNone(hostFacts.bootId)
+        self.assertTrue(tki.modules.os.osName)
+        self.assertIn('osDiscovery', hostFacts)
+        self.assertIs(factCache.host(hostFacts.identity, hostFacts.bootId), hostFacts)
+        hostFacts.set('factCacheTest', 1)
+        factCache.host(hostFacts.identity, 'rebooted')
+        self.assertNotIn('factCacheTest', hostFacts)
+        factCache.host(hostFacts.identity, tki.sshCon.getHostFacts().bootId)
+
+    def test_o_exec_channel(self):
+        global tki
+        standard_check(self)
+        if tki.arguments.root:
+            self.skipTest('Commands that need root always run in a shell environment')
+        command = 'echo exec_out; echo exec_err 1>&2; (exit 3)'
+        output = tki.execute(command, threading=True)
+        self.assertFalse(output.useExecChannel)
+        output.waitForResults()
+        self.assertIn('exec_out', output.results)
+        self.assertIn('exec_err', output.results)
+        self.assertIsNone(output.exitStatus, 'Only exec channels and pipelines record the exit status')
+        execMode, tki.arguments.execMode = tki.arguments.execMode, 'auto'
+        try:
+            output = tki.execute(command, threading=True)
+            self.assertTrue(output.useExecChannel)
+            output.waitForResults()
+            self.assertEqual(output.results, 'exec_out')
+            self.assertEqual(output.stderr, 'exec_err')
+            self.assertEqual(output.exitStatus, 3)
+            self.assertFalse(CommandContainer('echo test_str', None, tki=tki, label='execTest').useExecChannel)
+        finally:
+            tki.arguments.execMode = execMode
+
+    def test_p_pipelined_queue(self):
+        global tki
+        standard_check(self)
+        output = tki.execute(['echo pipe_one', 'echo pipe_two; (exit 4)', 'echo pipe_three'], pipeline=True)
+        self.assertTrue(output.usePipeline)
+        output.waitForResults()
+        self.assertEqual([child.results for child in output.children], ['pipe_one', 'pipe_two', 'pipe_three'])
+        self.assertEqual([child.exitStatus for child in output.children], [0, 4, 0])
+        output = tki.execute(['echo pipe_exit; exit 5', 'echo pipe_after'], pipeline=True)
+        output.waitForResults()
+        self.assertEqual([child.results for child in output.children], ['pipe_exit', 'pipe_after'])
+        self.assertEqual([child.exitStatus for child in output.children], [5, 0])
+
+    def test_q_prompt_token(self):
+        global tki
+        standard_check(self)
+        environment = tki.sshCon.mainEnvironment
+        self.assertTrue(environment.prompt.startswith('__LDTK_'))
+        self.assertEqual(environment.prompt, environment.promptToken)
+        self.assertTrue(environment.isPromptDefault())
+        self.assertEqual(tki.sshCon.executeOnEnvironment(environment, 'echo token_test'), 'token_test')
+
+    def test_r_scheduler(self):
+        global tki
+        standard_check(self)
+        self.assertFalse(tki.sshCon.scheduler.isShort(CommandContainer('echo long', None, tki=tki, longRunning=True)))
+        self.assertTrue(tki.sshCon.scheduler.isShort(CommandContainer('echo short', None, tki=tki)))
+        output = tki.execute('echo scheduled')
+        output.waitForResults()
+        self.assertEqual(output.results, 'scheduled')
+        stats = tki.sshCon.getSchedulerStats()
+        self.assertGreaterEqual(stats['executed'], 1)
+        self.assertEqual(stats['longLimit'], max(1, tki.sshCon._MAX_SESSIONS - 1 - tki.arguments.reservedEnvironments))
+
+    def test_s_cancel(self):
+        global tki
+        standard_check(self)
+        start = time()
+        output = tki.execute('sleep 120', label='cancelTest')
+        sleep(2)
+        self.assertTrue(output.cancel())
+        output.waitForResults(wait=30)
+        self.assertLess(time() - start, 30)
+        self.assertIsInstance(output.results, CancelledException)
+        output = tki.execute('echo after_cancel', label='cancelTest')
+        output.waitForResults()
+        self.assertEqual(output.results, 'after_cancel')
+
     def test_z_disconnect(self):
         global tki
         standard_check(self)
@@ -438,6 +687,17 @@ class TestEProcessModules(unittest.TestCase):
         topMem = ps.getTopMem()
         self.assertEqual(len(topMem), 10)
 
+        self.assertEqual(len(ps.processTable), len(ps))
+        process = ps.getProcessByPid(1)
+        self.assertEqual(len(process), 1)
+        self.assertEqual(len(ps.getProcessesByUser(process[0][0])), len(ps.processTable.byUser(process[0][0])))
+
+        sample = ps.sampleCPU(interval=1, samples=2, top=5)
+        self.assertIsInstance(sample, dict)
+        self.assertLessEqual(len(sample['processes']), 5)
+        self.assertEqual(len(sample['runQueue']), 2)
+        self.assertGreaterEqual(sample['cpus'], 1)
+
     def test_aac_lsof(self):
         global tki
         standard_check(self)
@@ -456,6 +716,11 @@ class TestEProcessModules(unittest.TestCase):
         convertToBytes = lsof.lsofConvertResultsToBytes(output)
         self.assertIsNotNone(convertToBytes)
 
+        self.assertEqual(len(lsof.openFileTable), len(lsof))
+        self.assertIsInstance(lsof.getOpenDeletedFilesReport(), list)
+        pid = lsof.openFileTable.pids[0]
+        self.assertGreaterEqual(len(lsof.openFileTable.byPid(pid)), 1)
+
     def test_aad_which(self):
         global tki
         standard_check(self)
@@ -789,6 +1054,7 @@ class TestEFileModules(unittest.TestCase):
         results = find.listLargestFilesOnFilesystem('/tmp', head=10, sort=True, wait=30)
         self.assertIsInstance(results, BashParser)
         self.assertGreaterEqual(len(results), 1)
+        self.assertLessEqual(len(results), 10)
 
     def test_aah_getfalc(self):
         global tki
@@ -850,6 +1116,48 @@ class TestEFileModules(unittest.TestCase):
 
         tki.modules.rm(testfilePath)
 
+    def test_aal_tail_cursor(self):
+        global tki
+        global testfilePath
+        standard_check(self)
+
+        tail = tki.modules.tail
+
+        tki.execute(f'printf "one\\ntwo\\n" > {testfilePath}').waitForResults(wait=10)
+
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.splitlines(), ['one', 'two'])
+
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.strip(), '')
+
+        tki.execute(f'echo three >> {testfilePath}').waitForResults(wait=10)
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.strip(), 'three')
+
+        results = tail.tailWindow(testfilePath, lines=2)
+        self.assertEqual(results.splitlines(), ['two', 'three'])
+        tki.execute(f'echo four >> {testfilePath}').waitForResults(wait=10)
+        results = tail.tailWindow(testfilePath, lines=2)
+        self.assertEqual(results.splitlines(), ['three', 'four'])
+
+        tki.execute(f'echo five > {testfilePath}').waitForResults(wait=10)
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.strip(), 'five')
+
+        tki.execute(f'printf "six\\nsev" >> {testfilePath}').waitForResults(wait=10)
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.splitlines(), ['six'])
+        results = tail.tailWindow(testfilePath, lines=3)
+        self.assertEqual(results.splitlines(), ['five', 'six'])
+        tki.execute(f'printf "en\\neight\\n" >> {testfilePath}').waitForResults(wait=10)
+        results = tail.tailSince(testfilePath, lines=10)
+        self.assertEqual(results.splitlines(), ['seven', 'eight'])
+        results = tail.tailWindow(testfilePath, lines=3)
+        self.assertEqual(results.splitlines(), ['six', 'seven', 'eight'])
+
+        tki.modules.rm(testfilePath)
+
     def test_zzz_disconnect(self):
         global tki
         standard_check(self)
@@ -953,6 +1261,14 @@ class TestESystemModules(unittest.TestCase):
         self.assertGreaterEqual(len(results.splitlines()), 1)
         self.assertIn('this is a test', results)
 
+        logFile = messages.getLogFile()
+        self.assertIn(logFile, messages.__LOGFILES__)
+        size = messages._getFileSize(logFile)
+        self.assertGreater(size, 0)
+        offsets = messages._bisectOffsets(logFile, size, [datetime.now(tz=messages.remoteTZ)])
+        self.assertIsInstance(offsets, list)
+        self.assertLessEqual(offsets[0][0], offsets[0][1])
+
     def test_aae_os(self):
         global tki
         standard_check(self)
@@ -974,6 +1290,14 @@ class TestESystemModules(unittest.TestCase):
         results = os.getUptime()
         self.assertIsInstance(results, str)
 
+        sections = os.discover()
+        self.assertIsInstance(sections, dict)
+        self.assertIn('END', sections)
+        self.assertEqual(os.kernelVersion, tki.modules.uname.getKernelVersion().strip())
+        self.assertEqual(os.hostname, tki.modules.uname.getHostName().strip())
+        self.assertIsInstance(os.commandExists('lsof'), bool)
+        self.assertIsInstance(os.timezone, str)
+
     def test_aaf_uname(self):
         global tki
         standard_check(self)
@@ -1089,6 +1413,177 @@ class TestFMySQLModule(unittest.TestCase):
         self.assertFalse(tki.checkConnection())
 
 
+
+# noinspection PyUnresolvedReferences
+class TestGToolKitFleet(unittest.TestCase):
+
+    def test_a_fleet_execute(self):
+        args = getArguments()
+        with ldtkFleet.ToolKitFleet([args.host], arguments=args, maxConnections=2) as fleet:
+            results = list(fleet.execute('echo test_str', wait=60))
+            self.assertEqual(len(results), 1)
+            self.assertTrue(results[0].success, f"The fleet execution failed with: {results[0].exception}")
+            self.assertEqual(results[0].result.strip(), 'test_str')
+
+    def test_b_fleet_module_and_timeout(self):
+        args = getArguments()
+        with ldtkFleet.ToolKitFleet([args.host], arguments=args, hostTimeout=120) as fleet:
+            results = list(fleet.runModule('uname', 'getHostName'))
+            self.assertTrue(results[0].success, f"The fleet module call failed with: {results[0].exception}")
+            results = list(fleet.run(lambda tki: tki.execute('sleep 30', threading=False), hostTimeout=2))
+            self.assertIsInstance(results[0].exception, ldtkFleet.FleetTimeoutException)
+
+class _ScheduledStub(object):
+    """ Stands in for a CommandContainer in the tests that need no host. """
+
+    __PRIORITY__ = 10
+    children = None
+    cancelled = False
+    expired = False
+
+    def __init__(self, timeout=300, priority=10, longRunning=False):
+        self.timeout = timeout
+        self.__PRIORITY__ = priority
+        self.longRunning = longRunning
+
+    def expire(self):
+        self.expired = True
+
+
+# noinspection PyUnresolvedReferences
+class TestHHostIndependent(unittest.TestCase):
+    """
+        These tests cover pure logic and do not need a host.
+    """
+
+    def test_a_scheduler_order(self):
+        scheduler = sshTaskScheduler(workers=4, reserved=1)
+        late, soon, urgent = _ScheduledStub(timeout=300), _ScheduledStub(timeout=30), _ScheduledStub(priority=5)
+        for task in (late, soon, urgent):
+            scheduler.put(task)
+        self.assertEqual([scheduler.get() for _ in range(3)], [urgent, soon, late])
+        self.assertIsNone(scheduler.get())
+        self.assertEqual(scheduler.stats()['executed'], 3)
+        self.assertEqual(scheduler.stats()['runningLong'], 0)
+
+    def test_b_scheduler_reservation(self):
+        scheduler = sshTaskScheduler(workers=2, reserved=1)
+        self.assertEqual(scheduler.longLimit, 1)
+        self.assertEqual(sshTaskScheduler(workers=1, reserved=1).longLimit, 1)
+        first, second = _ScheduledStub(timeout=30, longRunning=True), _ScheduledStub(timeout=40, priority=20)
+        short = _ScheduledStub()
+        for task in (first, second, short):
+            scheduler.put(task)
+        self.assertIs(scheduler.get(), first)
+        self.assertIs(scheduler.get(), short)
+        self.assertIsNone(scheduler.get())
+        self.assertEqual(scheduler.stats()['runningLong'], 1)
+        self.assertEqual(scheduler.done(first), 1)
+        self.assertIs(scheduler.get(), second)
+        self.assertEqual(scheduler.done(short), 0)
+        self.assertEqual(scheduler.done(second), 0)
+        self.assertEqual(scheduler.stats()['runningLong'], 0)
+        self.assertEqual(scheduler.stats()['running'], 0)
+
+    def test_c_scheduler_expired_and_cancelled(self):
+        scheduler = sshTaskScheduler(workers=2, reserved=1)
+        expired, cancelled, ready = _ScheduledStub(timeout=0.01), _ScheduledStub(timeout=20), _ScheduledStub()
+        cancelled.cancelled = True
+        for task in (expired, cancelled, ready):
+            scheduler.put(task)
+        sleep(0.05)
+        self.assertIs(scheduler.get(), ready)
+        self.assertTrue(expired.expired)
+        self.assertFalse(cancelled.expired)
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.stats()['expired'], 1)
+
+    def test_d_connection_key(self):
+        def _arguments(key):
+            return Namespace(host='localhost', port=22, username='root', key=key, password='', root=False,
+                             proxyUser=None, proxyServer=None)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.key') as first, \
+                tempfile.NamedTemporaryFile('w', suffix='.key') as second:
+            first.write('first key')
+            first.flush()
+            second.write('second key')
+            second.flush()
+            with open(first.name) as firstKey, open(second.name) as secondKey:
+                firstCacheKey = connectionCache.connectionKey(_arguments(firstKey))
+                self.assertEqual(firstKey.read(), 'first key', "Building the cache key should not consume the key")
+                self.assertEqual(firstCacheKey, connectionCache.connectionKey(_arguments('first key')))
+                self.assertNotEqual(firstCacheKey, connectionCache.connectionKey(_arguments(secondKey)))
+
+    def test_e_fact_cache_save_while_expiring(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = type(factCache)(path=os.path.join(directory, 'facts.json'), ttl=0.01)
+            hostFacts = cache.host('host SHA256:', 'boot')
+            hostFacts.update({f'fact{num}': num for num in range(5000)})
+            sleep(0.02)
+            saved = []
+            saver = Thread(target=lambda: saved.extend(cache.save() for _ in range(20)))
+            saver.start()
+            for num in range(5000):
+                self.assertIsNone(hostFacts.get(f'fact{num}'))
+            saver.join()
+            self.assertTrue(all(saved))
+            self.assertEqual(len(hostFacts.facts), 0)
+
+    def test_f_async_wait_timeout(self):
+        output = CommandContainer('echo test_str', None)
+        self.assertIsNone(asyncio.run(output.asyncWaitForResults(wait=0.05)))
+        self.assertEqual(output._doneCallbacks, [], "The done callback should be removed after a timeout")
+        output = CommandContainer('echo test_str', None, timeoutExceptions=True)
+        self.assertIsInstance(asyncio.run(output.asyncWaitForResults(wait=0.05)), TimeoutException)
+        self.assertEqual(output._doneCallbacks, [])
+
+    def test_g_matcher_split_prompt(self):
+        matcher = sshEndTextMatcher(str, 'user@host:~$')
+        self.assertTrue(matcher.feed('output\r\nuser@ho'))
+        self.assertFalse(matcher.feed('st:~$ '))
+        matcher = sshEndTextMatcher(tuple, ('$', '#'))
+        self.assertTrue(matcher.feed('output\r\n[root@host ~]'))
+        self.assertFalse(matcher.feed('# '))
+
+    def test_h_matcher_cmdend_echo(self):
+        cmd = 'echo CMDSTART && ls && echo CMDEND'
+        matcher = sshEndTextMatcher(str, 'CMDEND', cmd=cmd)
+        self.assertTrue(matcher.feed(f'{cmd}\r\n'), "The echo of the command should not end the buffer")
+        self.assertTrue(matcher.feed('CMDSTART\r\nfile CMDEND\r\nCMD'))
+        self.assertTrue(matcher.feed('EN'))
+        self.assertFalse(matcher.feed('D\r\n'))
+
+    def test_i_matcher_window_overflow(self):
+        matcher = sshEndTextMatcher(str, 'CMDEND', window=16)
+        for _ in range(100):
+            self.assertTrue(matcher.feed('x' * 100))
+            self.assertLessEqual(len(matcher._tail), matcher.window)
+            self.assertLessEqual(len(matcher._partial), matcher.window)
+        self.assertTrue(matcher.feed('\n' + 'y' * 1000))
+        # The CMDEND line has left the tail window by the time the feed returns so only the line scan can find it
+        self.assertTrue(matcher.feed('\nCM'))
+        self.assertFalse(matcher.feed('DEND\n' + 'z' * 1000))
+        self.assertNotIn('CMDEND', matcher._tail)
+        self.assertEqual(matcher.length, 10000 + 1001 + 3 + 1005)
+        matcher = sshEndTextMatcher(str, 'user@host:~$', window=16)
+        self.assertTrue(matcher.feed('x' * 10000))
+        self.assertFalse(matcher.feed('\r\nuser@host:~$ '))
+
+    def test_j_decoder_split_sequences(self):
+        decoder = sshOutputDecoder()
+        self.assertEqual(decoder.decode('caf\u00e9'.encode()[:-1]), 'caf')
+        self.assertEqual(decoder.decode('\u00e9'.encode()[-1:]), '\u00e9')
+        self.assertEqual(decoder.decode(b'red \x1b[3'), 'red ')
+        self.assertEqual(decoder.decode(b'1mtext\x1b[0m done', final=True), 'text done')
+        self.assertEqual(decoder.bytesReceived, 27)
+        decoder = sshOutputDecoder(stripEscapes=False)
+        self.assertEqual(decoder.decode(b'\x1b[31mred', final=True), '\x1b[31mred')
+        decoder = sshOutputDecoder(fallbackEncoding='latin1')
+        self.assertEqual(decoder.decode(b'ok '), 'ok ')
+        self.assertEqual(decoder.decode(b'\xff\xfe', final=True), '\u00ff\u00fe')
+
+
 if __name__ == '__main__':
     # use 'export UnitTestingConfigFile="unittesting_centos.json"; python3 unittesting.py' to change the config file
     # to unittesting_centos.json or whatever desired file